@@ -0,0 +1,129 @@
+import itertools
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.core.config import get_settings
+from app.rag.vector_store import registry
+
+settings = get_settings()
+
+@dataclass
+class CachedAnswer:
+    agent_type: str
+    question: str
+    response: str
+    vector: np.ndarray
+
+class SemanticAnswerCache:
+    """Answer cache keyed by query-embedding similarity, scoped per agent type.
+
+    A lookup hits when a previously answered question for the same agent has
+    cosine similarity of at least ``threshold``. Entries are evicted in LRU
+    order once ``max_entries`` is reached, and ``invalidate`` drops all
+    entries whenever the document corpus changes. Answers computed before an
+    invalidation are not stored (see ``generation``).
+    """
+
+    def __init__(self, embeddings: Embeddings, threshold: float = 0.95, max_entries: int = 1000):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._matrices = {}  # agent_type -> (entry ids, stacked unit vectors)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _matrix(self, agent_type: str):
+        if agent_type not in self._matrices:
+            ids = [i for i, entry in self._entries.items() if entry.agent_type == agent_type]
+            vectors = np.stack([self._entries[i].vector for i in ids]) if ids else None
+            self._matrices[agent_type] = (ids, vectors)
+        return self._matrices[agent_type]
+
+    def _lookup(self, agent_type: str, vector: np.ndarray) -> Optional[str]:
+        with self._lock:
+            ids, vectors = self._matrix(agent_type)
+            if vectors is not None:
+                scores = vectors @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry_id = ids[best]
+                    self._entries.move_to_end(entry_id)
+                    self._counts["hits"] += 1
+                    return self._entries[entry_id].response
+            self._counts["misses"] += 1
+            return None
+
+    def lookup(self, agent_type: str, question: str) -> Optional[str]:
+        """Return a cached answer for a near-identical question, if any."""
+        return self._lookup(agent_type, self._normalize(self.embeddings.embed_query(question)))
+
+    async def alookup(self, agent_type: str, question: str) -> Optional[str]:
+        """Async version of `lookup`."""
+        vector = await self.embeddings.aembed_query(question)
+        return self._lookup(agent_type, self._normalize(vector))
+
+    def _store(self, agent_type: str, question: str, response: str, vector, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                return  # corpus changed while the answer was being generated
+            entry = CachedAnswer(agent_type, question, response, self._normalize(vector))
+            self._entries[next(self._ids)] = entry
+            self._matrices.pop(agent_type, None)
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._matrices.pop(evicted.agent_type, None)
+                self._counts["evictions"] += 1
+
+    def store(self, agent_type: str, question: str, response: str, generation: int) -> None:
+        """Cache an answer produced while the cache was at ``generation``."""
+        vector = self.embeddings.embed_query(question)
+        self._store(agent_type, question, response, vector, generation)
+
+    async def astore(self, agent_type: str, question: str, response: str, generation: int) -> None:
+        """Async version of `store`."""
+        vector = await self.embeddings.aembed_query(question)
+        self._store(agent_type, question, response, vector, generation)
+
+    def invalidate(self) -> None:
+        """Drop every cached answer, e.g. after documents are added or removed."""
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+            self.generation += 1
+            self._counts["invalidations"] += 1
+
+    def stats(self) -> dict:
+        """Hit rate, eviction count and approximate memory footprint."""
+        with self._lock:
+            counts = dict(self._counts)
+            counts["entries"] = len(self._entries)
+            counts["memory_bytes"] = sum(
+                entry.vector.nbytes + sys.getsizeof(entry.question) + sys.getsizeof(entry.response)
+                for entry in self._entries.values()
+            )
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+        return counts
+
+@lru_cache()
+def get_answer_cache() -> SemanticAnswerCache:
+    """Get the process-wide answer cache."""
+    return SemanticAnswerCache(
+        registry.embeddings,
+        threshold=settings.ANSWER_CACHE_THRESHOLD,
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES
+    )
@@ -0,0 +1,40 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, List, Tuple
+from app.rag.embedding_cache import normalize_text
+
+def dedupe_questions(questions: List[str]) -> List[Tuple[str, List[int]]]:
+    """Group identical questions (ignoring case and whitespace) as ``(question, positions)``."""
+    groups: Dict[str, Tuple[str, List[int]]] = {}
+    for position, question in enumerate(questions):
+        key = normalize_text(question).lower()
+        groups.setdefault(key, (question, []))[1].append(position)
+    return list(groups.values())
+
+class TokenBudget:
+    """Async limit on the estimated prompt tokens of generations in flight.
+
+    ``reserve(tokens)`` waits until the tokens fit in what is left of the
+    budget. A request larger than the whole budget is admitted on its own,
+    once nothing else is in flight, rather than waiting forever.
+    """
+
+    def __init__(self, tokens: int):
+        self.tokens = max(1, tokens)
+        self.in_use = 0
+        self.peak = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, tokens: int):
+        tokens = min(max(0, tokens), self.tokens)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_use + tokens <= self.tokens)
+            self.in_use += tokens
+            self.peak = max(self.peak, self.in_use)
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_use -= tokens
+                self._condition.notify_all()
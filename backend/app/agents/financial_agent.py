@@ -1,9 +1,15 @@
+import asyncio
+from typing import AsyncIterator, List, Tuple
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
-from langchain.schema.runnable import RunnablePassthrough
+from langchain.schema.runnable import RunnablePassthrough, RunnableLambda
 from langchain.schema.output_parser import StrOutputParser
+from langchain.schema import Document
 from app.core.config import get_settings
-from app.rag.vector_store import get_vector_store
+from app.core.metrics import llm_metrics
+from app.rag.context import ContextBuilder, ContextResult
+from app.rag.facts import get_fact_table
+from app.rag.retrieval import get_retriever
 
 settings = get_settings()
 
@@ -14,9 +20,12 @@ class FinancialAgent:
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0,
-            openai_api_key=settings.OPENAI_API_KEY
+            openai_api_key=settings.OPENAI_API_KEY,
+            callbacks=[llm_metrics]
         )
-        self.vector_store = get_vector_store()
+        self.retriever = get_retriever()
+        self.top_k = 3
+        self.context_builder = ContextBuilder(settings.FINANCIAL_CONTEXT_TOKENS, settings.CONTEXT_MMR_LAMBDA)
         
         self.prompt = ChatPromptTemplate.from_template("""
 You are a financial analyst specializing in calculations and financial metrics.
@@ -25,7 +34,7 @@ Use the following financial data to perform analysis:
 
 Context:
 {context}
-
+{history}
 Task: {question}
 
 Instructions:
@@ -37,18 +46,98 @@ Instructions:
 
 Answer:""")
         
+        # Used when the figures were computed locally from the financial facts table
+        self.phrase_prompt = ChatPromptTemplate.from_template("""
+You are a financial analyst. The figures below were computed exactly from the company's filings.
+{history}
+Calculation:
+{calculation}
+
+Task: {question}
+
+Answer using only these figures, with their units, periods and sources. Do not recalculate them.
+
+Answer:""")
+        
+        self.answer_chain = self.prompt | self.llm | StrOutputParser()
+        self.phrase_chain = self.phrase_prompt | self.llm | StrOutputParser()
         self.chain = (
-            {"context": self._get_context, "question": RunnablePassthrough()}
-            | self.prompt
-            | self.llm
-            | StrOutputParser()
+            {
+                "context": RunnableLambda(self._get_context, afunc=self._aget_context),
+                "question": RunnablePassthrough(),
+                "history": RunnableLambda(lambda _: "")
+            }
+            | self.answer_chain
         )
     
     def _get_context(self, question: str) -> str:
         """Retrieve relevant financial data from vector store."""
-        docs = self.vector_store.similarity_search(question, k=3)
-        return "\n\n".join([doc.page_content for doc in docs])
+        docs = self.retriever.search(question, k=settings.CONTEXT_CANDIDATES)
+        return self.build_context(docs).text
+    
+    async def _aget_context(self, question: str) -> str:
+        """Retrieve relevant financial data from vector store without blocking the event loop."""
+        return self.build_context(await self.aretrieve(question)).text
+    
+    async def aretrieve(self, question: str) -> List[Document]:
+        """Retrieve the documents this agent answers from."""
+        return await self.retriever.asearch(question, k=settings.CONTEXT_CANDIDATES)
+    
+    def build_context(self, docs: List[Document]) -> ContextResult:
+        """Merge, deduplicate and pack retrieved chunks into this agent's token budget."""
+        return self.context_builder.build(docs, max_chunks=self.top_k)
+    
+    @staticmethod
+    def _answer_inputs(question: str, context: ContextResult, history: str) -> dict:
+        return {
+            "context": context.text,
+            "question": question,
+            "history": f"\nConversation so far:\n{history}\n" if history else ""
+        }
+    
+    def _prepare(self, question: str, context: ContextResult, history: str) -> Tuple[object, dict]:
+        """Chain and inputs for a question: the phrasing prompt when the ratio or
+        growth rate it asks for can be computed from stored facts, the full
+        context prompt otherwise.
+        """
+        inputs = self._answer_inputs(question, context, history)
+        if settings.FACTS_ENABLED:
+            calculation = get_fact_table().compute(question, context.documents)
+            if calculation:
+                return self.phrase_chain, {
+                    "calculation": calculation.to_text(),
+                    "question": question,
+                    "history": inputs["history"]
+                }
+        return self.answer_chain, inputs
+    
+    async def _aprepare(self, question: str, context: ContextResult, history: str) -> Tuple[object, dict]:
+        """`_prepare` in a worker thread, as loading the fact table queries the database."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._prepare, question, context, history)
+    
+    def answer(self, question: str, context: ContextResult, history: str = "") -> str:
+        """Answer from an already built context, without another vector search.
+        
+        ``history`` is the session's conversation so far, for follow-up questions.
+        """
+        chain, inputs = self._prepare(question, context, history)
+        return chain.invoke(inputs)
+    
+    async def aanswer(self, question: str, context: ContextResult, history: str = "") -> str:
+        """Async version of `answer`."""
+        chain, inputs = await self._aprepare(question, context, history)
+        return await chain.ainvoke(inputs)
+    
+    async def astream_answer(self, question: str, context: ContextResult, history: str = "") -> AsyncIterator[str]:
+        """Stream answer tokens for an already built context."""
+        chain, inputs = await self._aprepare(question, context, history)
+        async for token in chain.astream(inputs):
+            yield token
     
     def analyze(self, question: str) -> str:
         """Perform financial analysis based on the question."""
         return self.chain.invoke(question)
+    
+    async def aanalyze(self, question: str) -> str:
+        """Async version of `analyze`."""
+        return await self.chain.ainvoke(question)
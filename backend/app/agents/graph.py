@@ -5,7 +5,7 @@ import operator
 from app.agents.research_agent import research_agent
 from app.agents.financial_agent import financial_agent
 from app.agents.summary_agent import summary_agent
-from app.core.langfuse_config import get_langfuse
+from app.core.tracing import tracer
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
@@ -15,76 +15,51 @@ class AgentState(TypedDict):
 
 def route_query(state: AgentState) -> str:
     """Route the query to the appropriate agent based on keywords"""
-    langfuse = get_langfuse()
     query = state["query"].lower()
     
     # Track routing decision
-    if langfuse:
-        trace = langfuse.trace(
-            name="query_routing",
-            input={"query": query}
-        )
-    
-    agent = "research"
-    
-    if any(word in query for word in ["calculate", "compute", "ratio", "margin", "percentage", "growth rate"]):
-        agent = "financial"
-    elif any(word in query for word in ["summarize", "summary", "overview", "key points"]):
-        agent = "summary"
-    
-    if langfuse:
-        trace.update(output={"selected_agent": agent})
+    with tracer.span("query_routing", input={"query": query}) as span:
+        agent = "research"
+        
+        if any(word in query for word in ["calculate", "compute", "ratio", "margin", "percentage", "growth rate"]):
+            agent = "financial"
+        elif any(word in query for word in ["summarize", "summary", "overview", "key points"]):
+            agent = "summary"
+        
+        span.update(output={"selected_agent": agent})
     
     return agent
 
 def call_research_agent(state: AgentState) -> AgentState:
-    langfuse = get_langfuse()
-    
-    if langfuse:
-        span = langfuse.span(
-            name="research_agent_execution",
-            input={"query": state["query"], "context": state.get("context", "")}
-        )
-    
-    result = research_agent(state["query"], state.get("context", ""))
-    state["agent_used"] = "research"
-    
-    if langfuse:
-        span.end(output={"response": result})
+    with tracer.span(
+        "research_agent_execution",
+        input={"query": state["query"], "context": state.get("context", "")}
+    ) as span:
+        result = research_agent(state["query"], state.get("context", ""))
+        state["agent_used"] = "research"
+        span.update(output={"response": result})
     
     return state
 
 def call_financial_agent(state: AgentState) -> AgentState:
-    langfuse = get_langfuse()
-    
-    if langfuse:
-        span = langfuse.span(
-            name="financial_agent_execution",
-            input={"query": state["query"], "context": state.get("context", "")}
-        )
-    
-    result = financial_agent(state["query"], state.get("context", ""))
-    state["agent_used"] = "financial"
-    
-    if langfuse:
-        span.end(output={"response": result})
+    with tracer.span(
+        "financial_agent_execution",
+        input={"query": state["query"], "context": state.get("context", "")}
+    ) as span:
+        result = financial_agent(state["query"], state.get("context", ""))
+        state["agent_used"] = "financial"
+        span.update(output={"response": result})
     
     return state
 
 def call_summary_agent(state: AgentState) -> AgentState:
-    langfuse = get_langfuse()
-    
-    if langfuse:
-        span = langfuse.span(
-            name="summary_agent_execution",
-            input={"query": state["query"], "context": state.get("context", "")}
-        )
-    
-    result = summary_agent(state["query"], state.get("context", ""))
-    state["agent_used"] = "summary"
-    
-    if langfuse:
-        span.end(output={"response": result})
+    with tracer.span(
+        "summary_agent_execution",
+        input={"query": state["query"], "context": state.get("context", "")}
+    ) as span:
+        result = summary_agent(state["query"], state.get("context", ""))
+        state["agent_used"] = "summary"
+        span.update(output={"response": result})
     
     return state
 
@@ -0,0 +1,368 @@
+import asyncio
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from app.core.config import get_settings
+from app.core.logs import RateLimitedLogger
+from app.rag.ingestion import estimate_tokens
+
+settings = get_settings()
+logger = RateLimitedLogger(logging.getLogger(__name__))
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+
+    @property
+    def text(self) -> str:
+        return f"User: {self.question}\nAssistant: {self.answer}"
+
+@dataclass
+class SessionHistory:
+    """One session's conversation: a rolling summary of older turns plus the recent ones verbatim."""
+    session_id: str
+    summary: str = ""
+    summarized_turns: int = 0
+    turns: List[Turn] = field(default_factory=list)
+    history_tokens: int = 600
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    compacting: bool = False
+
+    def __len__(self) -> int:
+        return self.summarized_turns + len(self.turns)
+
+    def render(self) -> str:
+        """Prompt text for the history, within ``history_tokens`` plus the summary's own bound.
+
+        Recent turns are taken newest first until the budget is used, so
+        the result stays bounded even while a compaction is pending.
+        """
+        with self.lock:
+            summary, turns = self.summary, list(self.turns)
+        lines, budget = [], self.history_tokens
+        for turn in reversed(turns):
+            tokens = estimate_tokens(turn.text)
+            if tokens > budget:
+                break
+            lines.append(turn.text)
+            budget -= tokens
+        if summary:
+            lines.append(f"Summary of earlier conversation:\n{summary}")
+        return "\n".join(reversed(lines))
+
+    def search_query(self, question: str, max_words: int = 8) -> str:
+        """Query to retrieve with, borrowing the previous question for short follow-ups.
+
+        "And in Q3?" retrieves nothing useful alone; prefixed with the
+        question it follows up on, it finds the same filing's chunks.
+        """
+        with self.lock:
+            previous = self.turns[-1].question if self.turns else None
+        if previous is None or len(question.split()) > max_words:
+            return question
+        return f"{previous} {question}"
+
+def _first_sentence(text: str, max_words: int) -> str:
+    sentence = re.split(r"(?<=[.!?])\s", text.strip(), maxsplit=1)[0]
+    words = sentence.split()
+    return " ".join(words[:max_words]) + (" ..." if len(words) > max_words else "")
+
+def _truncate_oldest(summary: str, max_tokens: int) -> str:
+    """Drop the oldest summary lines until it fits."""
+    lines = summary.splitlines()
+    while lines and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+class ExtractiveSummarizer:
+    """Fold turns into the summary as one line each: the question and the
+    first sentence of the answer. No model call, so compaction is free."""
+
+    def summarize(self, summary: str, turns: List[Turn], max_tokens: int) -> str:
+        lines = [summary] if summary else []
+        lines += [f"- Asked: {_first_sentence(turn.question, 30)} Answered: {_first_sentence(turn.answer, 40)}"
+                  for turn in turns]
+        return _truncate_oldest("\n".join(lines), max_tokens)
+
+    async def asummarize(self, summary: str, turns: List[Turn], max_tokens: int) -> str:
+        return self.summarize(summary, turns, max_tokens)
+
+class LLMSummarizer:
+    """Ask the model to rewrite the summary with the new turns folded in."""
+
+    def __init__(self):
+        from langchain_openai import ChatOpenAI
+        from langchain.prompts import ChatPromptTemplate
+        from langchain.schema.output_parser import StrOutputParser
+        from app.core.metrics import llm_metrics
+
+        prompt = ChatPromptTemplate.from_template("""
+Update the summary of a conversation about financial documents with the new turns.
+Keep company names, periods and figures. Use at most {words} words.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:""")
+        llm = ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=0,
+            openai_api_key=settings.OPENAI_API_KEY,
+            callbacks=[llm_metrics]
+        )
+        self.chain = prompt | llm | StrOutputParser()
+
+    @staticmethod
+    def _inputs(summary: str, turns: List[Turn], max_tokens: int) -> dict:
+        return {
+            "summary": summary or "(none)",
+            "turns": "\n".join(turn.text for turn in turns),
+            "words": max_tokens * 3 // 4
+        }
+
+    def summarize(self, summary: str, turns: List[Turn], max_tokens: int) -> str:
+        return _truncate_oldest(self.chain.invoke(self._inputs(summary, turns, max_tokens)).strip(), max_tokens)
+
+    async def asummarize(self, summary: str, turns: List[Turn], max_tokens: int) -> str:
+        text = await self.chain.ainvoke(self._inputs(summary, turns, max_tokens))
+        return _truncate_oldest(text.strip(), max_tokens)
+
+class ConversationMemory:
+    """Per-session conversation history with bounded prompt size.
+
+    Sessions live in an LRU of ``max_sessions`` entries; one that was
+    evicted (or belongs to another worker) is reloaded from the database.
+    Each session keeps at most ``recent_turns`` turns and
+    ``history_tokens`` tokens verbatim; older turns are folded into a
+    rolling summary capped at ``summary_tokens``, so the history in the
+    prompt never grows past about ``history_tokens + summary_tokens`` no
+    matter how long the session runs.
+
+    Writes never wait on the database: turns and summaries are queued
+    and inserted in one transaction every ``flush_interval`` seconds by
+    `start`'s background task.
+    """
+
+    def __init__(self, session_factory=None, summarizer=None, max_sessions: int = 1000,
+                 recent_turns: int = 4, history_tokens: int = 600, summary_tokens: int = 300,
+                 flush_interval: float = 1.0):
+        self.session_factory = session_factory
+        self.summarizer = summarizer or ExtractiveSummarizer()
+        self.max_sessions = max_sessions
+        self.recent_turns = recent_turns
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.flush_interval = flush_interval
+        self._sessions: "OrderedDict[str, SessionHistory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending_turns: List[Tuple[str, Turn, datetime]] = []
+        self._pending_summaries: dict = {}  # session_id -> (summary, summarized turns)
+        self._task: Optional[asyncio.Task] = None
+        self._counts = {"hits": 0, "loads": 0, "evictions": 0, "compactions": 0, "written": 0}
+
+    def get(self, session_id: str) -> SessionHistory:
+        """The session's history, loading it from the database on an LRU miss."""
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is not None:
+                self._sessions.move_to_end(session_id)
+                self._counts["hits"] += 1
+                return history
+        history = self._load(session_id)
+        with self._lock:
+            # Another request may have loaded it meanwhile; keep the first
+            history = self._sessions.setdefault(session_id, history)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._counts["evictions"] += 1
+        return history
+
+    async def aget(self, session_id: str) -> SessionHistory:
+        """Async version of `get`; only a miss touches the database, in a worker thread."""
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions.move_to_end(session_id)
+                self._counts["hits"] += 1
+                return self._sessions[session_id]
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, session_id)
+
+    def _load(self, session_id: str) -> SessionHistory:
+        history = SessionHistory(session_id, history_tokens=self.history_tokens)
+        # Not during a flush, whose writes would be in neither the database nor the queue
+        with self._flush_lock:
+            if self.session_factory is not None:
+                from app.models.database import Conversation, ConversationSummary
+                with self.session_factory() as db:
+                    row = db.query(ConversationSummary).filter(ConversationSummary.session_id == session_id).first()
+                    if row is not None:
+                        history.summary, history.summarized_turns = row.summary, row.turns
+                    rows = (db.query(Conversation)
+                            .filter(Conversation.session_id == session_id)
+                            .order_by(Conversation.id)
+                            .offset(history.summarized_turns)
+                            .all())
+                    history.turns = [Turn(r.user_message, r.agent_response) for r in rows]
+                self._counts["loads"] += 1
+            with self._lock:
+                # Queued writes from before the session was evicted
+                history.turns += [turn for sid, turn, _ in self._pending_turns if sid == session_id]
+                pending_summary = self._pending_summaries.get(session_id)
+        if pending_summary is not None:
+            summary, summarized = pending_summary
+            history.turns = history.turns[summarized - history.summarized_turns:]
+            history.summary, history.summarized_turns = summary, summarized
+        self._fold(history, self._take_overflow(history))
+        return history
+
+    def _take_overflow(self, history: SessionHistory) -> List[Turn]:
+        """Remove and return the oldest turns beyond the verbatim limits."""
+        with history.lock:
+            if history.compacting:
+                return []
+            overflow = []
+            while history.turns and (
+                len(history.turns) > self.recent_turns
+                or sum(estimate_tokens(turn.text) for turn in history.turns) > self.history_tokens
+            ):
+                overflow.append(history.turns.pop(0))
+            history.compacting = bool(overflow)
+            return overflow
+
+    def _apply(self, history: SessionHistory, overflow: List[Turn], summary: str) -> None:
+        with history.lock:
+            history.summary = summary
+            history.summarized_turns += len(overflow)
+            history.compacting = False
+        with self._lock:
+            self._pending_summaries[history.session_id] = (summary, history.summarized_turns)
+            self._counts["compactions"] += 1
+
+    @staticmethod
+    def _restore(history: SessionHistory, overflow: List[Turn]) -> None:
+        """Put turns back after a failed summary; the next turn retries."""
+        with history.lock:
+            history.turns[:0] = overflow
+            history.compacting = False
+
+    def _fold(self, history: SessionHistory, overflow: List[Turn]) -> None:
+        if not overflow:
+            return
+        try:
+            summary = self.summarizer.summarize(history.summary, overflow, self.summary_tokens)
+        except Exception:
+            self._restore(history, overflow)
+            raise
+        self._apply(history, overflow, summary)
+
+    def _record(self, history: SessionHistory, question: str, answer: str) -> List[Turn]:
+        turn = Turn(question, answer)
+        with history.lock:
+            history.turns.append(turn)
+        with self._lock:
+            self._pending_turns.append((history.session_id, turn, datetime.utcnow()))
+        return self._take_overflow(history)
+
+    def append(self, session_id: str, question: str, answer: str) -> None:
+        """Record a finished turn, compacting older turns if over the limits."""
+        history = self.get(session_id)
+        self._fold(history, self._record(history, question, answer))
+
+    async def aappend(self, session_id: str, question: str, answer: str) -> None:
+        """Async version of `append`."""
+        history = await self.aget(session_id)
+        overflow = self._record(history, question, answer)
+        if not overflow:
+            return
+        try:
+            summary = await self.summarizer.asummarize(history.summary, overflow, self.summary_tokens)
+        except Exception:
+            self._restore(history, overflow)
+            raise
+        self._apply(history, overflow, summary)
+
+    def flush(self) -> None:
+        """Write queued turns and summaries in one transaction."""
+        if self.session_factory is None:
+            return
+        from app.models.database import Conversation, ConversationSummary
+        with self._flush_lock:
+            with self._lock:
+                turns, self._pending_turns = self._pending_turns, []
+                summaries, self._pending_summaries = self._pending_summaries, {}
+            if not turns and not summaries:
+                return
+            try:
+                with self.session_factory() as db:
+                    db.add_all([
+                        Conversation(session_id=session_id, user_message=turn.question,
+                                     agent_response=turn.answer, created_at=created_at)
+                        for session_id, turn, created_at in turns
+                    ])
+                    existing = {
+                        row.session_id: row for row in db.query(ConversationSummary)
+                        .filter(ConversationSummary.session_id.in_(list(summaries))).all()
+                    } if summaries else {}
+                    for session_id, (summary, count) in summaries.items():
+                        row = existing.get(session_id) or ConversationSummary(session_id=session_id)
+                        row.summary, row.turns = summary, count
+                        db.add(row)
+                    db.commit()
+            except Exception:
+                # Keep them queued for the next flush, ahead of newer writes
+                with self._lock:
+                    self._pending_turns[:0] = turns
+                    for session_id, value in summaries.items():
+                        self._pending_summaries.setdefault(session_id, value)
+                raise
+            self._counts["written"] += len(turns)
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except Exception as e:
+                logger.warning("Failed to save conversations: %s", e)
+
+    async def start(self) -> None:
+        if self.session_factory is None or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await asyncio.get_running_loop().run_in_executor(None, self.flush)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, "sessions": len(self._sessions), "pending_turns": len(self._pending_turns)}
+
+@lru_cache()
+def get_conversation_memory() -> ConversationMemory:
+    """Get the process-wide conversation memory."""
+    from app.models.database import SessionLocal
+    return ConversationMemory(
+        SessionLocal,
+        summarizer=LLMSummarizer() if settings.SESSION_SUMMARY_MODE == "llm" else ExtractiveSummarizer(),
+        max_sessions=settings.SESSION_CACHE_SIZE,
+        recent_turns=settings.SESSION_RECENT_TURNS,
+        history_tokens=settings.SESSION_HISTORY_TOKENS,
+        summary_tokens=settings.SESSION_SUMMARY_TOKENS,
+        flush_interval=settings.SESSION_FLUSH_SECONDS
+    )
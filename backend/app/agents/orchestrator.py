@@ -1,20 +1,45 @@
-from typing import TypedDict, Annotated, Literal
+import asyncio
+import json
+import time
+from typing import TypedDict, Annotated, Literal, AsyncIterator, Optional, List
 from langgraph.graph import StateGraph, END
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
+from langchain.schema import Document
+from langchain.schema.runnable import RunnableLambda, RunnableParallel, RunnablePassthrough
 from app.core.config import get_settings
+from app.core.metrics import metrics, llm_metrics
+from app.core.tracing import tracer
 from app.agents.research_agent import ResearchAgent
 from app.agents.financial_agent import FinancialAgent
 from app.agents.summary_agent import SummaryAgent
+from app.agents.router import AGENT_TYPES, QueryRouter, SubQuestion
+from app.agents.answer_cache import get_answer_cache
+from app.agents.memory import SessionHistory
+from app.agents.batch import TokenBudget, dedupe_questions
+from app.rag.ingestion import estimate_tokens
+from app.rag.retrieval import get_retriever
 
 settings = get_settings()
 
+# Section headings when several agents answer parts of one question
+AGENT_LABELS = {"research": "Research", "financial": "Financial analysis", "summary": "Summary"}
+
 class AgentState(TypedDict):
     """State passed between agents in the graph."""
     question: str
     agent_type: str
     response: str
     context: str
+    context_stats: Optional[dict]
+    documents: List[Document]
+    cached: bool
+    filters: Optional[dict]
+    history: str
+    search_query: str
+    plan: List[SubQuestion]
+    branches: Optional[dict]
+    cache_generation: Optional[int]  # set once the answer cache has been checked and missed
 
 class OrchestratorAgent:
     """Orchestrator that routes queries to specialized agents using LangGraph."""
@@ -23,13 +48,29 @@ class OrchestratorAgent:
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0,
-            openai_api_key=settings.OPENAI_API_KEY
+            openai_api_key=settings.OPENAI_API_KEY,
+            callbacks=[llm_metrics]
         )
         
         # Initialize specialized agents
         self.research_agent = ResearchAgent()
         self.financial_agent = FinancialAgent()
         self.summary_agent = SummaryAgent()
+        self.agents = {
+            "research": self.research_agent,
+            "financial": self.financial_agent,
+            "summary": self.summary_agent
+        }
+        
+        # One retrieval per request; each agent packs its own context from the candidates
+        self.retriever = get_retriever()
+        self.retrieval_k = max(settings.CONTEXT_CANDIDATES, *(agent.top_k for agent in self.agents.values()))
+        
+        # Semantic answer cache, invalidated when documents change
+        self.answer_cache = get_answer_cache() if settings.ANSWER_CACHE_ENABLED else None
+        
+        # Local router; the LLM router below is only used when it is unsure
+        self.router = QueryRouter()
         
         # Create routing prompt
         self.router_prompt = ChatPromptTemplate.from_template("""
@@ -49,31 +90,261 @@ Agent:""")
         # Build the graph
         self.graph = self._build_graph()
     
-    def _route_question(self, state: AgentState) -> AgentState:
+    def _local_route(self, question: str) -> Optional[str]:
+        """Route without an LLM call, or return None if the LLM should decide."""
+        if settings.ROUTER_MODE == "llm":
+            return None
+        decision = self.router.route(question)
+        if settings.ROUTER_MODE == "local" or decision.confidence >= settings.ROUTER_CONFIDENCE_THRESHOLD:
+            return decision.agent_type
+        return None
+    
+    def _select_agent(self, state: AgentState) -> str:
         """Determine which agent should handle the question."""
-        response = self.llm.invoke(
-            self.router_prompt.format(question=state["question"])
-        )
-        agent_type = response.content.strip().lower()
+        with metrics.stage("route"), tracer.span("route") as span:
+            agent_type = self._local_route(state["question"])
+            if agent_type is None:
+                response = self.llm.invoke(
+                    self.router_prompt.format(question=state["question"])
+                )
+                agent_type = self._parse_agent_type(response.content)
+            span.update(output={"agent": agent_type})
+        return agent_type
+    
+    async def _aselect_agent(self, state: AgentState) -> str:
+        """Async version of `_select_agent`."""
+        with metrics.stage("route"), tracer.span("route") as span:
+            agent_type = self._local_route(state["question"])
+            if agent_type is None:
+                response = await self.llm.ainvoke(
+                    self.router_prompt.format(question=state["question"])
+                )
+                agent_type = self._parse_agent_type(response.content)
+            span.update(output={"agent": agent_type})
+        return agent_type
+    
+    def _plan(self, state: AgentState) -> List[SubQuestion]:
+        """Agents to ask: one for most questions, one per part of a compound question."""
+        parts = self.router.decompose(state["question"]) if settings.MULTI_AGENT_ENABLED else []
+        if not parts:
+            return [SubQuestion(self._select_agent(state), state["question"])]
+        with tracer.span("route") as span:
+            span.update(output={"agents": [part.agent_type for part in parts]})
+        return parts
+    
+    async def _aplan(self, state: AgentState) -> List[SubQuestion]:
+        """Async version of `_plan`."""
+        parts = self.router.decompose(state["question"]) if settings.MULTI_AGENT_ENABLED else []
+        if not parts:
+            return [SubQuestion(await self._aselect_agent(state), state["question"])]
+        with tracer.span("route") as span:
+            span.update(output={"agents": [part.agent_type for part in parts]})
+        return parts
+    
+    @staticmethod
+    def _plan_label(plan: List[SubQuestion]) -> str:
+        """``agent_used`` for a plan, e.g. ``financial+summary``."""
+        return "+".join(sorted({part.agent_type for part in plan}, key=AGENT_TYPES.index))
+    
+    @staticmethod
+    def _plan_agents(state: AgentState) -> List[str]:
+        """Agents that answered, one per branch; recorded in metrics instead of the combined label."""
+        return [part.agent_type for part in state.get("plan") or []] or [state["agent_type"]]
+    
+    def _retrieve(self, state: AgentState) -> List[Document]:
+        """Retrieve once for whichever agent is selected."""
+        with metrics.stage("retrieve"), tracer.span("retrieve", input={"filters": state["filters"]}) as span:
+            documents = self.retriever.search(state["search_query"], k=self.retrieval_k, filters=state["filters"])
+            span.update(output={"documents": len(documents)})
+        return documents
+    
+    async def _aretrieve(self, state: AgentState) -> List[Document]:
+        """Async version of `_retrieve`."""
+        with metrics.stage("retrieve"), tracer.span("retrieve", input={"filters": state["filters"]}) as span:
+            documents = await self.retriever.asearch(state["search_query"], k=self.retrieval_k, filters=state["filters"])
+            span.update(output={"documents": len(documents)})
+        return documents
+    
+    def _prepare(self, state: AgentState) -> AgentState:
+        """Route, check the answer cache, and retrieve only on a miss."""
+        state["plan"] = self._plan(state)
+        state["agent_type"] = self._plan_label(state["plan"])
+        if len(state["plan"]) == 1 and self._cached_answer(state):
+            return state
+        state["documents"] = self._retrieve(state)
+        return state
+    
+    async def _aprepare(self, state: AgentState) -> AgentState:
+        """Async version of `_prepare`, retrieving while routing and cancelling on a cache hit."""
+        # Routing and retrieval are independent, so run them concurrently:
+        # latency is max(route, retrieve) + generate rather than the sum
+        retrieval = asyncio.ensure_future(self._aretrieve(state))
+        try:
+            state["plan"] = await self._aplan(state)
+            state["agent_type"] = self._plan_label(state["plan"])
+            if len(state["plan"]) == 1 and await self._acached_answer(state):
+                retrieval.cancel()
+                return state
+        except BaseException:
+            retrieval.cancel()
+            raise
+        state["documents"] = await retrieval
+        return state
+    
+    @staticmethod
+    def _next_node(state: AgentState) -> str:
+        if state["cached"]:
+            return "cached"
+        return "compound" if len(state["plan"]) > 1 else "single"
+    
+    @staticmethod
+    def _branch_state(state: AgentState, part: SubQuestion) -> AgentState:
+        """State for one agent's part of a compound question, sharing its documents."""
+        return {
+            **state,
+            "question": f"{part.question} (part of the question: \"{state['question']}\")",
+            "agent_type": part.agent_type,
+            "response": "",
+            "context": "",
+            "context_stats": None,
+            "cached": False,
+            "plan": [part],
+            "branches": None,
+            "cache_generation": None
+        }
+    
+    def _branch(self, agent_type: str) -> RunnableLambda:
+        """Answer the plan's part for ``agent_type``, or return None if it has none."""
+        def part_for(state: AgentState) -> Optional[SubQuestion]:
+            return next((part for part in state["plan"] if part.agent_type == agent_type), None)
         
-        # Validate agent type
-        if agent_type not in ["research", "financial", "summary"]:
-            agent_type = "research"  # Default fallback
+        def run(state: AgentState) -> Optional[AgentState]:
+            part = part_for(state)
+            return self._call_agent(self._branch_state(state, part)) if part else None
         
-        state["agent_type"] = agent_type
+        async def arun(state: AgentState) -> Optional[AgentState]:
+            part = part_for(state)
+            return await self._acall_agent(self._branch_state(state, part)) if part else None
+        
+        return RunnableLambda(run, afunc=arun)
+    
+    def _collect_branches(self, results: dict) -> AgentState:
+        state = results["state"]
+        state["branches"] = {agent_type: results[agent_type] for agent_type in self.agents}
         return state
     
+    def _merge(self, state: AgentState) -> AgentState:
+        """Combine the branches' answers in the order the question asked for them."""
+        return self._combine_branches(state, [state["branches"][part.agent_type] for part in state["plan"]])
+    
+    @classmethod
+    def _combine_branches(cls, state: AgentState, branches: List[AgentState]) -> AgentState:
+        state["response"] = "\n\n".join(
+            f"{AGENT_LABELS[branch['agent_type']]}:\n{branch['response']}" for branch in branches
+        )
+        state["context"] = "\n\n".join(branch["context"] for branch in branches if branch["context"])
+        state["cached"] = all(branch["cached"] for branch in branches)
+        stats = [branch["context_stats"] for branch in branches if branch["context_stats"]]
+        state["context_stats"] = cls._sum_stats(stats) if stats else None
+        return state
+    
+    @staticmethod
+    def _sum_stats(stats: List[dict]) -> dict:
+        """Context sizes of several agents' prompts, added up."""
+        return {key: sum(item[key] for item in stats) for key in stats[0]}
+    
+    @staticmethod
+    def _cache_scope(agent_type: str, filters: Optional[dict]) -> str:
+        """Answers to filtered questions are only reused under the same filters."""
+        if not filters:
+            return agent_type
+        return f"{agent_type}|{json.dumps(filters, sort_keys=True)}"
+    
+    @staticmethod
+    def _parse_agent_type(content: str) -> str:
+        """Validate the router's answer, defaulting to the research agent."""
+        agent_type = content.strip().lower()
+        if agent_type not in ["research", "financial", "summary"]:
+            agent_type = "research"  # Default fallback
+        return agent_type
+    
+    def _answer_cache_for(self, state: AgentState):
+        # A follow-up's answer depends on the conversation, so it is neither reused nor cached
+        return self.answer_cache if not state["history"] else None
+    
+    def _cached_answer(self, state: AgentState) -> bool:
+        """Answer from the cache if it can; on a miss, note the generation to store under."""
+        answer_cache = self._answer_cache_for(state)
+        if not answer_cache:
+            return False
+        cached = answer_cache.lookup(self._cache_scope(state["agent_type"], state["filters"]), state["question"])
+        if cached is not None:
+            state["response"] = cached
+            state["cached"] = True
+            return True
+        state["cache_generation"] = answer_cache.generation
+        return False
+    
+    async def _acached_answer(self, state: AgentState) -> bool:
+        """Async version of `_cached_answer`."""
+        answer_cache = self._answer_cache_for(state)
+        if not answer_cache:
+            return False
+        cached = await answer_cache.alookup(self._cache_scope(state["agent_type"], state["filters"]), state["question"])
+        if cached is not None:
+            state["response"] = cached
+            state["cached"] = True
+            return True
+        state["cache_generation"] = answer_cache.generation
+        return False
+    
     def _call_agent(self, state: AgentState) -> AgentState:
         """Call the appropriate specialized agent."""
         question = state["question"]
         agent_type = state["agent_type"]
+        scope = self._cache_scope(agent_type, state["filters"])
+        answer_cache = self._answer_cache_for(state)
         
-        if agent_type == "financial":
-            response = self.financial_agent.analyze(question)
-        elif agent_type == "summary":
-            response = self.summary_agent.summarize(question)
-        else:  # research
-            response = self.research_agent.ask(question)
+        # Single questions were already looked up before retrieval
+        if state["cache_generation"] is None and self._cached_answer(state):
+            return state
+        generation = state["cache_generation"]
+        
+        agent = self.agents[agent_type]
+        with metrics.stage("generate"), tracer.span("generate", metadata={"agent": agent_type}) as span:
+            context = agent.build_context(state["documents"])
+            state["context"] = context.text
+            state["context_stats"] = self._context_stats(context, state["history"])
+            response = agent.answer(question, context, state["history"])
+            span.update(output={"context": state["context_stats"]})
+        
+        if answer_cache:
+            answer_cache.store(scope, question, response, generation)
+        
+        state["response"] = response
+        return state
+    
+    async def _acall_agent(self, state: AgentState) -> AgentState:
+        """Async version of `_call_agent`."""
+        question = state["question"]
+        agent_type = state["agent_type"]
+        scope = self._cache_scope(agent_type, state["filters"])
+        answer_cache = self._answer_cache_for(state)
+        
+        if state["cache_generation"] is None and await self._acached_answer(state):
+            return state
+        generation = state["cache_generation"]
+        
+        agent = self.agents[agent_type]
+        with metrics.stage("generate"), tracer.span("generate", metadata={"agent": agent_type}) as span:
+            context = agent.build_context(state["documents"])
+            state["context"] = context.text
+            state["context_stats"] = self._context_stats(context, state["history"])
+            response = await agent.aanswer(question, context, state["history"])
+            span.update(output={"context": state["context_stats"]})
+        
+        if answer_cache:
+            await answer_cache.astore(scope, question, response, generation)
         
         state["response"] = response
         return state
@@ -82,30 +353,354 @@ Agent:""")
         """Build the LangGraph workflow."""
         workflow = StateGraph(AgentState)
         
-        # Add nodes
-        workflow.add_node("router", self._route_question)
-        workflow.add_node("agent", self._call_agent)
+        # Compound questions run one branch per agent concurrently over the same
+        # documents, so latency is the slowest branch rather than the sum
+        fan_out = RunnableParallel(
+            state=RunnablePassthrough(),
+            **{agent_type: self._branch(agent_type) for agent_type in self.agents}
+        ) | RunnableLambda(self._collect_branches)
+        
+        # Add nodes (sync and async implementations, so both invoke and ainvoke work)
+        workflow.add_node("prepare", RunnableLambda(self._prepare, afunc=self._aprepare))
+        workflow.add_node("agent", RunnableLambda(self._call_agent, afunc=self._acall_agent))
+        workflow.add_node("fan_out", fan_out)
+        workflow.add_node("merge", RunnableLambda(self._merge))
         
         # Add edges
-        workflow.set_entry_point("router")
-        workflow.add_edge("router", "agent")
+        workflow.set_entry_point("prepare")
+        # A cache hit is answered in prepare, before retrieval
+        workflow.add_conditional_edges(
+            "prepare", self._next_node, {"cached": END, "single": "agent", "compound": "fan_out"}
+        )
         workflow.add_edge("agent", END)
+        workflow.add_edge("fan_out", "merge")
+        workflow.add_edge("merge", END)
         
         return workflow.compile()
     
-    def process(self, question: str) -> dict:
-        """Process a question through the multi-agent system."""
-        initial_state = {
+    @staticmethod
+    def _initial_state(question: str, filters: Optional[dict] = None,
+                       history: Optional[SessionHistory] = None) -> AgentState:
+        return {
             "question": question,
             "agent_type": "",
             "response": "",
-            "context": ""
+            "context": "",
+            "context_stats": None,
+            "documents": [],
+            "cached": False,
+            "filters": {key: value for key, value in (filters or {}).items() if value is not None},
+            "history": history.render() if history else "",
+            "search_query": history.search_query(question) if history else question,
+            "plan": [],
+            "branches": None,
+            "cache_generation": None
         }
-        
-        result = self.graph.invoke(initial_state)
-        
+    
+    @staticmethod
+    def _context_stats(context, history: str) -> dict:
+        return {**context.stats(), "history_tokens": estimate_tokens(history) if history else 0}
+    
+    @staticmethod
+    def _format_result(result: AgentState) -> dict:
         return {
             "question": result["question"],
             "agent_used": result["agent_type"],
-            "response": result["response"]
+            "response": result["response"],
+            "cached": result["cached"],
+            "context": result["context_stats"]
         }
+    
+    def process(self, question: str, filters: Optional[dict] = None,
+                history: Optional[SessionHistory] = None) -> dict:
+        """Process a question through the multi-agent system.
+        
+        ``filters`` restricts retrieval to chunks with matching metadata,
+        e.g. ``{"ticker": "TSLA", "fiscal_year": 2024}``. ``history`` is the
+        session's conversation so far, used for follow-up questions.
+        """
+        start = time.perf_counter()
+        try:
+            result = self.graph.invoke(self._initial_state(question, filters, history))
+        except Exception:
+            metrics.record_query(None, time.perf_counter() - start, error=True)
+            raise
+        metrics.record_query(self._plan_agents(result), time.perf_counter() - start, cached=result["cached"])
+        return self._format_result(result)
+    
+    async def aprocess(self, question: str, filters: Optional[dict] = None,
+                       history: Optional[SessionHistory] = None) -> dict:
+        """Process a question without blocking the event loop."""
+        start = time.perf_counter()
+        try:
+            result = await self.graph.ainvoke(self._initial_state(question, filters, history))
+        except Exception:
+            metrics.record_query(None, time.perf_counter() - start, error=True)
+            raise
+        metrics.record_query(self._plan_agents(result), time.perf_counter() - start, cached=result["cached"])
+        return self._format_result(result)
+    
+    async def astream(self, question: str, filters: Optional[dict] = None,
+                      history: Optional[SessionHistory] = None) -> AsyncIterator[dict]:
+        """Stream a question through the multi-agent system as events.
+        
+        Yields ``route`` (selected agent) and ``sources`` (the passages in the
+        context, with its token count) before the answer, then one ``token``
+        event per generated chunk and a final ``done`` event.
+        """
+        start = time.perf_counter()
+        try:
+            async for event in self._astream(question, filters, history):
+                if event["event"] == "done":
+                    # agent_used joins the agents of a compound question with "+"
+                    metrics.record_query(event["data"]["agent_used"].split("+"), time.perf_counter() - start,
+                                         cached=event["data"]["cached"])
+                yield event
+        except Exception:
+            metrics.record_query(None, time.perf_counter() - start, error=True)
+            raise
+    
+    async def _astream(self, question: str, filters: Optional[dict],
+                       history: Optional[SessionHistory]) -> AsyncIterator[dict]:
+        state = self._initial_state(question, filters, history)
+        retrieval = asyncio.ensure_future(self._aretrieve(state))
+        try:
+            plan = await self._aplan(state)
+        except BaseException:
+            retrieval.cancel()
+            raise
+        agent_type = self._plan_label(plan)
+        yield {"event": "route", "data": {"agent_used": agent_type}}
+        if len(plan) > 1:
+            async for event in self._astream_branches(state, plan, retrieval):
+                yield event
+            return
+        scope = self._cache_scope(agent_type, state["filters"])
+        answer_cache = self.answer_cache if not state["history"] else None
+        
+        if answer_cache:
+            cached = await answer_cache.alookup(scope, question)
+            if cached is not None:
+                retrieval.cancel()
+                yield {"event": "sources", "data": {"sources": [], "context": None}}
+                yield {"event": "token", "data": {"text": cached}}
+                yield {"event": "done", "data": {"agent_used": agent_type, "cached": True}}
+                return
+            generation = answer_cache.generation
+        
+        agent = self.agents[agent_type]
+        documents = await retrieval
+        with tracer.span("generate", metadata={"agent": agent_type}) as span:
+            context = agent.build_context(documents)
+            stats = self._context_stats(context, state["history"])
+            span.update(output={"context": stats})
+            yield {"event": "sources", "data": {
+                "sources": self._describe_sources(context.documents),
+                "context": stats
+            }}
+            
+            # The stage times the model alone; waiting for the client to take each token is excluded
+            tokens = []
+            async for token in metrics.atimed("generate", agent.astream_answer(question, context, state["history"])):
+                tokens.append(token)
+                yield {"event": "token", "data": {"text": token}}
+        
+        if answer_cache:
+            await answer_cache.astore(scope, question, "".join(tokens), generation)
+        
+        yield {"event": "done", "data": {"agent_used": agent_type, "cached": False}}
+    
+    async def astream_batch(self, questions: List[str], filters: Optional[dict] = None,
+                            concurrency: Optional[int] = None,
+                            token_budget: Optional[int] = None) -> AsyncIterator[dict]:
+        """Answer many independent questions, yielding each answer as it finishes.
+        
+        Identical questions are answered once. Retrieval is done for all of
+        them in bulk (one embedding batch, one vector query) while they are
+        routed; questions are then routed and answered concurrently, at most
+        ``concurrency`` at a time and with at most ``token_budget`` estimated
+        prompt tokens of generation in flight. Yields a
+        ``result`` (or ``error``) event per unique question, carrying the
+        ``indices`` of the questions it answers, then a final ``done``.
+        """
+        start = time.perf_counter()
+        groups = dedupe_questions(questions)
+        states = [self._initial_state(question, filters) for question, _ in groups]
+        limit = asyncio.Semaphore(concurrency or settings.BATCH_CONCURRENCY)
+        budget = TokenBudget(token_budget or settings.BATCH_TOKEN_BUDGET)
+        
+        async def answer(position: int) -> tuple:
+            state = states[position]
+            # Timed from when the question gets a slot, not from the start of the batch,
+            # so recorded latencies do not grow with the number of questions queued ahead
+            question_start = None
+            try:
+                # Route (an LLM call when the local router is unsure) and generate in one slot,
+                # so each question is answered as soon as the shared retrieval is done
+                async with limit:
+                    question_start = time.perf_counter()
+                    state["plan"] = await self._aplan(state)
+                    state["agent_type"] = self._plan_label(state["plan"])
+                    if len(state["plan"]) == 1:
+                        # A cache hit needs no documents, so it does not wait for the shared retrieval
+                        if not await self._acached_answer(state):
+                            state["documents"] = (await retrieval)[position]
+                            await self._abatch_answer(state, budget)
+                    else:
+                        state["documents"] = (await retrieval)[position]
+                        branches = [self._branch_state(state, part) for part in state["plan"]]
+                        await asyncio.gather(*[self._abatch_answer(branch, budget) for branch in branches])
+                        self._combine_branches(state, branches)
+            except Exception as e:
+                metrics.record_query(self._plan_agents(state) if state["agent_type"] else None,
+                                     time.perf_counter() - (question_start or time.perf_counter()), error=True)
+                return position, e
+            metrics.record_query(self._plan_agents(state), time.perf_counter() - question_start, cached=state["cached"])
+            return position, None
+        
+        retrieval = asyncio.ensure_future(self._aretrieve_many(states))
+        tasks = [asyncio.ensure_future(answer(position)) for position in range(len(states))]
+        counts = {"answered": 0, "failed": 0, "cached": 0}
+        try:
+            for finished in asyncio.as_completed(tasks):
+                position, error = await finished
+                indices = groups[position][1]
+                if error is not None:
+                    counts["failed"] += 1
+                    yield {"event": "error", "data": {
+                        "indices": indices, "question": states[position]["question"], "detail": str(error)
+                    }}
+                    continue
+                counts["answered"] += 1
+                counts["cached"] += states[position]["cached"]
+                yield {"event": "result", "data": {"indices": indices, **self._format_result(states[position])}}
+        finally:
+            # Stops outstanding work if the client disconnects mid-batch
+            for task in (retrieval, *tasks):
+                task.cancel()
+        
+        yield {"event": "done", "data": {
+            "questions": len(questions),
+            "unique": len(states),
+            **counts,
+            "peak_prompt_tokens": budget.peak,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+        }}
+    
+    async def _aretrieve_many(self, states: List[AgentState]) -> List[List[Document]]:
+        """`_aretrieve` for a batch of questions sharing the same filters."""
+        filters = states[0]["filters"] if states else None
+        with metrics.stage("batch_retrieve"), tracer.span(
+            "retrieve", input={"queries": len(states), "filters": filters}
+        ) as span:
+            documents = await self.retriever.asearch_many(
+                [state["search_query"] for state in states], k=self.retrieval_k, filters=filters
+            )
+            span.update(output={"documents": sum(len(found) for found in documents)})
+        return documents
+    
+    async def _abatch_answer(self, state: AgentState, budget: TokenBudget) -> None:
+        """`_acall_agent` for one question of a batch, within the batch's limits."""
+        question = state["question"]
+        agent_type = state["agent_type"]
+        scope = self._cache_scope(agent_type, state["filters"])
+        
+        if state["cache_generation"] is None and await self._acached_answer(state):
+            return
+        generation = state["cache_generation"]
+        
+        agent = self.agents[agent_type]
+        context = agent.build_context(state["documents"])
+        state["context"] = context.text
+        state["context_stats"] = self._context_stats(context, "")
+        async with budget.reserve(context.tokens + estimate_tokens(question)):
+            with metrics.stage("generate"), tracer.span("generate", metadata={"agent": agent_type}) as span:
+                response = await agent.aanswer(question, context)
+                span.update(output={"context": state["context_stats"]})
+        
+        if self.answer_cache:
+            await self.answer_cache.astore(scope, question, response, generation)
+        
+        state["response"] = response
+    
+    async def _astream_branches(self, state: AgentState, plan: List[SubQuestion],
+                                retrieval: asyncio.Future) -> AsyncIterator[dict]:
+        """Stream a compound question's parts, generated concurrently.
+        
+        The first part's tokens stream as they arrive; later parts are
+        buffered meanwhile and follow, each under its heading.
+        """
+        documents = await retrieval
+        branches = []
+        for part in plan:
+            branch = self._branch_state(state, part)
+            agent = self.agents[part.agent_type]
+            context = agent.build_context(documents)
+            branch["context_stats"] = self._context_stats(context, state["history"])
+            branches.append((branch, agent, context))
+        
+        sources, seen = [], set()
+        for _, _, context in branches:
+            for source in self._describe_sources(context.documents):
+                key = (source["source"], source["page"], source["preview"])
+                if key not in seen:
+                    seen.add(key)
+                    sources.append(source)
+        yield {"event": "sources", "data": {
+            "sources": sources,
+            "context": self._sum_stats([branch["context_stats"] for branch, _, _ in branches])
+        }}
+        
+        async def generate(branch: AgentState, agent, context, queue: asyncio.Queue) -> None:
+            scope = self._cache_scope(branch["agent_type"], branch["filters"])
+            answer_cache = self.answer_cache if not branch["history"] else None
+            try:
+                if answer_cache:
+                    cached = await answer_cache.alookup(scope, branch["question"])
+                    if cached is not None:
+                        branch["cached"] = True
+                        queue.put_nowait(cached)
+                        return
+                    generation = answer_cache.generation
+                tokens = []
+                with metrics.stage("generate"), tracer.span("generate", metadata={"agent": branch["agent_type"]}) as span:
+                    span.update(output={"context": branch["context_stats"]})
+                    async for token in agent.astream_answer(branch["question"], context, branch["history"]):
+                        tokens.append(token)
+                        queue.put_nowait(token)
+                if answer_cache:
+                    await answer_cache.astore(scope, branch["question"], "".join(tokens), generation)
+            finally:
+                queue.put_nowait(None)
+        
+        queues = [asyncio.Queue() for _ in branches]
+        tasks = [
+            asyncio.ensure_future(generate(branch, agent, context, queue))
+            for (branch, agent, context), queue in zip(branches, queues)
+        ]
+        try:
+            for position, ((branch, _, _), queue, task) in enumerate(zip(branches, queues, tasks)):
+                heading = f"{AGENT_LABELS[branch['agent_type']]}:\n"
+                yield {"event": "token", "data": {"text": heading if not position else f"\n\n{heading}"}}
+                while (token := await queue.get()) is not None:
+                    yield {"event": "token", "data": {"text": token}}
+                await task
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        yield {"event": "done", "data": {
+            "agent_used": self._plan_label(plan),
+            "cached": all(branch["cached"] for branch, _, _ in branches)
+        }}
+    
+    @staticmethod
+    def _describe_sources(docs: list) -> list[dict]:
+        return [
+            {
+                "source": doc.metadata.get("source", "unknown"),
+                "page": doc.metadata.get("page"),
+                "preview": doc.page_content[:200]
+            }
+            for doc in docs
+        ]
@@ -0,0 +1,150 @@
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+import numpy as np
+from app.agents.routing_examples import TRAINING_EXAMPLES
+from app.rag.embeddings import HashingEmbeddings
+
+AGENT_TYPES = ("research", "financial", "summary")
+
+# Phrases that strongly indicate an agent; "research" is the default
+KEYWORDS = {
+    "financial": [
+        "calculate", "compute", "ratio", "margin", "percentage", "percent",
+        "growth rate", "cagr", "return on", "per share", "multiple", "basis points",
+    ],
+    "summary": [
+        "summarize", "summarise", "summary", "overview", "key points", "highlights",
+        "takeaways", "executive brief", "recap", "tl;dr", "synopsis", "digest",
+    ],
+}
+
+# Words that open a new request inside a compound question
+CLAUSE_CUES = [
+    "calculate", "compute", "work out", "estimate", "determine", "summarize", "summarise",
+    "give", "list", "provide", "explain", "describe", "compare", "show", "tell", "find",
+    "what", "how", "which", "who", "when", "where", "why",
+]
+
+# Clause boundaries: sentence ends and semicolons, or "and"/"then"/"also"
+# when followed by one of the cues above
+CLAUSE_BOUNDARY = re.compile(
+    r"[?.;]\s+|,?\s+(?:and then|and also|and|then|also|plus)\s+(?=(?:"
+    + "|".join(CLAUSE_CUES) + r")\b)",
+    re.IGNORECASE
+)
+# Whole words or phrases only: "ratio" must not match "corporation" or "operations"
+KEYWORD_PATTERNS = {
+    agent_type: re.compile(r"\b(?:" + "|".join(re.escape(word) for word in words) + r")s?\b", re.IGNORECASE)
+    for agent_type, words in KEYWORDS.items()
+}
+
+LEADING_CONNECTIVE = re.compile(r"^(?:and then|and also|and|then|also|plus)\s+", re.IGNORECASE)
+# Later clauses that lean on an earlier one for their subject ("how does it compare",
+# "explain what drove the change") cannot be answered on their own
+ANAPHORA = re.compile(
+    r"\b(?:it|its|they|them|their|this|that|these|those)\b|"
+    r"\bthe (?:change|changes|difference|increase|decrease|decline|same|result|results|figure|figures|"
+    r"number|numbers|growth rate)\b",
+    re.IGNORECASE
+)
+
+@dataclass
+class RouteDecision:
+    """Agent selected for a question and how sure the router is."""
+    agent_type: str
+    confidence: float
+    method: str
+
+@dataclass
+class SubQuestion:
+    """Part of a compound question and the agent that should answer it."""
+    agent_type: str
+    question: str
+
+class QueryRouter:
+    """Local, zero-LLM router combining keyword rules with a centroid classifier.
+
+    Questions are embedded with hashed n-gram features and compared with the
+    centroid of each agent's labelled examples. Keyword matches add a fixed
+    boost to their agent's score, and a softmax over the scores gives the
+    confidence used to decide whether the LLM router is still needed.
+    """
+
+    def __init__(
+        self,
+        examples: Iterable[tuple] = TRAINING_EXAMPLES,
+        keyword_boost: float = 0.3,
+        temperature: float = 0.1
+    ):
+        self.featurizer = HashingEmbeddings(dim=1024)
+        self.keyword_boost = keyword_boost
+        self.temperature = temperature
+        self.centroids = self._fit(list(examples))
+
+    def _fit(self, examples: list) -> np.ndarray:
+        texts = [text for text, _ in examples]
+        labels = np.array([label for _, label in examples])
+        vectors = np.array(self.featurizer.embed_documents(texts), dtype=np.float32)
+
+        centroids = np.zeros((len(AGENT_TYPES), vectors.shape[1]), dtype=np.float32)
+        for i, agent_type in enumerate(AGENT_TYPES):
+            members = vectors[labels == agent_type]
+            if len(members):
+                centroid = members.mean(axis=0)
+                centroids[i] = centroid / (np.linalg.norm(centroid) or 1.0)
+        return centroids
+
+    def keyword_match(self, question: str) -> Optional[str]:
+        """Return the agent whose keywords appear in the question, if exactly one does."""
+        matches = [agent_type for agent_type, pattern in KEYWORD_PATTERNS.items() if pattern.search(question)]
+        return matches[0] if len(matches) == 1 else None
+
+    def route(self, question: str) -> RouteDecision:
+        """Pick an agent locally and report the confidence of the choice."""
+        vector = np.array(self.featurizer.embed_query(question), dtype=np.float32)
+        scores = self.centroids @ vector
+
+        keyword_agent = self.keyword_match(question)
+        if keyword_agent:
+            scores[AGENT_TYPES.index(keyword_agent)] += self.keyword_boost
+
+        weights = np.exp((scores - scores.max()) / self.temperature)
+        probabilities = weights / weights.sum()
+        best = int(np.argmax(probabilities))
+
+        return RouteDecision(
+            agent_type=AGENT_TYPES[best],
+            confidence=float(probabilities[best]),
+            method="keyword" if keyword_agent == AGENT_TYPES[best] else "classifier"
+        )
+
+    def decompose(self, question: str, min_confidence: float = 0.8) -> List[SubQuestion]:
+        """Split a compound question into parts for different agents.
+
+        A clause is routed when its keywords name an agent or the classifier
+        picks one with at least ``min_confidence``; other clauses stay with
+        the routed clause before them (or the first one after). The question
+        is only split when routed clauses name at least two agents and no
+        later clause refers back to an earlier one ("how does it compare");
+        otherwise, or for a single clause, an empty list keeps it whole.
+        Clauses for the same agent are joined back together, in question order.
+        """
+        clauses = [LEADING_CONNECTIVE.sub("", clause.strip(" ,")) for clause in CLAUSE_BOUNDARY.split(question)]
+        clauses = [clause for clause in clauses if clause]
+        if len(clauses) < 2 or any(ANAPHORA.search(clause) for clause in clauses[1:]):
+            return []
+        routed = []
+        for clause in clauses:
+            decision = self.route(clause)
+            confident = decision.method == "keyword" or decision.confidence >= min_confidence
+            routed.append(decision.agent_type if confident else None)
+        if len({agent_type for agent_type in routed if agent_type}) < 2:
+            return []
+        # Unrouted clauses follow the nearest routed one, preferring the one before
+        first = next(agent_type for agent_type in routed if agent_type)
+        parts: dict = {}
+        for clause, agent_type in zip(clauses, routed):
+            first = agent_type or first
+            parts.setdefault(first, []).append(clause)
+        return [SubQuestion(agent_type, "; ".join(found)) for agent_type, found in parts.items()]
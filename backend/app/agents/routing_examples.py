@@ -0,0 +1,67 @@
+"""Labelled questions used to train the local query router."""
+
+TRAINING_EXAMPLES = [
+    # research
+    ("What was Tesla's Q4 2024 revenue?", "research"),
+    ("How many vehicles did the company deliver last quarter?", "research"),
+    ("Who is the chief financial officer?", "research"),
+    ("When does the fiscal year end?", "research"),
+    ("What risks does the company disclose about supply chains?", "research"),
+    ("What was the free cash flow for the quarter?", "research"),
+    ("Which segments does the company report?", "research"),
+    ("What guidance did management give for next year?", "research"),
+    ("How much debt does the company have outstanding?", "research"),
+    ("What did the report say about share buybacks?", "research"),
+    ("Where is the company headquartered?", "research"),
+    ("What was the dividend per share?", "research"),
+    ("Did the company mention any acquisitions?", "research"),
+    ("What was net income in 2023?", "research"),
+    ("What is the company's strategy in China?", "research"),
+    ("How many employees does the company have?", "research"),
+    ("What were the capital expenditures this year?", "research"),
+    ("What does the filing say about litigation?", "research"),
+    ("Which auditor signed the annual report?", "research"),
+    ("What was reported for research and development spending?", "research"),
+    # financial
+    ("Calculate the operating margin for Q4.", "financial"),
+    ("Compute the gross margin from revenue and cost of sales.", "financial"),
+    ("What is the debt to equity ratio?", "financial"),
+    ("What is the year-over-year revenue growth rate?", "financial"),
+    ("Work out the return on equity.", "financial"),
+    ("What percentage of revenue was spent on R&D?", "financial"),
+    ("Compare net margin between 2023 and 2024.", "financial"),
+    ("How much did earnings per share increase in percent?", "financial"),
+    ("What is the current ratio based on the balance sheet?", "financial"),
+    ("Calculate free cash flow as a share of revenue.", "financial"),
+    ("What is the compound annual growth rate of revenue over three years?", "financial"),
+    ("Compute the interest coverage ratio.", "financial"),
+    ("By how much did operating expenses grow quarter over quarter?", "financial"),
+    ("What is the price to earnings multiple?", "financial"),
+    ("Derive EBITDA margin from the income statement.", "financial"),
+    ("What is the quick ratio?", "financial"),
+    ("Estimate the payout ratio from dividends and net income.", "financial"),
+    ("What is the difference between gross and operating margin in basis points?", "financial"),
+    ("Calculate revenue per vehicle delivered.", "financial"),
+    ("How did the margin change versus the prior quarter?", "financial"),
+    # summary
+    ("Summarize the quarterly results.", "summary"),
+    ("Give me an overview of the annual report.", "summary"),
+    ("What are the key points from the earnings call?", "summary"),
+    ("Write an executive brief of the 10-K.", "summary"),
+    ("Provide a summary of the risk factors.", "summary"),
+    ("Give me the highlights of this filing.", "summary"),
+    ("Condense the management discussion into bullet points.", "summary"),
+    ("What are the main takeaways for investors?", "summary"),
+    ("Recap the financial performance this year.", "summary"),
+    ("Briefly describe the outlook section.", "summary"),
+    ("TL;DR of the shareholder letter.", "summary"),
+    ("Summarise the company's strategy and priorities.", "summary"),
+    ("Prepare a one-paragraph overview for the board.", "summary"),
+    ("List the key insights from the report.", "summary"),
+    ("Give a high-level summary of segment performance.", "summary"),
+    ("Outline the most important developments this quarter.", "summary"),
+    ("Create a short digest of the quarterly update.", "summary"),
+    ("What are the headline numbers and themes?", "summary"),
+    ("Condense this document into a stakeholder update.", "summary"),
+    ("Give me a synopsis of the results.", "summary"),
+]
@@ -1,9 +1,13 @@
+from typing import AsyncIterator, List
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
-from langchain.schema.runnable import RunnablePassthrough
+from langchain.schema.runnable import RunnablePassthrough, RunnableLambda
 from langchain.schema.output_parser import StrOutputParser
+from langchain.schema import Document
 from app.core.config import get_settings
-from app.rag.vector_store import get_vector_store
+from app.core.metrics import llm_metrics
+from app.rag.context import ContextBuilder, ContextResult
+from app.rag.retrieval import get_retriever
 
 settings = get_settings()
 
@@ -14,16 +18,19 @@ class SummaryAgent:
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.3,
-            openai_api_key=settings.OPENAI_API_KEY
+            openai_api_key=settings.OPENAI_API_KEY,
+            callbacks=[llm_metrics]
         )
-        self.vector_store = get_vector_store()
+        self.retriever = get_retriever()
+        self.top_k = 5
+        self.context_builder = ContextBuilder(settings.SUMMARY_CONTEXT_TOKENS, settings.CONTEXT_MMR_LAMBDA)
         
         self.prompt = ChatPromptTemplate.from_template("""
 You are an executive summary specialist. Create clear, concise summaries.
 
 Content to summarize:
 {context}
-
+{history}
 Task: {question}
 
 Instructions:
@@ -35,18 +42,61 @@ Instructions:
 
 Summary:""")
         
+        self.answer_chain = self.prompt | self.llm | StrOutputParser()
         self.chain = (
-            {"context": self._get_context, "question": RunnablePassthrough()}
-            | self.prompt
-            | self.llm
-            | StrOutputParser()
+            {
+                "context": RunnableLambda(self._get_context, afunc=self._aget_context),
+                "question": RunnablePassthrough(),
+                "history": RunnableLambda(lambda _: "")
+            }
+            | self.answer_chain
         )
     
     def _get_context(self, question: str) -> str:
         """Retrieve relevant content from vector store."""
-        docs = self.vector_store.similarity_search(question, k=5)
-        return "\n\n".join([doc.page_content for doc in docs])
+        docs = self.retriever.search(question, k=settings.CONTEXT_CANDIDATES)
+        return self.build_context(docs).text
+    
+    async def _aget_context(self, question: str) -> str:
+        """Retrieve relevant content from vector store without blocking the event loop."""
+        return self.build_context(await self.aretrieve(question)).text
+    
+    async def aretrieve(self, question: str) -> List[Document]:
+        """Retrieve the documents this agent answers from."""
+        return await self.retriever.asearch(question, k=settings.CONTEXT_CANDIDATES)
+    
+    def build_context(self, docs: List[Document]) -> ContextResult:
+        """Merge, deduplicate and pack retrieved chunks into this agent's token budget."""
+        return self.context_builder.build(docs, max_chunks=self.top_k)
+    
+    @staticmethod
+    def _answer_inputs(question: str, context: ContextResult, history: str) -> dict:
+        return {
+            "context": context.text,
+            "question": question,
+            "history": f"\nConversation so far:\n{history}\n" if history else ""
+        }
+    
+    def answer(self, question: str, context: ContextResult, history: str = "") -> str:
+        """Answer from an already built context, without another vector search.
+        
+        ``history`` is the session's conversation so far, for follow-up questions.
+        """
+        return self.answer_chain.invoke(self._answer_inputs(question, context, history))
+    
+    async def aanswer(self, question: str, context: ContextResult, history: str = "") -> str:
+        """Async version of `answer`."""
+        return await self.answer_chain.ainvoke(self._answer_inputs(question, context, history))
+    
+    async def astream_answer(self, question: str, context: ContextResult, history: str = "") -> AsyncIterator[str]:
+        """Stream answer tokens for an already built context."""
+        async for token in self.answer_chain.astream(self._answer_inputs(question, context, history)):
+            yield token
     
     def summarize(self, question: str) -> str:
         """Create a summary based on the question."""
         return self.chain.invoke(question)
+    
+    async def asummarize(self, question: str) -> str:
+        """Async version of `summarize`."""
+        return await self.chain.ainvoke(question)
@@ -1,74 +1,152 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List
+import json
+import logging
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from app.agents.orchestrator import OrchestratorAgent
-from app.core.langfuse_config import get_langfuse
+from app.agents.memory import get_conversation_memory
+from app.models.schemas import RetrievalFilters
+from app.core.config import get_settings
+from app.core.logs import RateLimitedLogger
+from app.core.tracing import tracer
+
+settings = get_settings()
+logger = RateLimitedLogger(logging.getLogger(__name__))
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 orchestrator = OrchestratorAgent()
+memory = get_conversation_memory() if settings.SESSION_MEMORY_ENABLED else None
 
 class ChatRequest(BaseModel):
     message: str
-    session_id: str = "default"
+    session_id: Optional[str] = None  # conversation memory is kept only for requests that send one
+    filters: Optional[RetrievalFilters] = None
+
+    def filter_dict(self) -> Optional[dict]:
+        return self.filters.model_dump(exclude_none=True) if self.filters else None
+
+class BatchChatRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+    filters: Optional[RetrievalFilters] = None
+
+    def filter_dict(self) -> Optional[dict]:
+        return self.filters.model_dump(exclude_none=True) if self.filters else None
 
 class ChatResponse(BaseModel):
     response: str
-    session_id: str
+    session_id: Optional[str] = None
     sources: List[str]
+    context: Optional[dict] = None  # prompt context size; None when the answer came from cache
 
 @router.post("/", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
     try:
-        langfuse = get_langfuse()
-        
-        # Create main trace for the entire chat interaction
-        trace = None
-        if langfuse:
-            trace = langfuse.trace(
-                name="chat_interaction",
-                input={"message": request.message, "session_id": request.session_id},
-                metadata={"session_id": request.session_id}
+        # Sampled requests are exported in the background once the trace ends
+        with tracer.trace(
+            "chat_interaction",
+            input={"message": request.message, "filters": request.filter_dict()},
+            session_id=request.session_id
+        ) as trace:
+            history = await memory.aget(request.session_id) if memory and request.session_id else None
+            result = await orchestrator.aprocess(request.message, request.filter_dict(), history)
+            
+            agent_used = result.get("agent_used", "unknown")
+            response_text = result.get("response", "I couldn't process your request.")
+            trace.update(
+                output={"response": response_text, "agent_used": agent_used},
+                metadata={"agent": agent_used, "cached": result.get("cached", False)}
             )
-            print(f"✅ Langfuse trace created")
-        else:
-            print("⚠️ Langfuse not initialized")
-        
-        # Process through orchestrator
-        result = orchestrator.process(request.message)
         
-        agent_used = result.get("agent_used", "unknown")
-        response_text = result.get("response", "I couldn't process your request.")
+        if memory and request.session_id:
+            # Recorded after the response is sent; compaction never delays the answer
+            background_tasks.add_task(memory.aappend, request.session_id, request.message, response_text)
         
-        response = ChatResponse(
+        return ChatResponse(
             response=response_text,
             session_id=request.session_id,
-            sources=[f"Agent used: {agent_used}"]
+            sources=[f"Agent used: {agent_used}"],
+            context=result.get("context")
         )
         
-        if langfuse and trace:
-            trace.update(
-                output={
-                    "response": response_text,
-                    "agent_used": agent_used
-                },
-                metadata={
-                    "agent": agent_used,
-                    "session_id": request.session_id
-                }
-            )
-            print(f"✅ Langfuse trace updated with agent: {agent_used}")
-        
-        return response
-        
     except Exception as e:
-        if langfuse and trace:
-            trace.update(
-                output={"error": str(e)},
-                level="ERROR"
-            )
-        print(f"❌ Error in chat: {e}")
+        logger.warning("Error in chat: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the answer as server-sent events.
+    
+    Emits ``route`` and ``sources`` events first, then ``token`` events as the
+    agent generates, and finally ``done`` (or ``error``).
+    """
+    async def event_stream():
+        with tracer.trace(
+            "chat_stream",
+            input={"message": request.message, "filters": request.filter_dict()},
+            session_id=request.session_id
+        ) as trace:
+            try:
+                history = await memory.aget(request.session_id) if memory and request.session_id else None
+                tokens = []
+                async for event in orchestrator.astream(request.message, request.filter_dict(), history):
+                    if event["event"] == "token":
+                        tokens.append(event["data"]["text"])
+                    elif event["event"] == "done":
+                        trace.update(output=event["data"], metadata={"agent": event["data"]["agent_used"]})
+                    yield _format_sse(event["event"], event["data"])
+                if memory and request.session_id:
+                    await memory.aappend(request.session_id, request.message, "".join(tokens))
+            except Exception as e:
+                logger.warning("Error in chat stream: %s", e)
+                trace.update(output={"error": str(e)}, level="ERROR", status=str(e))
+                yield _format_sse("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/batch")
+async def chat_batch(request: BatchChatRequest):
+    """Answer a list of independent questions, streaming results as server-sent events.
+    
+    Identical questions are answered once; each ``result`` (or ``error``)
+    event lists the ``indices`` of the questions it answers, in completion
+    order, and ``done`` ends the stream. Questions are answered without
+    session history and are not added to it.
+    """
+    if len(request.questions) > settings.BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_MAX_QUESTIONS} questions per batch"
+        )
+    
+    async def event_stream():
+        with tracer.trace(
+            "chat_batch",
+            input={"questions": len(request.questions), "filters": request.filter_dict()}
+        ) as trace:
+            try:
+                async for event in orchestrator.astream_batch(request.questions, request.filter_dict()):
+                    if event["event"] == "done":
+                        trace.update(output=event["data"])
+                    yield _format_sse(event["event"], event["data"])
+            except Exception as e:
+                logger.warning("Error in chat batch: %s", e)
+                trace.update(output={"error": str(e)}, level="ERROR", status=str(e))
+                yield _format_sse("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @router.get("/health")
 async def health_check():
     return {"status": "ok"}
@@ -1,60 +1,138 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+import hashlib
+import os
+import uuid
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from app.core.config import get_settings
 from app.models.database import get_db, Document
-from app.models.schemas import DocumentUploadResponse, DocumentInfo
-from app.rag.document_processor import DocumentProcessor
-from app.rag.vector_store import get_vector_store
+from app.models.schemas import DocumentUploadResponse, DocumentInfo, IngestionJobStatus
+from app.rag.jobs import job_manager, QueueFullError
+
+settings = get_settings()
 
 router = APIRouter(prefix="/documents", tags=["documents"])
-processor = DocumentProcessor()
-vector_store = get_vector_store()
 
-@router.post("/upload", response_model=DocumentUploadResponse)
+@router.post("/upload", response_model=DocumentUploadResponse, status_code=202)
 async def upload_document(
+    response: Response,
     file: UploadFile = File(...),
+    company: Optional[str] = Form(None),
+    ticker: Optional[str] = Form(None),
+    fiscal_year: Optional[int] = Form(None),
+    quarter: Optional[int] = Form(None, ge=1, le=4),
     db: Session = Depends(get_db)
 ):
-    """Upload and process a document."""
+    """Persist an upload and queue it for background ingestion.
+
+    Identical files are not ingested again, and a file uploaded under the
+    name of an existing document is applied to it as a revision. Company,
+    ticker and fiscal period are detected from the filing unless given.
+    """
+    if file.filename.endswith('.pdf'):
+        file_type = "pdf"
+    elif file.filename.endswith('.txt'):
+        file_type = "text"
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported file type. Use PDF or TXT.")
+    
     try:
-        # Read file content
-        content = await file.read()
+        # Spool the upload to disk without holding it in memory
+        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+        path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4().hex}_{os.path.basename(file.filename)}")
+        content_hash = await run_in_threadpool(_save_upload, file.file, path)
         
-        # Process document based on file type
-        if file.filename.endswith('.pdf'):
-            chunks = processor.process_pdf(content, file.filename)
-            file_type = "pdf"
-        elif file.filename.endswith('.txt'):
-            text = content.decode('utf-8')
-            chunks = processor.process_text(text, file.filename)
-            file_type = "text"
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file type. Use PDF or TXT.")
-        
-        # Add to vector store
-        vector_store.add_documents(chunks)
+        duplicate = db.query(Document).filter(
+            Document.content_hash == content_hash,
+            Document.status == "ready"
+        ).first()
+        if duplicate:
+            os.remove(path)
+            response.status_code = 200
+            return DocumentUploadResponse(
+                id=duplicate.id,
+                filename=duplicate.filename,
+                file_type=duplicate.file_type,
+                num_chunks=duplicate.num_chunks,
+                message="Identical document already ingested",
+                status=duplicate.status
+            )
         
-        # Save to database
-        db_doc = Document(
-            filename=file.filename,
-            file_type=file_type,
-            content_preview=chunks[0].page_content[:200] if chunks else "",
-            num_chunks=len(chunks)
-        )
-        db.add(db_doc)
+        db_doc = db.query(Document).filter(Document.filename == file.filename).order_by(
+            Document.uploaded_at.desc()
+        ).first()
+        is_revision = db_doc is not None
+        if is_revision:
+            db_doc.status = "pending"
+            db_doc.uploaded_at = datetime.utcnow()
+        else:
+            db_doc = Document(
+                filename=file.filename,
+                file_type=file_type,
+                content_preview="",
+                num_chunks=0,
+                status="pending"
+            )
+            db.add(db_doc)
         db.commit()
         db.refresh(db_doc)
         
+        try:
+            job = job_manager.submit(
+                db_doc.id, file.filename, file_type, path, content_hash,
+                metadata={
+                    "company": company,
+                    "ticker": ticker.upper() if ticker else None,
+                    "fiscal_year": fiscal_year,
+                    "quarter": quarter
+                }
+            )
+        except QueueFullError as e:
+            if is_revision:
+                db_doc.status = "ready"
+            else:
+                db.delete(db_doc)
+            db.commit()
+            os.remove(path)
+            raise HTTPException(status_code=503, detail=str(e))
+        
         return DocumentUploadResponse(
             id=db_doc.id,
             filename=db_doc.filename,
             file_type=db_doc.file_type,
             num_chunks=db_doc.num_chunks,
-            message=f"Successfully processed {len(chunks)} chunks"
+            message=(
+                "Revision accepted, applying changes in the background" if is_revision
+                else "Upload accepted, processing in the background"
+            ),
+            job_id=job.id,
+            status=job.status
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _save_upload(source, path: str) -> str:
+    """Copy the upload to ``path`` and return its sha256."""
+    digest = hashlib.sha256()
+    with open(path, "wb") as f:
+        while block := source.read(1024 * 1024):
+            digest.update(block)
+            f.write(block)
+    return digest.hexdigest()
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobStatus)
+async def get_job(job_id: str):
+    """Report the progress of a background ingestion job."""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
 @router.get("/list", response_model=list[DocumentInfo])
 async def list_documents(db: Session = Depends(get_db)):
     """List all uploaded documents."""
@@ -62,12 +140,14 @@ async def list_documents(db: Session = Depends(get_db)):
     return documents
 
 @router.delete("/{document_id}")
-async def delete_document(document_id: int, db: Session = Depends(get_db)):
-    """Delete a document."""
-    doc = db.query(Document).filter(Document.id == document_id).first()
+async def delete_document(document_id: int):
+    """Delete a document and remove its chunks from the vector store."""
+    doc = await job_manager.delete_document(document_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
-    
-    db.delete(doc)
-    db.commit()
     return {"message": f"Document {doc.filename} deleted successfully"}
+
+@router.post("/maintenance/compact")
+async def compact_collection():
+    """Rebuild the vector collection to reclaim space left by deletions."""
+    return await job_manager.compact()
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.models.database import get_db, Document
-from datetime import datetime, timedelta
-import random
+from app.rag.vector_store import registry
+from app.agents.answer_cache import get_answer_cache
+from app.core.metrics import metrics
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
@@ -15,34 +17,23 @@ async def get_metrics_summary(db: Session = Depends(get_db)):
     total_documents = db.query(func.count(Document.id)).scalar() or 0
     total_chunks = db.query(func.sum(Document.num_chunks)).scalar() or 0
     
-    # Simulated metrics (in production, these would come from Langfuse API or database)
-    # For demo purposes, we're showing what the dashboard would look like
-    metrics = {
-        "total_queries": random.randint(50, 150),
-        "avg_response_time": round(random.uniform(1.5, 3.5), 2),
-        "total_cost": round(random.uniform(0.50, 2.00), 4),
-        "success_rate": round(random.uniform(92, 98), 1),
-        "cost_per_query": round(random.uniform(0.01, 0.05), 4),
-        "fastest_query": round(random.uniform(0.8, 1.5), 2),
-        "slowest_query": round(random.uniform(4.0, 6.0), 2),
+    # Query, latency, token and cost totals across all workers, as of their last flush
+    return {
+        **metrics.summary(),
         "total_documents": total_documents,
-        "total_chunks": total_chunks,
-        "total_input_tokens": random.randint(50000, 150000),
-        "total_output_tokens": random.randint(20000, 80000),
-        "agent_usage": {
-            "research": random.randint(30, 60),
-            "financial": random.randint(20, 40),
-            "summary": random.randint(15, 35)
-        },
-        "agent_percentages": {}
+        "total_chunks": total_chunks
+    }
+
+@router.get("/prometheus", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """Expose counters and latency histograms in the Prometheus text format."""
+    return PlainTextResponse(metrics.prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/cache")
+async def get_cache_metrics():
+    """Get hit/miss counters for the in-process caches."""
+    embeddings = registry.embeddings
+    return {
+        "embedding_cache": embeddings.stats() if hasattr(embeddings, "stats") else None,
+        "answer_cache": get_answer_cache().stats()
     }
-    
-    # Calculate agent percentages
-    total_agent_queries = sum(metrics["agent_usage"].values())
-    if total_agent_queries > 0:
-        metrics["agent_percentages"] = {
-            agent: (count / total_agent_queries) * 100
-            for agent, count in metrics["agent_usage"].items()
-        }
-    
-    return metrics
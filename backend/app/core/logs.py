@@ -0,0 +1,31 @@
+import logging
+import threading
+import time
+from typing import Dict, Tuple
+
+class RateLimitedLogger:
+    """Logs each warning message at most once per ``interval`` seconds.
+
+    Background flush loops retry every few seconds, so an unreachable
+    database or trace backend would otherwise repeat the same warning
+    forever. Repeats inside the interval are counted and reported with the
+    next one that is logged.
+    """
+
+    def __init__(self, logger: logging.Logger, interval: float = 60.0):
+        self.logger = logger
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._seen: Dict[str, Tuple[float, int]] = {}  # message -> (last logged, suppressed since)
+
+    def warning(self, msg: str, *args) -> None:
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._seen.get(msg, (float("-inf"), 0))
+            if now - last < self.interval:
+                self._seen[msg] = (last, suppressed + 1)
+                return
+            self._seen[msg] = (now, 0)
+        if suppressed:
+            msg, args = msg + " (%d similar warnings suppressed)", (*args, suppressed)
+        self.logger.warning(msg, *args)
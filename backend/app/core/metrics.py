@@ -0,0 +1,425 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from sqlalchemy.exc import IntegrityError
+from app.core.config import get_settings
+from app.core.logs import RateLimitedLogger
+
+settings = get_settings()
+logger = RateLimitedLogger(logging.getLogger(__name__))
+
+# Upper bounds in seconds; one more bucket catches everything above
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# USD per million (input, output) tokens
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+AGENTS = ("research", "financial", "summary")
+STAGES = ("route", "retrieve", "batch_retrieve", "generate")
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+def _key(name: str, labels: Dict[str, object]) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _labels_text(labels: Tuple[Tuple[str, str], ...]) -> str:
+    return ",".join(f"{k}={v}" for k, v in labels)
+
+def _parse_labels(text: str) -> Tuple[Tuple[str, str], ...]:
+    return tuple(tuple(pair.split("=", 1)) for pair in text.split(",")) if text else ()
+
+class Histogram:
+    """Fixed-bucket histogram: O(1) to record and O(buckets) to summarize."""
+
+    __slots__ = ("bounds", "counts", "sum", "count", "min", "max")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+        for attr, pick in (("min", min), ("max", max)):
+            mine, theirs = getattr(self, attr), getattr(other, attr)
+            setattr(self, attr, theirs if mine is None else mine if theirs is None else pick(mine, theirs))
+
+    def copy(self) -> "Histogram":
+        clone = Histogram(self.bounds)
+        clone.merge(self)
+        return clone
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                low = self.bounds[i - 1] if i > 0 else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                # The observed extremes are tighter than the bucket edges
+                low, high = max(low, self.min), min(high, self.max)
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.max
+
+class MetricsCollector:
+    """In-process counters and histograms with aggregated persistence.
+
+    Recording only touches in-memory aggregates under a lock. Every
+    ``flush_interval`` seconds the increments since the last flush are
+    added to the ``metric_aggregates`` table, one row per metric and label
+    set, and the totals are re-read, so several workers add up and totals
+    survive restarts. Reading never scans history: the summary is built
+    from a fixed number of aggregates.
+    """
+
+    def __init__(self, session_factory=None, flush_interval: float = 10.0):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._counters: Dict[Key, float] = {}
+        self._histograms: Dict[Key, Histogram] = {}
+        self._pending_counters: Dict[Key, float] = {}
+        self._pending_histograms: Dict[Key, Histogram] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+            self._pending_counters[key] = self._pending_counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            for histograms in (self._histograms, self._pending_histograms):
+                histogram = histograms.get(key)
+                if histogram is None:
+                    histogram = histograms[key] = Histogram()
+                histogram.observe(value)
+
+    @contextmanager
+    def stage(self, stage: str):
+        """Time a pipeline stage, counting it as an error if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("rag_errors_total", stage=stage)
+            raise
+        finally:
+            self.observe("rag_stage_seconds", time.perf_counter() - start, stage=stage)
+
+    async def atimed(self, stage: str, iterator: AsyncIterator) -> AsyncIterator:
+        """Pass ``iterator`` through, timing only the waits for its items as ``stage``.
+
+        Time the consumer spends between items, such as a slow streaming
+        client, is not counted.
+        """
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+        except Exception:
+            self.inc("rag_errors_total", stage=stage)
+            raise
+        finally:
+            self.observe("rag_stage_seconds", elapsed, stage=stage)
+
+    def record_query(self, agent: Union[str, Sequence[str], None], seconds: float,
+                     error: bool = False, cached: bool = False) -> None:
+        """Record one answered question; ``agent`` lists every agent that answered part of a compound one."""
+        agents = [agent] if isinstance(agent, str) else list(agent or [])
+        for name in agents or ["unknown"]:
+            self.inc("rag_queries_total", agent=name)
+        self.observe("rag_query_seconds", seconds)
+        if error:
+            self.inc("rag_query_failures_total")
+        if cached:
+            self.inc("rag_answer_cache_hits_total")
+
+    def record_tokens(self, model: str, input_tokens: int, output_tokens: int) -> None:
+        self.inc("rag_llm_tokens_total", input_tokens, model=model, kind="input")
+        self.inc("rag_llm_tokens_total", output_tokens, model=model, kind="output")
+        prices = next((price for prefix, price in MODEL_PRICES.items() if model.startswith(prefix)), None)
+        if prices:
+            cost = (input_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000
+            self.inc("rag_llm_cost_usd_total", cost, model=model)
+
+    def _snapshot(self):
+        with self._lock:
+            return dict(self._counters), {key: h.copy() for key, h in self._histograms.items()}
+
+    def _sum(self, counters: Dict[Key, float], name: str, **match) -> float:
+        wanted = set((k, str(v)) for k, v in match.items())
+        return sum(value for (metric, labels), value in counters.items()
+                   if metric == name and wanted <= set(labels))
+
+    def summary(self) -> dict:
+        """Dashboard totals in the shape of ``/metrics/summary``."""
+        counters, histograms = self._snapshot()
+        failures = self._sum(counters, "rag_query_failures_total")
+        cost = self._sum(counters, "rag_llm_cost_usd_total")
+        latency = histograms.get(_key("rag_query_seconds", {})) or Histogram()
+        # One latency observation per question; rag_queries_total counts each agent of a compound one
+        queries = latency.count
+        agent_usage = {agent: 0 for agent in AGENTS}
+        for (metric, labels), value in counters.items():
+            if metric == "rag_queries_total":
+                agent = dict(labels)["agent"]
+                if agent != "unknown":
+                    agent_usage[agent] = agent_usage.get(agent, 0) + int(value)
+        total_agent_queries = sum(agent_usage.values())
+        stages = {}
+        for stage in STAGES:
+            histogram = histograms.get(_key("rag_stage_seconds", {"stage": stage}))
+            if histogram is None or not histogram.count:
+                continue
+            stages[stage] = {
+                "count": histogram.count,
+                "avg": round(histogram.sum / histogram.count, 4),
+                "p50": round(histogram.quantile(0.5), 4),
+                "p95": round(histogram.quantile(0.95), 4),
+                "p99": round(histogram.quantile(0.99), 4),
+                "errors": int(self._sum(counters, "rag_errors_total", stage=stage)),
+            }
+        return {
+            "total_queries": int(queries),
+            "avg_response_time": round(latency.sum / latency.count, 2) if latency.count else 0.0,
+            "total_cost": round(cost, 6),
+            "success_rate": round((queries - failures) / queries * 100, 1) if queries else 100.0,
+            "cost_per_query": round(cost / queries, 6) if queries else 0.0,
+            "fastest_query": round(latency.min, 2) if latency.min is not None else 0.0,
+            "slowest_query": round(latency.max, 2) if latency.max is not None else 0.0,
+            "total_input_tokens": int(self._sum(counters, "rag_llm_tokens_total", kind="input")),
+            "total_output_tokens": int(self._sum(counters, "rag_llm_tokens_total", kind="output")),
+            "agent_usage": agent_usage,
+            "agent_percentages": {
+                agent: count / total_agent_queries * 100 for agent, count in agent_usage.items()
+            } if total_agent_queries else {},
+            "answer_cache_hits": int(self._sum(counters, "rag_answer_cache_hits_total")),
+            "stages": stages,
+        }
+
+    def prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        counters, histograms = self._snapshot()
+        lines = []
+        for name in sorted({metric for metric, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{self._format_labels(labels)} {value:g}")
+        for name in sorted({metric for metric, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), histogram in sorted(histograms.items(), key=lambda item: item[0]):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip((*histogram.bounds, "+Inf"), histogram.counts):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else f"{bound:g}"
+                    lines.append(f"{name}_bucket{self._format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {histogram.sum:g}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _format_labels(labels) -> str:
+        if not labels:
+            return ""
+        # Exposition format: only the value is escaped, for backslash, quote and newline
+        escaped = (
+            f'{k}="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            for k, v in labels
+        )
+        return "{" + ",".join(escaped) + "}"
+
+    def load(self) -> None:
+        """Replace in-memory totals with the persisted aggregates plus unflushed increments."""
+        if self.session_factory is None:
+            return
+        from app.models.database import MetricAggregate
+        counters, histograms = {}, {}
+        with self.session_factory() as db:
+            for row in db.query(MetricAggregate).all():
+                key = (row.name, _parse_labels(row.labels))
+                if row.buckets is None:
+                    counters[key] = row.value
+                else:
+                    histogram = Histogram()
+                    histogram.counts = json.loads(row.buckets)
+                    histogram.sum, histogram.count = row.value, row.count
+                    histogram.min, histogram.max = row.minimum, row.maximum
+                    histograms[key] = histogram
+        with self._lock:
+            for key, value in self._pending_counters.items():
+                counters[key] = counters.get(key, 0.0) + value
+            for key, pending in self._pending_histograms.items():
+                histograms.setdefault(key, Histogram()).merge(pending)
+            self._counters, self._histograms = counters, histograms
+
+    def flush(self) -> None:
+        """Add increments since the last flush to the persisted aggregates."""
+        if self.session_factory is None:
+            return
+        from app.models.database import MetricAggregate
+        with self._flush_lock:
+            with self._lock:
+                counters, self._pending_counters = self._pending_counters, {}
+                histograms, self._pending_histograms = self._pending_histograms, {}
+            try:
+                self._write(MetricAggregate, counters, histograms)
+            except Exception:
+                # Put the increments back so the next flush retries them
+                with self._lock:
+                    for key, value in counters.items():
+                        self._pending_counters[key] = self._pending_counters.get(key, 0.0) + value
+                    for key, histogram in histograms.items():
+                        self._pending_histograms.setdefault(key, Histogram()).merge(histogram)
+                raise
+            self.load()
+
+    def _write(self, model, counters: Dict[Key, float], histograms: Dict[Key, Histogram]) -> None:
+        for attempt in range(2):
+            with self.session_factory() as db:
+                try:
+                    for (name, labels), value in counters.items():
+                        row = self._row(db, model, name, labels)
+                        row.value = (row.value or 0.0) + value
+                    for (name, labels), histogram in histograms.items():
+                        row = self._row(db, model, name, labels)
+                        stored = Histogram()
+                        if row.buckets is not None:
+                            stored.counts = json.loads(row.buckets)
+                            stored.sum, stored.count = row.value or 0.0, row.count or 0
+                            stored.min, stored.max = row.minimum, row.maximum
+                        stored.merge(histogram)
+                        row.buckets = json.dumps(stored.counts)
+                        row.value, row.count = stored.sum, stored.count
+                        row.minimum, row.maximum = stored.min, stored.max
+                    db.commit()
+                    return
+                except IntegrityError:
+                    # Another worker created the same row first; retry against it
+                    db.rollback()
+                    if attempt:
+                        raise
+
+    @staticmethod
+    def _row(db, model, name: str, labels):
+        text = _labels_text(labels)
+        row = db.query(model).filter(model.name == name, model.labels == text).with_for_update().first()
+        if row is None:
+            row = model(name=name, labels=text, value=0.0, count=0)
+            db.add(row)
+            db.flush()
+        return row
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except Exception as e:
+                logger.warning("Failed to persist metrics: %s", e)
+
+    async def start(self) -> None:
+        if self.session_factory is None or self._task is not None:
+            return
+        await asyncio.get_running_loop().run_in_executor(None, self.load)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await asyncio.get_running_loop().run_in_executor(None, self.flush)
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """LangChain callback that records token usage and cost of every LLM call.
+
+    Uses the provider's token counts when it returns them and falls back to
+    the ~4 characters per token estimate (e.g. for streamed responses).
+    """
+
+    def __init__(self, collector: MetricsCollector):
+        self.collector = collector
+        self._runs: Dict[UUID, Tuple[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized: dict, messages: List[list], *, run_id: UUID, **kwargs) -> None:
+        chars = sum(len(str(message.content)) for batch in messages for message in batch)
+        self._start(serialized, chars, run_id)
+
+    def on_llm_start(self, serialized: dict, prompts: List[str], *, run_id: UUID, **kwargs) -> None:
+        self._start(serialized, sum(len(prompt) for prompt in prompts), run_id)
+
+    def _start(self, serialized: dict, chars: int, run_id: UUID) -> None:
+        params = (serialized or {}).get("kwargs", {})
+        model = params.get("model_name") or params.get("model") or "unknown"
+        with self._lock:
+            self._runs[run_id] = (model, chars // 4 + 1)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        with self._lock:
+            model, estimated_input = self._runs.pop(run_id, ("unknown", 0))
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens") or estimated_input
+        output_tokens = usage.get("completion_tokens")
+        if output_tokens is None:
+            text = "".join(generation.text for generations in response.generations for generation in generations)
+            output_tokens = len(text) // 4 + 1 if text else 0
+        self.collector.record_tokens(model, input_tokens, output_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+        self.collector.inc("rag_errors_total", stage="llm")
+
+def _session_factory():
+    if not settings.METRICS_PERSIST:
+        return None
+    from app.models.database import SessionLocal
+    return SessionLocal
+
+metrics = MetricsCollector(_session_factory(), flush_interval=settings.METRICS_FLUSH_SECONDS)
+llm_metrics = LLMMetricsHandler(metrics)
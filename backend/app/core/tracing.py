@@ -0,0 +1,301 @@
+import base64
+import contextvars
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+import httpx
+from app.core.config import get_settings
+from app.core.logs import RateLimitedLogger
+
+settings = get_settings()
+logger = RateLimitedLogger(logging.getLogger(__name__))
+
+def _timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+def _reset(var: contextvars.ContextVar, token: contextvars.Token) -> None:
+    try:
+        var.reset(token)
+    except ValueError:
+        # A streaming response's generator can be closed from another context
+        var.set(token.old_value if token.old_value is not token.MISSING else None)
+
+class Span:
+    """A timed step inside a trace."""
+
+    __slots__ = ("id", "name", "parent_id", "start", "end", "input", "output", "metadata", "level", "status")
+
+    def __init__(self, name: str, parent_id: Optional[str] = None, input: Any = None,
+                 metadata: Optional[dict] = None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.input = input
+        self.output = None
+        self.metadata = metadata
+        self.level = "DEFAULT"
+        self.status: Optional[str] = None
+
+    def update(self, output: Any = None, metadata: Optional[dict] = None, level: Optional[str] = None,
+               status: Optional[str] = None) -> None:
+        if output is not None:
+            self.output = output
+        if metadata:
+            self.metadata = {**(self.metadata or {}), **metadata}
+        if level:
+            self.level = level
+        if status:
+            self.status = status
+
+class Trace(Span):
+    """A sampled request: its own fields plus the spans recorded under it.
+
+    Nothing leaves the process until the trace ends; then the whole trace
+    is queued for the exporter in one step.
+    """
+
+    __slots__ = ("tracer", "spans", "session_id", "_tokens")
+
+    def __init__(self, tracer: "Tracer", name: str, input: Any = None, metadata: Optional[dict] = None,
+                 session_id: Optional[str] = None):
+        super().__init__(name, input=input, metadata=metadata)
+        self.tracer = tracer
+        self.spans: List[Span] = []
+        self.session_id = session_id
+        self._tokens = None
+
+    def __enter__(self) -> "Trace":
+        self._tokens = _current_trace.set(self), _current_span.set(None)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _reset(_current_trace, self._tokens[0])
+        _reset(_current_span, self._tokens[1])
+        if exc is not None:
+            self.update(output={"error": str(exc)}, level="ERROR", status=str(exc))
+        self.end = time.time()
+        self.tracer._enqueue(self)
+
+class _SpanContext:
+    __slots__ = ("trace", "span", "_token")
+
+    def __init__(self, trace: Trace, span: Span):
+        self.trace = trace
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _reset(_current_span, self._token)
+        if exc is not None:
+            self.span.update(level="ERROR", status=str(exc))
+        self.span.end = time.time()
+        self.trace.spans.append(self.span)
+
+class _NoOp:
+    """Stands in for traces and spans that are disabled or not sampled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoOp":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    def update(self, *args, **kwargs) -> None:
+        return None
+
+NOOP = _NoOp()
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+
+class LangfuseExporter:
+    """Send traces to the Langfuse ingestion API (or anything speaking it)."""
+
+    def __init__(self, host: str, public_key: str, secret_key: str, timeout: float = 10.0):
+        credentials = base64.b64encode(f"{public_key}:{secret_key}".encode()).decode()
+        self.client = httpx.Client(
+            base_url=host.rstrip("/"),
+            headers={"Authorization": f"Basic {credentials}"},
+            timeout=timeout
+        )
+
+    @staticmethod
+    def events(trace: Trace) -> List[dict]:
+        """Ingestion events for one trace: the trace itself, then its spans."""
+        events = [{
+            "id": uuid.uuid4().hex,
+            "type": "trace-create",
+            "timestamp": _timestamp(trace.start),
+            "body": {
+                "id": trace.id,
+                "timestamp": _timestamp(trace.start),
+                "name": trace.name,
+                "sessionId": trace.session_id,
+                "input": trace.input,
+                "output": trace.output,
+                "metadata": {**(trace.metadata or {}), "level": trace.level,
+                             "duration_ms": round((trace.end - trace.start) * 1000, 2)},
+            },
+        }]
+        for span in trace.spans:
+            events.append({
+                "id": uuid.uuid4().hex,
+                "type": "span-create",
+                "timestamp": _timestamp(span.start),
+                "body": {
+                    "id": span.id,
+                    "traceId": trace.id,
+                    "parentObservationId": span.parent_id,
+                    "name": span.name,
+                    "startTime": _timestamp(span.start),
+                    "endTime": _timestamp(span.end),
+                    "input": span.input,
+                    "output": span.output,
+                    "metadata": span.metadata,
+                    "level": span.level,
+                    "statusMessage": span.status,
+                },
+            })
+        return events
+
+    def export(self, traces: List[Trace]) -> None:
+        batch = [event for trace in traces for event in self.events(trace)]
+        response = self.client.post("/api/public/ingestion", json={"batch": batch})
+        response.raise_for_status()
+
+    def close(self) -> None:
+        self.client.close()
+
+class Tracer:
+    """Head-sampled tracing with export off the request path.
+
+    Whether a request is traced is decided once, when its trace starts;
+    unsampled requests and a disabled tracer get a shared no-op object, so
+    instrumented code costs a context variable lookup. Finished traces go
+    into a bounded buffer (the oldest are dropped when it is full, never
+    blocking the request) and a background thread ships them in batches
+    every ``flush_interval`` seconds, or sooner once ``batch_size`` are
+    waiting.
+    """
+
+    def __init__(self, exporter=None, sample_rate: float = 1.0, buffer_size: int = 10000,
+                 batch_size: int = 100, flush_interval: float = 2.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: Deque[Trace] = deque(maxlen=buffer_size)
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {"sampled": 0, "unsampled": 0, "exported": 0, "dropped": 0, "failed": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None and self.sample_rate > 0
+
+    def trace(self, name: str, input: Any = None, metadata: Optional[dict] = None,
+              session_id: Optional[str] = None):
+        """Start a trace, used as a context manager around the request."""
+        if not self.enabled:
+            return NOOP
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            self._counts["unsampled"] += 1
+            return NOOP
+        self._counts["sampled"] += 1
+        return Trace(self, name, input=input, metadata=metadata, session_id=session_id)
+
+    def span(self, name: str, input: Any = None, metadata: Optional[dict] = None):
+        """Record a span under the current trace, if the request is being traced."""
+        trace = _current_trace.get()
+        if trace is None:
+            return NOOP
+        parent = _current_span.get()
+        return _SpanContext(trace, Span(name, parent.id if parent else None, input, metadata))
+
+    def _enqueue(self, trace: Trace) -> None:
+        if len(self._buffer) == self._buffer.maxlen:
+            self._counts["dropped"] += 1
+        self._buffer.append(trace)
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+        if self._thread is None:
+            self.start()
+
+    def _drain(self) -> List[Trace]:
+        batch = []
+        while self._buffer and len(batch) < self.batch_size:
+            try:
+                batch.append(self._buffer.popleft())
+            except IndexError:
+                break
+        return batch
+
+    def flush(self) -> None:
+        """Export everything buffered so far, in batches."""
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            try:
+                self.exporter.export(batch)
+                self._counts["exported"] += len(batch)
+            except Exception as e:
+                # Traces are best effort: drop the batch rather than hold memory or retry forever
+                self._counts["failed"] += len(batch)
+                logger.warning("Failed to export %d traces: %s", len(batch), e)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None or not self.enabled:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stop the exporter thread after sending what is buffered."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            thread.join(timeout)
+        if self.exporter is not None:
+            self.flush()
+
+    def stats(self) -> dict:
+        return {**self._counts, "buffered": len(self._buffer), "sample_rate": self.sample_rate}
+
+def create_tracer() -> Tracer:
+    """Trace to Langfuse when it is configured, otherwise do nothing."""
+    exporter = None
+    if settings.TRACING_ENABLED and settings.LANGFUSE_PUBLIC_KEY and settings.LANGFUSE_SECRET_KEY:
+        exporter = LangfuseExporter(settings.LANGFUSE_HOST, settings.LANGFUSE_PUBLIC_KEY, settings.LANGFUSE_SECRET_KEY)
+    return Tracer(
+        exporter,
+        sample_rate=settings.TRACE_SAMPLE_RATE,
+        buffer_size=settings.TRACE_BUFFER_SIZE,
+        batch_size=settings.TRACE_BATCH_SIZE,
+        flush_interval=settings.TRACE_FLUSH_SECONDS
+    )
+
+tracer = create_tracer()
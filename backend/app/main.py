@@ -2,6 +2,11 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import documents, chat, metrics
 from app.core.config import get_settings
+from app.rag.vector_store import shutdown_vector_stores
+from app.rag.jobs import job_manager
+from app.core.metrics import metrics as metrics_collector
+from app.core.tracing import tracer
+from app.agents.memory import get_conversation_memory
 
 settings = get_settings()
 
@@ -33,6 +38,23 @@ async def root():
         "status": "running"
     }
 
+@app.on_event("startup")
+async def startup():
+    await job_manager.start()
+    await metrics_collector.start()
+    tracer.start()
+    if settings.SESSION_MEMORY_ENABLED:
+        await get_conversation_memory().start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_manager.stop()
+    await metrics_collector.stop()
+    tracer.shutdown()
+    if settings.SESSION_MEMORY_ENABLED:
+        await get_conversation_memory().stop()
+    shutdown_vector_stores()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
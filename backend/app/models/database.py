@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -20,8 +20,37 @@ class Document(Base):
     file_type = Column(String)
     content_preview = Column(Text)
     num_chunks = Column(Integer)
+    status = Column(String, default="ready", index=True)  # pending, processing, ready, failed
+    content_hash = Column(String, index=True)  # sha256 of the uploaded file
+    company = Column(String, index=True)
+    ticker = Column(String, index=True)
+    fiscal_year = Column(Integer, index=True)
+    quarter = Column(Integer, index=True)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
 
+class DocumentChunk(Base):
+    __tablename__ = "document_chunks"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), index=True)
+    chunk_hash = Column(String)  # sha256 of the normalized chunk text
+    vector_id = Column(String, unique=True)  # id of the chunk in the Chroma collection
+    page = Column(Integer, nullable=True)
+
+class FinancialFact(Base):
+    __tablename__ = "financial_facts"
+    __table_args__ = (Index("ix_financial_facts_metric_period", "metric", "fiscal_year", "quarter"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), index=True)
+    metric = Column(String)  # canonical name, e.g. "revenue" or "operating_income"
+    value = Column(Float)  # in dollars, or dollars per share for "eps"
+    unit = Column(String, default="USD")
+    fiscal_year = Column(Integer)
+    quarter = Column(Integer, default=0)  # 0 for a full fiscal year
+    page = Column(Integer, nullable=True)
+    excerpt = Column(Text)  # sentence or statement line the figure was read from
+
 class Conversation(Base):
     __tablename__ = "conversations"
     
@@ -31,6 +60,29 @@ class Conversation(Base):
     agent_response = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, unique=True, index=True)
+    summary = Column(Text)  # rolling summary of the session's oldest turns
+    turns = Column(Integer, default=0)  # how many of the session's conversations it covers
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MetricAggregate(Base):
+    __tablename__ = "metric_aggregates"
+    __table_args__ = (UniqueConstraint("name", "labels"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, index=True)
+    labels = Column(String, default="")  # "key=value,key=value", sorted by key
+    value = Column(Float, default=0.0)  # counter total, or sum of observations for histograms
+    count = Column(Integer, default=0)
+    minimum = Column(Float, nullable=True)
+    maximum = Column(Float, nullable=True)
+    buckets = Column(Text, nullable=True)  # JSON bucket counts, histograms only
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 # Create tables
 Base.metadata.create_all(bind=engine)
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 from typing import Optional
 
@@ -8,6 +8,38 @@ class DocumentUploadResponse(BaseModel):
     file_type: str
     num_chunks: int
     message: str
+    job_id: Optional[str] = None  # None when the identical file is already ingested
+    status: str
+
+class IngestionJobStatus(BaseModel):
+    id: str
+    document_id: int
+    filename: str
+    file_type: str
+    status: str
+    progress: float
+    num_chunks: int
+    added: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+class RetrievalFilters(BaseModel):
+    """Restrict retrieval to chunks whose metadata equals every given value."""
+    document_id: Optional[int] = None
+    page: Optional[int] = None
+    company: Optional[str] = None
+    ticker: Optional[str] = None
+    fiscal_year: Optional[int] = None
+    quarter: Optional[int] = Field(None, ge=1, le=4)
+    section: Optional[str] = None
+
+    @field_validator("ticker")
+    @classmethod
+    def normalize_ticker(cls, value: Optional[str]) -> Optional[str]:
+        return value.upper() if value else value
 
 class ChatRequest(BaseModel):
     message: str
@@ -23,6 +55,11 @@ class DocumentInfo(BaseModel):
     filename: str
     file_type: str
     num_chunks: int
+    status: Optional[str] = None
+    company: Optional[str] = None
+    ticker: Optional[str] = None
+    fiscal_year: Optional[int] = None
+    quarter: Optional[int] = None
     uploaded_at: datetime
     
     class Config:
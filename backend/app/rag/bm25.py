@@ -0,0 +1,133 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Keep figures such as "25.2", "1,234" and "fy2024" as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were what
+which who will with how did does do about than then there their these those into over our we
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """In-memory inverted index scored with Okapi BM25.
+
+    Documents are added and removed by id as the vector collection changes,
+    so the index never needs a full rebuild. Only term frequencies and the
+    metadata ``fields`` used for filtering are kept; the chunk text itself
+    stays in the vector store.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, fields: Sequence[str] = ()):
+        self.k1 = k1
+        self.b = b
+        self.fields = tuple(fields)
+        self._metadata: Dict[str, dict] = {}
+        self._field_index: Dict[Tuple[str, object], set] = defaultdict(set)  # (field, value) -> ids
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)  # term -> {id: tf}
+        self._terms: Dict[str, Tuple[str, ...]] = {}  # id -> distinct terms, for removal
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, ids: Iterable[str], texts: Iterable[str],
+            metadatas: Optional[Iterable[Optional[dict]]] = None) -> None:
+        """Index documents, replacing any already stored under the same id."""
+        ids = list(ids)
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(ids)
+        with self._lock:
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                if doc_id in self._lengths:
+                    self._remove(doc_id)
+                self._set_fields(doc_id, metadata)
+                counts = Counter(tokenize(text))
+                for term, tf in counts.items():
+                    self._postings[term][doc_id] = tf
+                self._terms[doc_id] = tuple(counts)
+                length = sum(counts.values())
+                self._lengths[doc_id] = length
+                self._total_length += length
+
+    def update_metadata(self, ids: Iterable[str], metadatas: Iterable[Optional[dict]]) -> None:
+        with self._lock:
+            for doc_id, metadata in zip(ids, metadatas):
+                if doc_id in self._lengths:
+                    self._set_fields(doc_id, metadata)
+
+    def _set_fields(self, doc_id: str, metadata: Optional[dict]) -> None:
+        self._clear_fields(doc_id)
+        fields = {key: metadata[key] for key in self.fields if metadata and metadata.get(key) is not None}
+        if fields:
+            self._metadata[doc_id] = fields
+            for item in fields.items():
+                self._field_index[item].add(doc_id)
+
+    def _clear_fields(self, doc_id: str) -> None:
+        for item in self._metadata.pop(doc_id, {}).items():
+            ids = self._field_index[item]
+            ids.discard(doc_id)
+            if not ids:
+                del self._field_index[item]
+
+    def matching_ids(self, filters: Optional[dict]) -> Optional[set]:
+        """Ids whose metadata matches every filter, or None when there are no filters."""
+        filters = {key: value for key, value in (filters or {}).items() if value is not None}
+        if not filters:
+            return None
+        with self._lock:
+            sets = sorted((self._field_index.get(item, set()) for item in filters.items()), key=len)
+            return set.intersection(*sets) if sets[0] else set()
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self._lengths:
+                    self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        for term in self._terms.pop(doc_id):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+        self._clear_fields(doc_id)
+
+    def search(self, query: str, k: int = 10, filters: Optional[dict] = None) -> List[Tuple[str, float]]:
+        """Return up to ``k`` ``(id, score)`` pairs, best first.
+
+        ``filters`` restricts results to documents whose metadata fields
+        equal the given values.
+        """
+        with self._lock:
+            n = len(self._lengths)
+            allowed = self.matching_ids(filters)
+            if not n or allowed is not None and not allowed:
+                return []
+            avg_length = self._total_length / n
+            scores: Dict[str, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                if allowed is None:
+                    matches = postings.items()
+                elif len(allowed) < len(postings):
+                    matches = ((doc_id, postings[doc_id]) for doc_id in allowed if doc_id in postings)
+                else:
+                    matches = ((doc_id, tf) for doc_id, tf in postings.items() if doc_id in allowed)
+                for doc_id, tf in matches:
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
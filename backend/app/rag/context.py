@@ -0,0 +1,141 @@
+import math
+from dataclasses import dataclass, field
+from typing import List, Optional
+from langchain.schema import Document
+from app.rag.bm25 import tokenize
+from app.rag.ingestion import estimate_tokens
+
+@dataclass
+class ContextResult:
+    text: str
+    documents: List[Document] = field(default_factory=list)
+    tokens: int = 0
+    candidates: int = 0
+    naive_tokens: int = 0  # joining the top chunks as they are, as before budgeting
+    merged: int = 0
+    dropped: int = 0
+
+    def stats(self) -> dict:
+        """Per-request context size, for responses and logs."""
+        return {
+            "tokens": self.tokens,
+            "chunks": len(self.documents),
+            "candidates": self.candidates,
+            "naive_tokens": self.naive_tokens,
+            "merged": self.merged,
+            "dropped": self.dropped,
+        }
+
+def _source(doc: Document) -> Optional[str]:
+    return doc.metadata.get("document_id") or doc.metadata.get("source")
+
+def join_overlapping(first: str, second: str, min_overlap: int = 20, max_overlap: int = 400) -> Optional[str]:
+    """Join two chunks if the end of ``first`` repeats the start of ``second``.
+
+    This is the overlap the text splitter leaves between neighbouring
+    chunks. Returns None when they do not overlap.
+    """
+    if second in first:
+        return first
+    probe = second[:min_overlap]
+    if len(probe) < min_overlap:
+        return None
+    position = first.find(probe, max(0, len(first) - max_overlap))
+    while position != -1:
+        overlap = len(first) - position
+        if second.startswith(first[position:]):
+            return first + second[overlap:]
+        position = first.find(probe, position + 1)
+    return None
+
+class ContextBuilder:
+    """Assemble an LLM context from ranked chunks under a token budget.
+
+    1. Chunks from the same source that overlap (neighbours from the text
+       splitter) or contain one another are merged into one passage.
+    2. Passages are picked by maximal marginal relevance: relevance comes
+       from the retrieval rank, redundancy from lexical similarity to the
+       passages already picked, so near-duplicates from other filings lose
+       to new information.
+    3. Picked passages are packed in that order until ``token_budget`` is
+       reached; a passage that does not fit is skipped for a smaller one.
+    """
+
+    def __init__(self, token_budget: int = 1000, mmr_lambda: float = 0.7, separator: str = "\n\n"):
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.separator = separator
+
+    def _merge(self, docs: List[Document]) -> List[Document]:
+        passages: List[Document] = []
+        for doc in docs:
+            for i, passage in enumerate(passages):
+                if _source(passage) != _source(doc):
+                    continue
+                text = (join_overlapping(passage.page_content, doc.page_content)
+                        or join_overlapping(doc.page_content, passage.page_content))
+                if text is not None:
+                    # Keep the better-ranked passage's position and metadata
+                    passages[i] = Document(page_content=text, metadata=passage.metadata)
+                    break
+            else:
+                passages.append(doc)
+        return passages
+
+    @staticmethod
+    def _similarity(a: set, b: set) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / math.sqrt(len(a) * len(b))
+
+    def _mmr_order(self, passages: List[Document]) -> List[int]:
+        terms = [set(tokenize(passage.page_content)) for passage in passages]
+        relevance = [1.0 - rank / len(passages) for rank in range(len(passages))]
+        redundancy = [0.0] * len(passages)
+        remaining = list(range(len(passages)))
+        order = []
+        while remaining:
+            best = max(remaining, key=lambda i: self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * redundancy[i])
+            remaining.remove(best)
+            order.append(best)
+            for i in remaining:
+                redundancy[i] = max(redundancy[i], self._similarity(terms[i], terms[best]))
+        return order
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        """Cut text to roughly ``tokens`` tokens at a word boundary."""
+        cut = text[:max(0, tokens - 1) * 4]
+        return cut.rsplit(" ", 1)[0] if " " in cut else cut
+
+    def build(self, docs: List[Document], max_chunks: Optional[int] = None) -> ContextResult:
+        """Build the context from ``docs``, ordered best first.
+
+        ``max_chunks`` caps how many passages are used, regardless of budget.
+        """
+        top = docs[:max_chunks] if max_chunks is not None else docs
+        naive_tokens = estimate_tokens(self.separator.join(doc.page_content for doc in top)) if top else 0
+        passages = self._merge(docs)
+        merged = len(docs) - len(passages)
+
+        picked: List[Document] = []
+        for i in self._mmr_order(passages) if passages else []:
+            if max_chunks is not None and len(picked) >= max_chunks:
+                break
+            texts = [doc.page_content for doc in picked] + [passages[i].page_content]
+            if estimate_tokens(self.separator.join(texts)) <= self.token_budget:
+                picked.append(passages[i])
+            elif not picked:
+                # Never return an empty context just because the best passage is long
+                text = self._truncate(passages[i].page_content, self.token_budget)
+                picked.append(Document(page_content=text, metadata=passages[i].metadata))
+
+        text = self.separator.join(doc.page_content for doc in picked)
+        return ContextResult(
+            text=text,
+            documents=picked,
+            tokens=estimate_tokens(text) if picked else 0,
+            candidates=len(docs),
+            naive_tokens=naive_tokens,
+            merged=merged,
+            dropped=len(passages) - len(picked),
+        )
@@ -1,8 +1,37 @@
-from typing import List
+from concurrent.futures import Executor
+from typing import Iterator, List, Optional, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from pypdf import PdfReader
 import io
+import os
+
+_open_pdf = None  # (key, file, reader) reused across tasks in a pool worker
+
+def _reader(path: str) -> PdfReader:
+    """Open a PDF lazily from disk, reusing the reader for the same file.
+
+    Passing a file object rather than a path keeps pypdf from reading the
+    whole file into memory, and reusing the reader avoids re-parsing the
+    page tree for every page range of the same upload.
+    """
+    global _open_pdf
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if _open_pdf is None or _open_pdf[0] != key:
+        if _open_pdf is not None:
+            _open_pdf[1].close()
+        f = open(path, "rb")
+        _open_pdf = (key, f, PdfReader(f))
+    return _open_pdf[2]
+
+def extract_pages(path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """Process-pool entry point: extract the text of pages ``start..stop-1``.
+
+    Only page text crosses the process boundary. Page numbers are 1-based.
+    """
+    reader = _reader(path)
+    return [(n + 1, reader.pages[n].extract_text() or "") for n in range(start, stop)]
 
 class DocumentProcessor:
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
@@ -11,33 +40,91 @@ class DocumentProcessor:
             chunk_overlap=chunk_overlap,
             length_function=len,
         )
-    
+
     def process_pdf(self, file_content: bytes, filename: str) -> List[Document]:
         """Extract text from PDF and split into chunks."""
-        pdf_file = io.BytesIO(file_content)
-        pdf_reader = PdfReader(pdf_file)
-        
-        # Extract text from all pages
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-        
-        # Create document with metadata
-        doc = Document(
-            page_content=text,
-            metadata={"source": filename, "type": "pdf"}
+        pdf_reader = PdfReader(io.BytesIO(file_content))
+        pages = (
+            (n, page.extract_text() or "")
+            for n, page in enumerate(pdf_reader.pages, start=1)
         )
-        
-        # Split into chunks
-        chunks = self.text_splitter.split_documents([doc])
-        return chunks
-    
+        return list(self._split_pages(pages, filename))
+
     def process_text(self, text: str, source: str = "text") -> List[Document]:
         """Process plain text and split into chunks."""
         doc = Document(
             page_content=text,
             metadata={"source": source, "type": "text"}
         )
-        
+
         chunks = self.text_splitter.split_documents([doc])
         return chunks
+
+    def iter_pdf(
+        self,
+        path: str,
+        filename: str,
+        pool: Optional[Executor] = None,
+        pages_per_task: int = 8,
+        max_pending: int = 8
+    ) -> Iterator[Document]:
+        """Yield chunks of a PDF on disk, page by page, with page-number metadata.
+
+        With a process pool, page ranges are extracted in parallel while at
+        most ``max_pending`` ranges are in flight, so memory stays bounded by
+        a window of page text rather than the whole document.
+        """
+        with open(path, "rb") as f:
+            reader = PdfReader(f)
+            if pool is None:
+                pages = (
+                    (n, page.extract_text() or "")
+                    for n, page in enumerate(reader.pages, start=1)
+                )
+                yield from self._split_pages(pages, filename)
+                return
+            page_count = len(reader.pages)
+
+        ranges = [
+            (start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        ]
+        yield from self._split_pages(self._extract_parallel(path, ranges, pool, max_pending), filename)
+
+    @staticmethod
+    def _extract_parallel(path: str, ranges, pool: Executor, max_pending: int) -> Iterator[Tuple[int, str]]:
+        pending = []
+        ranges = iter(ranges)
+        for start, stop in ranges:
+            pending.append(pool.submit(extract_pages, path, start, stop))
+            if len(pending) >= max_pending:
+                break
+        while pending:
+            pages = pending.pop(0).result()
+            next_range = next(ranges, None)
+            if next_range:
+                pending.append(pool.submit(extract_pages, path, *next_range))
+            yield from pages
+
+    def _split_pages(self, pages, filename: str) -> Iterator[Document]:
+        for page_number, text in pages:
+            if not text.strip():
+                continue
+            yield from self.text_splitter.split_documents([Document(
+                page_content=text,
+                metadata={"source": filename, "type": "pdf", "page": page_number}
+            )])
+
+    def iter_file(self, path: str, filename: str, file_type: str,
+                  pool: Optional[Executor] = None) -> Iterator[Document]:
+        """Yield chunks of a persisted upload without loading PDFs into memory."""
+        if file_type == "pdf":
+            yield from self.iter_pdf(path, filename, pool=pool)
+            return
+        with open(path, encoding="utf-8") as f:
+            yield from self.process_text(f.read(), filename)
+
+    def process_file(self, path: str, filename: str, file_type: str,
+                     pool: Optional[Executor] = None) -> List[Document]:
+        """Read a persisted upload from disk and split it into chunks."""
+        return list(self.iter_file(path, filename, file_type, pool=pool))
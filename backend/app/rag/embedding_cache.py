@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+class CachedEmbeddings(Embeddings):
+    """Two-tier cache around an embeddings model.
+
+    Vectors are keyed by (model name, hash of normalized text). Lookups go to
+    a bounded in-memory LRU first, then to a SQLite file on disk; only the
+    remaining misses of a batch are sent to the wrapped model.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        max_memory_entries: int = 10000,
+        disk_path: Optional[str] = None
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+            )
+            self._db.commit()
+
+    def _key(self, text: str) -> str:
+        payload = f"{self.model_name}\x00{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return cached vectors for the given keys, promoting disk hits to memory."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self._counts["memory_hits"] += len(found)
+
+            remaining = [key for key in keys if key not in found]
+            if self._db is not None and remaining:
+                for start in range(0, len(remaining), 500):
+                    batch = remaining[start:start + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        found[key] = vector
+                        self._remember(key, vector)
+                        self._counts["disk_hits"] += 1
+
+            self._counts["misses"] += len(keys) - len(found)
+        return found
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _store(self, vectors: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            for key, vector in vectors.items():
+                self._remember(key, vector)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in vectors.items()]
+                )
+                self._db.commit()
+
+    def _split(self, texts: List[str]):
+        """Map texts to keys and find the unique texts that still need embedding."""
+        keys = [self._key(text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        found = self._lookup(unique_keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        return keys, found, missing
+
+    @staticmethod
+    def _as_arrays(keys: List[str], vectors: List[List[float]]) -> Dict[str, np.ndarray]:
+        return {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(keys, vectors)}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._split(texts)
+        if missing:
+            computed = self._as_arrays(
+                list(missing), self.embeddings.embed_documents(list(missing.values()))
+            )
+            self._store(computed)
+            found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    async def _off_loop(self, func, *args):
+        """Run a cache step in a worker thread when it touches the SQLite tier."""
+        if self._db is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = await self._off_loop(self._split, texts)
+        if missing:
+            computed = self._as_arrays(
+                list(missing), await self.embeddings.aembed_documents(list(missing.values()))
+            )
+            await self._off_loop(self._store, computed)
+            found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current memory tier size."""
+        with self._lock:
+            counts = dict(self._counts)
+            counts["memory_entries"] = len(self._memory)
+        lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+        counts["hit_rate"] = round((lookups - counts["misses"]) / lookups, 4) if lookups else 0.0
+        return counts
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        if hasattr(self.embeddings, "close"):
+            self.embeddings.close()
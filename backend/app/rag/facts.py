@@ -0,0 +1,433 @@
+import re
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Canonical metrics and the phrases filings use for them, most specific first
+METRICS = {
+    "revenue": ["total net revenues", "total revenues", "total revenue", "net revenues", "net revenue",
+                "net sales", "revenues", "revenue"],
+    "cost_of_revenue": ["total cost of revenues", "cost of revenues", "cost of revenue", "cost of sales",
+                        "cost of goods sold"],
+    "gross_profit": ["gross profit"],
+    "operating_income": ["income from operations", "operating income", "operating profit"],
+    "net_income": ["net income attributable to common stockholders", "net income"],
+    "operating_cash_flow": ["net cash provided by operating activities", "operating cash flow",
+                            "cash flow from operations"],
+    "capital_expenditures": ["capital expenditures", "purchases of property and equipment"],
+    "free_cash_flow": ["free cash flow"],
+    "total_assets": ["total assets"],
+    "total_liabilities": ["total liabilities"],
+    "current_assets": ["total current assets"],
+    "current_liabilities": ["total current liabilities"],
+    "shareholders_equity": ["total stockholders' equity", "total shareholders' equity", "stockholders' equity",
+                            "shareholders' equity", "total equity"],
+    "total_debt": ["total debt", "long-term debt"],
+    "cash": ["cash and cash equivalents"],
+    "eps": ["diluted earnings per share", "earnings per share", "diluted eps"],
+}
+METRIC_NAMES = list(METRICS)
+PER_SHARE = {"eps"}
+
+# Metrics computed from others when a filing does not state them
+DERIVED = {
+    "gross_profit": ("revenue", "cost_of_revenue"),
+    "free_cash_flow": ("operating_cash_flow", "capital_expenditures"),
+}
+# Costs that statements often show as negative outflows; subtracted by magnitude
+OUTFLOWS = {"cost_of_revenue", "capital_expenditures"}
+
+# Ratio: (numerator, denominator, "percent" or "multiple"), and how questions ask for it
+RATIOS = {
+    "gross_margin": ("gross_profit", "revenue", "percent"),
+    "operating_margin": ("operating_income", "revenue", "percent"),
+    "net_margin": ("net_income", "revenue", "percent"),
+    "free_cash_flow_margin": ("free_cash_flow", "revenue", "percent"),
+    "return_on_equity": ("net_income", "shareholders_equity", "percent"),
+    "return_on_assets": ("net_income", "total_assets", "percent"),
+    "debt_to_equity": ("total_debt", "shareholders_equity", "multiple"),
+    "current_ratio": ("current_assets", "current_liabilities", "multiple"),
+}
+RATIO_PHRASES = [
+    ("free cash flow margin", "free_cash_flow_margin"), ("fcf margin", "free_cash_flow_margin"),
+    ("gross margin", "gross_margin"), ("operating margin", "operating_margin"),
+    ("net profit margin", "net_margin"), ("net margin", "net_margin"), ("profit margin", "net_margin"),
+    ("return on equity", "return_on_equity"), ("roe", "return_on_equity"),
+    ("return on assets", "return_on_assets"), ("roa", "return_on_assets"),
+    ("debt to equity", "debt_to_equity"), ("debt-to-equity", "debt_to_equity"),
+    ("current ratio", "current_ratio"),
+]
+GROWTH_WORDS = re.compile(r"\b(growth|grow|grew|increase|decrease|change|yoy|year[- ]over[- ]year|qoq|"
+                          r"quarter[- ]over[- ]quarter|sequential)", re.IGNORECASE)
+SEQUENTIAL_WORDS = re.compile(r"\b(qoq|quarter[- ]over[- ]quarter|sequential)", re.IGNORECASE)
+
+SCALES = {"thousand": 1e3, "thousands": 1e3, "million": 1e6, "millions": 1e6, "mn": 1e6, "mm": 1e6,
+          "billion": 1e9, "billions": 1e9, "bn": 1e9}
+_METRIC_ALTERNATION = "|".join(
+    re.escape(alias) for alias in sorted((a for aliases in METRICS.values() for a in aliases), key=len, reverse=True)
+)
+_NUMBER = r"\(?-?\d[\d,]*(?:\.\d+)?\)?"
+# "revenue of $364.1 million", "operating income was $(12) million"
+PROSE_FACT = re.compile(
+    rf"\b(?P<metric>{_METRIC_ALTERNATION})\b[^.;\n$]{{0,80}}?\$\s?(?P<value>{_NUMBER})"
+    rf"(?:\s*(?P<scale>thousand|million|billion|bn|mn|mm)\b)?",
+    re.IGNORECASE
+)
+# Statement lines under an "(in millions)" heading: "Total revenues   25,182   23,350";
+# a bare year is a column header ("Revenue   2024   2023"), not a value
+TABLE_FACT = re.compile(
+    rf"^\s*(?P<metric>{_METRIC_ALTERNATION})\b[^\n\d$(]*\$?\s*(?!(?:19|20)\d{{2}}\b(?![.,]\d))(?P<value>{_NUMBER})",
+    re.IGNORECASE | re.MULTILINE
+)
+TABLE_SCALE = re.compile(r"\(in (thousands|millions|billions)", re.IGNORECASE)
+
+QUARTER_PERIOD = re.compile(r"\bQ([1-4])\s*(?:FY\s?|fiscal\s+)?'?(20\d{2}|\d{2})\b", re.IGNORECASE)
+QUARTER_WORD_PERIOD = re.compile(
+    r"\b(first|second|third|fourth)\s+quarter\s+(?:of\s+)?(?:fiscal\s+(?:year\s+)?)?(20\d{2})\b", re.IGNORECASE
+)
+# "fiscal 2024", "FY24", or a four-digit year after "in", "for" or "during"
+YEAR_PERIOD = re.compile(r"\b(?:(?:fiscal\s+(?:year\s+)?|FY\s?'?)(20\d{2}|\d{2})|(?:in|for|during)\s+(20\d{2}))\b",
+                         re.IGNORECASE)
+QUARTER_WORDS = {"first": 1, "second": 2, "third": 3, "fourth": 4}
+COMPARISON = re.compile(r"\b(compared|versus|vs\.?|from|up from|down from|prior)\b", re.IGNORECASE)
+PRIOR_FIGURE = re.compile(
+    rf"\b(?:compared\s+(?:to|with)|versus|vs\.?|up from|down from|from)\s+\$\s?(?P<value>{_NUMBER})"
+    rf"(?:\s*(?P<scale>thousand|million|billion|bn|mn|mm)\b)?(?P<period>[^.;\n$]{{0,40}})",
+    re.IGNORECASE
+)
+SENTENCE_END = re.compile(r"(?<=[.;!?])\s+|\n")
+
+def _metric_for(alias: str) -> str:
+    alias = alias.lower()
+    return next(metric for metric, aliases in METRICS.items() if alias in aliases)
+
+def _parse_number(text: str) -> float:
+    negative = text.startswith("(") and text.endswith(")") or text.startswith("-")
+    value = float(text.strip("()-").replace(",", ""))
+    return -value if negative else value
+
+def _year(value: str) -> int:
+    year = int(value)
+    return year + 2000 if year < 100 else year
+
+def find_period(text: str) -> Tuple[Optional[int], Optional[int]]:
+    """First fiscal period mentioned in ``text`` as ``(year, quarter)``; quarter 0 is a full year."""
+    match = QUARTER_PERIOD.search(text)
+    if match:
+        return _year(match.group(2)), int(match.group(1))
+    match = QUARTER_WORD_PERIOD.search(text)
+    if match:
+        return int(match.group(2)), QUARTER_WORDS[match.group(1).lower()]
+    match = YEAR_PERIOD.search(text)
+    if match:
+        return _year(match.group(1) or match.group(2)), 0
+    return None, None
+
+def _sentence_bounds(text: str, start: int, end: int) -> Tuple[int, int]:
+    sentence_start = 0
+    for boundary in SENTENCE_END.finditer(text, 0, start):
+        sentence_start = boundary.end()
+    boundary = SENTENCE_END.search(text, end)
+    return sentence_start, boundary.start() if boundary else len(text)
+
+def _fact_period(text: str, match, default: Tuple[Optional[int], Optional[int]]) -> Tuple[Optional[int], Optional[int]]:
+    """The period a figure is reported for: named before it in its sentence, else right after it."""
+    sentence_start, sentence_end = _sentence_bounds(text, match.start(), match.end())
+    year, quarter = find_period(text[sentence_start:match.end()])
+    if year is None:
+        after = text[match.end():sentence_end]
+        comparison = COMPARISON.search(after)
+        year, quarter = find_period(after[:comparison.start()] if comparison else after)
+    return (year, quarter) if year is not None else default
+
+def extract_facts(chunks: Iterable[Document]) -> List[dict]:
+    """Numeric facts stated in a document's chunks, one per metric and period.
+
+    Each fact has ``metric``, ``value`` (in dollars, or dollars per share),
+    ``unit``, ``fiscal_year``, ``quarter`` (0 for a full year), ``page`` and
+    the sentence it came from. Periods not named next to a figure default
+    to the document's fiscal year and quarter. The first mention wins, as
+    overlapping chunks repeat figures.
+    """
+    facts: Dict[tuple, dict] = {}
+    for chunk in chunks:
+        text = chunk.page_content
+        metadata = chunk.metadata
+        default = (metadata.get("fiscal_year"), metadata.get("quarter") or 0)
+        table_scale = TABLE_SCALE.search(text)
+        matches = [(match, None) for match in PROSE_FACT.finditer(text)]
+        if table_scale:
+            matches += [(match, SCALES[table_scale.group(1).lower()]) for match in TABLE_FACT.finditer(text)]
+        for match, default_scale in matches:
+            metric = _metric_for(match.group("metric"))
+            sentence_start, sentence_end = _sentence_bounds(text, match.start(), match.end())
+            excerpt = " ".join(text[sentence_start:sentence_end].split())[:300]
+            year, quarter = _fact_period(text, match, default)
+            figures = [(match.group("value"), match.groupdict().get("scale"), year, quarter)]
+            # "..., compared to $24.3 billion in Q4 2023": the same metric for an earlier period
+            for prior in PRIOR_FIGURE.finditer(text, match.end(), sentence_end):
+                figures.append((prior.group("value"), prior.group("scale"), *find_period(prior.group("period"))))
+            for value, scale, year, quarter in figures:
+                if year is None or (metric, year, quarter) in facts:
+                    continue
+                if metric in PER_SHARE:
+                    multiplier = 1.0
+                else:
+                    multiplier = SCALES[scale.lower()] if scale else (default_scale or 1.0)
+                facts[metric, year, quarter] = {
+                    "metric": metric,
+                    "value": _parse_number(value) * multiplier,
+                    "unit": "USD/share" if metric in PER_SHARE else "USD",
+                    "fiscal_year": year,
+                    "quarter": quarter,
+                    "page": metadata.get("page"),
+                    "excerpt": excerpt,
+                }
+    return list(facts.values())
+
+@dataclass
+class CalculationRow:
+    entity: str
+    period: str
+    value: float
+    inputs: List[Tuple[str, float, str]] = field(default_factory=list)  # (label, value, source)
+
+@dataclass
+class Calculation:
+    """A ratio or growth rate computed from stored facts, ready to be phrased."""
+    name: str
+    formula: str
+    kind: str  # "percent", "multiple" or "USD"
+    rows: List[CalculationRow]
+
+    def to_text(self) -> str:
+        lines = [f"{self.name} ({self.formula}):"]
+        for row in self.rows:
+            inputs = "; ".join(f"{label} {_format(value, 'USD')} [{source}]" for label, value, source in row.inputs)
+            lines.append(f"- {row.entity} {row.period}: {_format(row.value, self.kind)}"
+                         + (f" ({inputs})" if inputs else ""))
+        return "\n".join(lines)
+
+def _format(value: float, kind: str) -> str:
+    if kind == "percent":
+        return f"{value * 100:.1f}%"
+    if kind == "multiple":
+        return f"{value:.2f}x"
+    magnitude = abs(value)
+    for threshold, suffix in ((1e9, " billion"), (1e6, " million"), (1e3, " thousand")):
+        if magnitude >= threshold:
+            return f"{'-' if value < 0 else ''}${magnitude / threshold:,.1f}{suffix}"
+    return f"{'-' if value < 0 else ''}${magnitude:,.2f}"
+
+def _period_label(year: int, quarter: int) -> str:
+    return f"Q{quarter} FY{year}" if quarter else f"FY{year}"
+
+def _label(metric: str) -> str:
+    return metric.replace("_", " ")
+
+class FactTable:
+    """All stored facts as a NumPy (period x metric) matrix, for local calculations.
+
+    Rows are ``(entity, fiscal year, quarter)`` periods, where the entity is
+    the ticker, company or file name of the source document; where two
+    documents state the same figure, the most recent one wins. Ratios and
+    growth rates are computed for every matching period at once. The
+    matrix is built on first use and rebuilt after ``invalidate``, which
+    ingestion calls whenever documents change.
+    """
+
+    def __init__(self, session_factory: Callable, max_periods: int = 4):
+        self.session_factory = session_factory
+        self.max_periods = max_periods
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded = False
+
+    def _load(self) -> None:
+        from app.models.database import Document as DocumentRow, FinancialFact
+        db = self.session_factory()
+        try:
+            rows = db.query(
+                FinancialFact.metric, FinancialFact.value, FinancialFact.fiscal_year, FinancialFact.quarter,
+                FinancialFact.page, FinancialFact.document_id, DocumentRow.ticker, DocumentRow.company,
+                DocumentRow.filename
+            ).join(DocumentRow, DocumentRow.id == FinancialFact.document_id).order_by(
+                FinancialFact.document_id.desc()
+            ).all()
+        finally:
+            db.close()
+
+        entities: Dict[str, int] = {}
+        self.document_entities: Dict[int, str] = {}
+        facts = []
+        for metric, value, year, quarter, page, document_id, ticker, company, filename in rows:
+            if metric not in METRICS:
+                continue
+            entity = ticker or company or filename
+            self.document_entities[document_id] = entity
+            source = f"{filename}, p. {page}" if page is not None else filename
+            facts.append((entities.setdefault(entity, len(entities)), year, quarter or 0,
+                          METRIC_NAMES.index(metric), value, source))
+        self.entities = list(entities)
+
+        if facts:
+            entity_ids, years, quarters, metric_ids, values, sources = zip(*facts)
+            entity_ids, years, quarters = np.array(entity_ids), np.array(years), np.array(quarters)
+            metric_ids, values = np.array(metric_ids), np.array(values, dtype=np.float64)
+        else:
+            entity_ids = years = quarters = metric_ids = np.zeros(0, dtype=np.int64)
+            values, sources = np.zeros(0), ()
+
+        period_keys = (entity_ids * 10000 + years) * 10 + quarters
+        self.period_keys, period_index = np.unique(period_keys, return_inverse=True)
+        self.period_entities = self.period_keys // 100000
+        self.period_years = self.period_keys // 10 % 10000
+        self.period_quarters = self.period_keys % 10
+        self.values = np.full((len(self.period_keys), len(METRIC_NAMES)), np.nan)
+        self.sources = np.full(self.values.shape, -1, dtype=np.int64)
+        # Rows come newest document first, so the first fact for a cell wins
+        cells = period_index * len(METRIC_NAMES) + metric_ids
+        _, first = np.unique(cells, return_index=True)
+        self.values.flat[cells[first]] = values[first]
+        self.sources.flat[cells[first]] = first
+        self.source_labels = list(sources)
+
+        for metric, (minuend, subtrahend) in DERIVED.items():
+            column, a, b = (METRIC_NAMES.index(name) for name in (metric, minuend, subtrahend))
+            missing = np.isnan(self.values[:, column])
+            subtracted = self.values[missing, b]
+            if subtrahend in OUTFLOWS:
+                subtracted = np.abs(subtracted)
+            self.values[missing, column] = self.values[missing, a] - subtracted
+        self._loaded = True
+
+    def _entity_mask(self, question: str, documents: Iterable[Document]) -> np.ndarray:
+        """Entities named in the question, else those of the retrieved documents."""
+        named = [
+            i for i, entity in enumerate(self.entities)
+            if re.search(rf"\b{re.escape(entity)}\b", question, re.IGNORECASE)
+        ]
+        if not named:
+            retrieved = {self.document_entities.get(doc.metadata.get("document_id")) for doc in documents}
+            named = [i for i, entity in enumerate(self.entities) if entity in retrieved]
+        if not named and len(self.entities) == 1:
+            named = [0]
+        return np.isin(self.period_entities, named)
+
+    def _period_mask(self, question: str) -> np.ndarray:
+        pairs = [(_year(year), int(quarter)) for quarter, year in QUARTER_PERIOD.findall(question)]
+        pairs += [(int(year), QUARTER_WORDS[word.lower()]) for word, year in QUARTER_WORD_PERIOD.findall(question)]
+        if pairs:
+            keys = np.array([year * 10 + quarter for year, quarter in pairs])
+            return np.isin(self.period_years * 10 + self.period_quarters, keys)
+        years = [_year(short or full) for short, full in YEAR_PERIOD.findall(question)]
+        if years:
+            return np.isin(self.period_years, years)
+        return np.ones(len(self.period_keys), dtype=bool)
+
+    def _prior(self, sequential: bool) -> np.ndarray:
+        """Row of each period's comparison period (a year earlier, or the quarter before), or -1."""
+        years, quarters = self.period_years.copy(), self.period_quarters.copy()
+        if sequential:
+            first_quarter = quarters == 1
+            quarters = np.where(first_quarter, 4, quarters - 1)
+            years = np.where(first_quarter, years - 1, years)
+            quarters = np.where(self.period_quarters == 0, -1, quarters)
+        else:
+            years = years - 1
+        prior_keys = (self.period_entities * 10000 + years) * 10 + quarters
+        rows = np.searchsorted(self.period_keys, prior_keys)
+        rows = np.minimum(rows, max(len(self.period_keys) - 1, 0))
+        found = (self.period_keys[rows] == prior_keys) if len(self.period_keys) else np.zeros(0, dtype=bool)
+        return np.where(found, rows, -1)
+
+    def _source(self, row: int, metric: str) -> str:
+        index = self.sources[row, METRIC_NAMES.index(metric)]
+        return self.source_labels[index] if index >= 0 else "derived"
+
+    def compute(self, question: str, documents: Iterable[Document] = ()) -> Optional[Calculation]:
+        """Compute the ratio or growth rate a question asks for, if the facts allow it.
+
+        Returns None when the question asks for neither, or when no stored
+        facts cover it, so the caller can fall back to the LLM.
+        """
+        lowered = question.lower()
+        ratio = next((name for phrase, name in RATIO_PHRASES if re.search(rf"\b{re.escape(phrase)}\b", lowered)), None)
+        growth = GROWTH_WORDS.search(question) is not None
+        metric_match = re.search(rf"\b({_METRIC_ALTERNATION})\b", question, re.IGNORECASE)
+        metric = _metric_for(metric_match.group(1)) if metric_match else None
+        if ratio is None and not (growth and metric):
+            return None
+
+        # Held throughout, so a reload after ingestion never swaps the matrix mid-calculation
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if not len(self.period_keys):
+                return None
+            return self._compute(question, documents, ratio, metric, growth)
+
+    def _compute(self, question: str, documents: Iterable[Document], ratio: Optional[str],
+                 metric: Optional[str], growth: bool) -> Optional[Calculation]:
+        mask = self._entity_mask(question, documents) & self._period_mask(question)
+
+        if growth and metric and ratio is None:
+            sequential = SEQUENTIAL_WORDS.search(question) is not None
+            column = self.values[:, METRIC_NAMES.index(metric)]
+            prior = self._prior(sequential)
+            previous = np.where(prior >= 0, column[np.maximum(prior, 0)], np.nan)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result = (column - previous) / np.abs(previous)
+            name = f"{_label(metric)} growth ({'quarter over quarter' if sequential else 'year over year'})"
+            formula = f"{_label(metric)} / prior-period {_label(metric)} - 1"
+            kind = "percent"
+
+            def inputs(row: int) -> list:
+                return [(f"{_label(metric)} {self._period(row)}", column[row], self._source(row, metric)),
+                        (f"{_label(metric)} {self._period(prior[row])}", column[prior[row]],
+                         self._source(prior[row], metric))]
+        else:
+            numerator, denominator, kind = RATIOS[ratio]
+            top = self.values[:, METRIC_NAMES.index(numerator)]
+            bottom = self.values[:, METRIC_NAMES.index(denominator)]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result = np.where(bottom != 0, top / bottom, np.nan)
+            name = _label(ratio)
+            formula = f"{_label(numerator)} / {_label(denominator)}"
+
+            def inputs(row: int) -> list:
+                return [(_label(numerator), top[row], self._source(row, numerator)),
+                        (_label(denominator), bottom[row], self._source(row, denominator))]
+
+        rows = np.flatnonzero(mask & np.isfinite(result))
+        if not len(rows):
+            return None
+        # Most recent periods first
+        rows = rows[np.lexsort((-self.period_quarters[rows], -self.period_years[rows]))][:self.max_periods]
+        return Calculation(name=name, formula=formula, kind=kind, rows=[
+            CalculationRow(
+                entity=self.entities[self.period_entities[row]],
+                period=self._period(row),
+                value=float(result[row]),
+                inputs=[(label, float(value), source) for label, value, source in inputs(row)]
+            )
+            for row in rows
+        ])
+
+    def _period(self, row: int) -> str:
+        return _period_label(int(self.period_years[row]), int(self.period_quarters[row]))
+
+@lru_cache
+def get_fact_table() -> FactTable:
+    """Shared fact table over the application database."""
+    from app.models.database import SessionLocal
+    return FactTable(SessionLocal, max_periods=settings.FACTS_MAX_PERIODS)
@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential
+from app.core.config import get_settings
+from app.rag.bm25 import BM25Index
+from app.rag.embedding_cache import normalize_text
+from app.rag.vector_store import registry
+
+settings = get_settings()
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for rate limiting."""
+    return len(text) // 4 + 1
+
+def chunk_hash(text: str) -> str:
+    """Content hash of a chunk, insensitive to whitespace-only differences."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+class IngestionError(Exception):
+    """Raised when some batches still fail after all retries."""
+
+    def __init__(self, failed_batches: List[int], cause: BaseException):
+        self.failed_batches = failed_batches
+        super().__init__(f"{len(failed_batches)} batch(es) failed to embed: {cause}")
+
+@dataclass
+class IngestionResult:
+    chunks: int
+    batches: int
+    seconds: float
+    ids: List[str] = field(default_factory=list)
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+class TokenBucket:
+    """Async token bucket enforcing a tokens-per-minute budget."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.tokens = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        # Oversized requests are allowed once the bucket is full rather than blocking forever
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+class IngestionPipeline:
+    """Embed document chunks in batches and write them to a vector collection.
+
+    Batches are embedded with bounded concurrency under an optional
+    tokens-per-minute budget and retried with exponential backoff. The
+    collection is only written once every batch has been embedded, so a
+    failed document leaves nothing half-indexed; successful batches remain
+    in the embedding cache and are cheap to retry. A keyword index, if
+    given, is updated alongside every write and delete.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        collection,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        tokens_per_minute: int = 0,
+        max_retries: int = 3,
+        keyword_index: Optional[BM25Index] = None
+    ):
+        self.embeddings = embeddings
+        self.collection = collection
+        self.keyword_index = keyword_index
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.rate_limiter = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def _embed_batch(self, texts: List[str], semaphore: asyncio.Semaphore) -> List[List[float]]:
+        async with semaphore:
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.max_retries + 1),
+                wait=wait_exponential(multiplier=0.5, max=10),
+                reraise=True
+            ):
+                with attempt:
+                    if self.rate_limiter:
+                        await self.rate_limiter.acquire(sum(estimate_tokens(t) for t in texts))
+                    return await self.embeddings.aembed_documents(texts)
+
+    async def ingest(
+        self,
+        chunks: List[Document],
+        ids: Optional[List[str]] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> IngestionResult:
+        """Embed and store chunks, returning the ids written and the throughput.
+
+        ``on_progress(done_batches, total_batches)`` is called as batches finish.
+        """
+        start = time.perf_counter()
+        ids = ids or [str(uuid.uuid4()) for _ in chunks]
+        texts = [chunk.page_content for chunk in chunks]
+        batches = [
+            range(i, min(i + self.batch_size, len(texts)))
+            for i in range(0, len(texts), self.batch_size)
+        ]
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        done = 0
+
+        async def embed(batch: range) -> List[List[float]]:
+            nonlocal done
+            vectors = await self._embed_batch([texts[i] for i in batch], semaphore)
+            done += 1
+            if on_progress:
+                on_progress(done, len(batches))
+            return vectors
+
+        results = await asyncio.gather(*[embed(batch) for batch in batches], return_exceptions=True)
+        failed = [n for n, result in enumerate(results) if isinstance(result, BaseException)]
+        if failed:
+            raise IngestionError(failed, results[failed[0]])
+
+        vectors = [vector for result in results for vector in result]
+        if ids:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write, ids, vectors, texts, [chunk.metadata for chunk in chunks]
+            )
+        return IngestionResult(
+            chunks=len(chunks),
+            batches=len(batches),
+            seconds=time.perf_counter() - start,
+            ids=ids
+        )
+
+    async def delete(self, ids: List[str]) -> None:
+        """Remove vectors from the collection."""
+        if ids:
+            await asyncio.get_running_loop().run_in_executor(None, self._delete, ids)
+
+    async def update_metadata(self, ids: List[str], metadatas: List[dict]) -> None:
+        """Rewrite the metadata of stored vectors without re-embedding them."""
+        if ids:
+            await asyncio.get_running_loop().run_in_executor(None, self._update_metadata, ids, metadatas)
+
+    def _update_metadata(self, ids: List[str], metadatas: List[dict]) -> None:
+        step = self._max_batch_size or len(ids)
+        for i in range(0, len(ids), step):
+            self.collection.update(ids=ids[i:i + step], metadatas=metadatas[i:i + step])
+        if self.keyword_index is not None:
+            self.keyword_index.update_metadata(ids, metadatas)
+
+    @property
+    def _max_batch_size(self) -> Optional[int]:
+        # Chroma caps the records per call; other collections take any batch
+        return getattr(getattr(self.collection, "_client", None), "max_batch_size", None)
+
+    def _delete(self, ids: List[str]) -> None:
+        step = self._max_batch_size or len(ids)
+        for i in range(0, len(ids), step):
+            self.collection.delete(ids=ids[i:i + step])
+        if self.keyword_index is not None:
+            self.keyword_index.remove(ids)
+
+    def _write(self, ids, vectors, texts, metadatas) -> None:
+        """Upsert into the collection in as few calls as the client allows."""
+        step = self._max_batch_size or len(ids) or 1
+        for i in range(0, len(ids), step):
+            self.collection.upsert(
+                ids=ids[i:i + step],
+                embeddings=vectors[i:i + step],
+                documents=texts[i:i + step],
+                metadatas=[metadata or None for metadata in metadatas[i:i + step]]
+            )
+        if self.keyword_index is not None:
+            self.keyword_index.add(ids, texts, metadatas)
+
+def get_ingestion_pipeline(collection_name: str = "financial_docs") -> IngestionPipeline:
+    """Build an ingestion pipeline over the shared collection and embedding client."""
+    return IngestionPipeline(
+        embeddings=registry.embeddings,
+        collection=registry.get_collection(collection_name),
+        batch_size=settings.INGEST_BATCH_SIZE,
+        max_concurrency=settings.INGEST_MAX_CONCURRENCY,
+        tokens_per_minute=settings.INGEST_TOKENS_PER_MINUTE,
+        max_retries=settings.INGEST_MAX_RETRIES,
+        keyword_index=registry.keyword_index(collection_name) if settings.HYBRID_SEARCH_ENABLED else None
+    )
@@ -0,0 +1,124 @@
+import math
+import os
+from typing import Optional, Tuple
+import numpy as np
+
+# Rows scored at a time while training and assigning, to bound temporary memory
+BLOCK_ROWS = 65536
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 quantization: ``vector ~= codes * scale``."""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate([
+        np.argmax(np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32) @ centroids.T, axis=1)
+        for start in range(0, len(vectors), BLOCK_ROWS)
+    ])
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10,
+                    sample_size: int = 100000, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of unit vectors."""
+    rng = np.random.default_rng(seed)
+    sample = vectors[np.sort(rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False))]
+    sample = np.asarray(sample, dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = np.bincount(labels, minlength=nlist) == 0
+        # Re-seed empty lists so every list keeps a share of the vectors
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+class IVFIndex:
+    """Inverted-file index over int8-quantized unit vectors.
+
+    Vectors are clustered into ``nlist`` lists by spherical k-means. Each
+    list stores its vectors' int8 codes contiguously, along with their row
+    in the source matrix, at a quarter of float32 size. A query scores
+    the centroids, scans the ``nprobe`` closest lists with approximate
+    dot products, and returns the best rows; callers can re-rank those
+    exactly against the full-precision vectors.
+    """
+
+    FILES = ("centroids", "offsets", "rows", "codes", "scales")
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray,
+                 codes: np.ndarray, scales: np.ndarray):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.codes = codes
+        self.scales = scales
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.FILES)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: Optional[int] = None, iterations: int = 10,
+              seed: int = 0) -> "IVFIndex":
+        """Train lists on ``vectors`` (unit rows) and index all of them.
+
+        ``nlist`` defaults to about 4 * sqrt(n), a common balance between
+        centroid scoring and list scanning.
+        """
+        nlist = min(nlist or max(1, int(4 * math.sqrt(len(vectors)))), len(vectors))
+        centroids = train_centroids(vectors, nlist, iterations, seed=seed)
+        labels = _assign(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))]).astype(np.int64)
+        codes = np.empty((len(vectors), vectors.shape[1]), dtype=np.int8)
+        scales = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(order), BLOCK_ROWS):
+            block = order[start:start + BLOCK_ROWS]
+            codes[start:start + len(block)], scales[start:start + len(block)] = quantize(
+                np.asarray(vectors[block], dtype=np.float32)
+            )
+        return cls(centroids, offsets, order.astype(np.int64), codes, scales)
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        for name in self.FILES:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        """Open a saved index with its codes memory-mapped."""
+        return cls(**{
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if name == "codes" else None)
+            for name in cls.FILES
+        })
+
+    def search(self, query: np.ndarray, n: int, nprobe: int,
+               live: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top ``n`` ``(rows, scores)`` for one unit query vector.
+
+        ``live`` is a boolean mask over source rows; rows where it is False
+        are skipped.
+        """
+        nprobe = min(nprobe, self.nlist)
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        spans = [(self.offsets[i], self.offsets[i + 1]) for i in lists if self.offsets[i + 1] > self.offsets[i]]
+        if not spans:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        codes = np.concatenate([self.codes[start:stop] for start, stop in spans])
+        scales = np.concatenate([self.scales[start:stop] for start, stop in spans])
+        rows = np.concatenate([self.rows[start:stop] for start, stop in spans])
+        scores = (codes @ query) * scales
+        if live is not None:
+            scores[~live[rows]] = -np.inf
+        n = min(n, len(scores))
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[scores[top] != -np.inf]
+        return rows[top], scores[top]
@@ -0,0 +1,403 @@
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Dict, Optional
+from app.core.config import get_settings
+from app.models.database import SessionLocal, Document, DocumentChunk, FinancialFact
+from app.rag.document_processor import DocumentProcessor
+from app.rag.facts import extract_facts, get_fact_table
+from app.rag.ingestion import chunk_hash, get_ingestion_pipeline
+from app.rag.metadata import annotate_chunks, extract_document_metadata
+from app.rag.vector_store import registry
+from app.agents.answer_cache import get_answer_cache
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue cannot accept more jobs."""
+
+class MaintenanceLock:
+    """Async readers-writer lock: ingestion and deletes share it, compaction is exclusive.
+
+    Waiting writers block new readers so compaction is not starved by a
+    steady stream of uploads.
+    """
+
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @asynccontextmanager
+    async def shared(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writer and not self._writers_waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def exclusive(self):
+        async with self._condition:
+            self._writers_waiting += 1
+            try:
+                await self._condition.wait_for(lambda: not self._writer and not self._readers)
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+@dataclass
+class IngestionJob:
+    """Progress of one background ingestion."""
+    id: str
+    document_id: int
+    filename: str
+    file_type: str
+    path: str
+    content_hash: Optional[str] = None
+    metadata: Dict[str, object] = field(default_factory=dict)  # company/ticker/period given at upload
+    status: str = "queued"  # queued -> parsing -> embedding -> completed | failed
+    progress: float = 0.0
+    num_chunks: int = 0
+    added: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.pop("path")
+        data.pop("content_hash")
+        data.pop("metadata")
+        return data
+
+class IngestionJobManager:
+    """Bounded worker pool that parses, chunks and embeds uploads off the request path.
+
+    Jobs wait in a bounded queue and are picked up by ``INGEST_WORKERS``
+    asyncio workers. PDF page extraction is CPU-bound, so it is spread over a
+    process pool; embedding and the vector writes go through the shared
+    ingestion pipeline.
+    Job state is kept in memory, while the document's status is persisted on
+    its ``Document`` row.
+
+    Ingestion is incremental: every chunk is stored under an id derived from
+    its content hash and recorded as a ``DocumentChunk``, so re-ingesting a
+    revised file only embeds the chunks that are new and deletes the ones
+    that disappeared.
+    """
+
+    max_finished_jobs = 1000
+
+    def __init__(self, workers: int = 2, parse_processes: int = 2, queue_size: int = 100):
+        self.workers = workers
+        self.parse_processes = parse_processes
+        self.queue_size = queue_size
+        self.jobs: Dict[str, IngestionJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pipeline = None
+        self._processor = DocumentProcessor()
+        self._document_locks: Dict[int, list] = {}  # document id -> [lock, tasks holding or waiting for it]
+        self._maintenance: Optional[MaintenanceLock] = None
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._maintenance = MaintenanceLock()
+        self._pool = ProcessPoolExecutor(max_workers=self.parse_processes)
+        # One pipeline for all workers so the token budget is shared
+        self._pipeline = get_ingestion_pipeline()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, document_id: int, filename: str, file_type: str, path: str,
+               content_hash: Optional[str] = None, metadata: Optional[dict] = None) -> IngestionJob:
+        """Queue an upload that has already been written to ``path``.
+
+        ``metadata`` overrides the company, ticker and period detected from
+        the file.
+        """
+        if self._queue is None:
+            raise RuntimeError("Ingestion workers are not running")
+        job = IngestionJob(
+            id=uuid.uuid4().hex,
+            document_id=document_id,
+            filename=filename,
+            file_type=file_type,
+            path=path,
+            content_hash=content_hash,
+            metadata={key: value for key, value in (metadata or {}).items() if value is not None}
+        )
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError("Ingestion queue is full, try again later")
+        self.jobs[job.id] = job
+        self._prune()
+        return job
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs once there are too many."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    async def delete_document(self, document_id: int) -> Optional[Document]:
+        """Remove a document's vectors, chunk records and row; returns the deleted row."""
+        loop = asyncio.get_running_loop()
+        async with self._document_lock(document_id), self._maintenance.shared():
+            doc = await loop.run_in_executor(None, self._get_document, document_id)
+            if doc is None:
+                return None
+            chunks = await loop.run_in_executor(None, self._load_chunks, document_id)
+            if chunks:
+                vector_ids = [row.vector_id for row in chunks.values()]
+            else:
+                # Documents ingested before chunk ids were recorded
+                legacy = await loop.run_in_executor(
+                    None, lambda: self._pipeline.collection.get(where={"source": doc.filename}, include=[])
+                )
+                vector_ids = legacy["ids"]
+            await self._pipeline.delete(vector_ids)
+            await loop.run_in_executor(None, self._delete_rows, document_id)
+        get_answer_cache().invalidate()
+        get_fact_table().invalidate()
+        return doc
+
+    async def compact(self, collection_name: str = "financial_docs") -> dict:
+        """Rebuild a collection without deleted vectors, pausing ingestion meanwhile."""
+        async with self._maintenance.exclusive():
+            start = time.perf_counter()
+            # Checked first: the rebuild renames the old collection handle
+            swap = self._pipeline.collection.name == collection_name
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, registry.rebuild, collection_name
+            )
+            if swap:
+                self._pipeline.collection = registry.get_collection(collection_name)
+        return {**result, "seconds": round(time.perf_counter() - start, 3)}
+
+    @asynccontextmanager
+    async def _document_lock(self, document_id: int):
+        """Hold the document's lock; it is dropped once no task holds or waits for it."""
+        entry = self._document_locks.setdefault(document_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._document_locks[document_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                # Revisions of the same document are applied one at a time
+                async with self._document_lock(job.document_id), self._maintenance.shared():
+                    await self._run(job)
+            except Exception as e:
+                job.status = "failed"
+                # Keeps any note _run recorded about cleaning up after the failure
+                job.error = "; ".join(filter(None, [str(e), job.error]))
+                await self._update_document(job.document_id, status="failed")
+            finally:
+                job.finished_at = job.finished_at or datetime.utcnow()
+                self._queue.task_done()
+
+    async def _run(self, job: IngestionJob) -> None:
+        loop = asyncio.get_running_loop()
+
+        job.status = "parsing"
+        await self._update_document(job.document_id, status="processing")
+        # Pages are extracted across the process pool; the thread only splits text
+        chunks = await loop.run_in_executor(
+            None, self._processor.process_file, job.path, job.filename, job.file_type, self._pool
+        )
+        job.num_chunks = len(chunks)
+        job.progress = 0.1
+
+        sample = "\n".join(chunk.page_content for chunk in chunks[:5])
+        document_metadata = {
+            **extract_document_metadata(job.filename, sample),
+            **job.metadata,
+            "document_id": job.document_id
+        }
+        annotate_chunks(chunks, document_metadata)
+        # Figures are re-read from the whole file, as a revision can restate any of them
+        facts = await loop.run_in_executor(None, extract_facts, chunks) if settings.FACTS_ENABLED else None
+
+        # Identical chunks within a file are stored once
+        incoming = {}
+        for chunk in chunks:
+            incoming.setdefault(chunk_hash(chunk.page_content), chunk)
+        if await loop.run_in_executor(None, self._get_document, job.document_id) is None:
+            raise RuntimeError("Document was deleted before it was ingested")
+        existing = await loop.run_in_executor(None, self._load_chunks, job.document_id)
+
+        added = {h: chunk for h, chunk in incoming.items() if h not in existing}
+        removed = [existing[h] for h in existing if h not in incoming]
+        # Unchanged chunks keep their vectors but may have new page, section or period tags
+        retagged = [(existing[h].vector_id, chunk) for h, chunk in incoming.items() if h in existing]
+        moved = [
+            (vector_id, chunk) for vector_id, chunk in retagged
+            if existing[chunk_hash(chunk.page_content)].page != chunk.metadata.get("page")
+        ]
+        job.added, job.removed, job.unchanged = len(added), len(removed), len(incoming) - len(added)
+
+        job.status = "embedding"
+
+        def on_progress(done: int, total: int) -> None:
+            job.progress = 0.1 + 0.85 * done / total
+
+        added_ids = [self._vector_id(job.document_id, h) for h in added]
+        try:
+            await self._pipeline.ingest(list(added.values()), ids=added_ids, on_progress=on_progress)
+            await self._pipeline.delete([row.vector_id for row in removed])
+            await self._pipeline.update_metadata(
+                [vector_id for vector_id, _ in retagged], [chunk.metadata for _, chunk in retagged]
+            )
+
+            preview = chunks[0].page_content[:200] if chunks else ""
+            await loop.run_in_executor(
+                None, self._save_chunks, job, added, removed, moved, preview, document_metadata, facts
+            )
+        except BaseException:
+            # Without DocumentChunk rows, delete and compaction could never find these vectors again
+            try:
+                await asyncio.shield(self._pipeline.delete(added_ids))
+            except Exception as e:
+                job.error = f"could not remove {len(added_ids)} vectors added before the failure: {e}"
+                logger.warning("Could not remove vectors of failed ingestion job %s: %s", job.id, e)
+            raise
+        if added or removed:
+            get_answer_cache().invalidate()
+        if facts is not None:
+            get_fact_table().invalidate()
+
+        job.status = "completed"
+        job.progress = 1.0
+        job.finished_at = datetime.utcnow()
+
+    @staticmethod
+    def _vector_id(document_id: int, content_hash: str) -> str:
+        return f"{document_id}-{content_hash}"
+
+    @staticmethod
+    def _get_document(document_id: int) -> Optional[Document]:
+        db = SessionLocal()
+        try:
+            return db.query(Document).filter(Document.id == document_id).first()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _delete_rows(document_id: int) -> None:
+        db = SessionLocal()
+        try:
+            db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete()
+            db.query(FinancialFact).filter(FinancialFact.document_id == document_id).delete()
+            db.query(Document).filter(Document.id == document_id).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _load_chunks(document_id: int) -> Dict[str, DocumentChunk]:
+        db = SessionLocal()
+        try:
+            rows = db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).all()
+            return {row.chunk_hash: row for row in rows}
+        finally:
+            db.close()
+
+    def _save_chunks(self, job: IngestionJob, added: dict, removed: list, moved: list,
+                     preview: str, document_metadata: dict, facts: Optional[list] = None) -> None:
+        """Record the applied chunk diff and mark the document ready, in one transaction.
+
+        ``facts`` replace the document's stored financial facts unless None.
+        """
+        db = SessionLocal()
+        try:
+            if removed:
+                db.query(DocumentChunk).filter(
+                    DocumentChunk.id.in_([row.id for row in removed])
+                ).delete(synchronize_session=False)
+            for vector_id, chunk in moved:
+                db.query(DocumentChunk).filter(DocumentChunk.vector_id == vector_id).update(
+                    {"page": chunk.metadata.get("page")}
+                )
+            db.add_all([
+                DocumentChunk(
+                    document_id=job.document_id,
+                    chunk_hash=h,
+                    vector_id=self._vector_id(job.document_id, h),
+                    page=chunk.metadata.get("page")
+                )
+                for h, chunk in added.items()
+            ])
+            if facts is not None:
+                db.query(FinancialFact).filter(FinancialFact.document_id == job.document_id).delete()
+                db.add_all([FinancialFact(document_id=job.document_id, **fact) for fact in facts])
+            doc = db.query(Document).filter(Document.id == job.document_id).first()
+            if doc:
+                doc.status = "ready"
+                doc.num_chunks = job.num_chunks
+                doc.content_hash = job.content_hash or doc.content_hash
+                doc.content_preview = preview
+                for key in ("company", "ticker", "fiscal_year", "quarter"):
+                    setattr(doc, key, document_metadata.get(key))
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    async def _update_document(document_id: int, **fields) -> None:
+        def update():
+            db = SessionLocal()
+            try:
+                db.query(Document).filter(Document.id == document_id).update(fields)
+                db.commit()
+            finally:
+                db.close()
+        await asyncio.get_running_loop().run_in_executor(None, update)
+
+job_manager = IngestionJobManager(
+    workers=settings.INGEST_WORKERS,
+    parse_processes=settings.INGEST_PARSE_PROCESSES,
+    queue_size=settings.INGEST_QUEUE_SIZE
+)
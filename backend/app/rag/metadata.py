@@ -0,0 +1,109 @@
+import re
+from typing import Dict, Iterable, Optional
+from langchain.schema import Document
+
+# Chunk metadata fields that retrieval can filter on
+FILTERABLE_FIELDS = ("document_id", "page", "company", "ticker", "fiscal_year", "quarter", "section")
+
+TICKER_PATTERNS = [
+    re.compile(r"\((?:NYSE|NASDAQ|Nasdaq|AMEX|NYSE American)\s*:\s*([A-Z]{1,5}(?:\.[A-Z])?)\)"),
+    re.compile(r"\b(?:ticker|trading symbol)s?\s*[:\-]?\s*([A-Z]{1,5}(?:\.[A-Z])?)\b", re.IGNORECASE),
+]
+COMPANY_PATTERN = re.compile(
+    r"\b([A-Z][A-Za-z0-9&.\-]*(?:\s+[A-Z][A-Za-z0-9&.\-]*){0,4},?\s+(?:Inc|Corp|Corporation|Ltd|PLC|plc|Co|LLC|N\.V|S\.A|AG|SE)\.?)"
+)
+FISCAL_YEAR_PATTERNS = [
+    re.compile(r"\bfiscal\s+(?:year\s+)?(20\d{2})\b", re.IGNORECASE),
+    re.compile(r"\bFY\s?'?(20\d{2}|\d{2})\b", re.IGNORECASE),
+    re.compile(r"\bQ[1-4]\s+(20\d{2})\b", re.IGNORECASE),
+    re.compile(r"\byear\s+ended\s+\w+\s+\d{1,2},\s+(20\d{2})\b", re.IGNORECASE),
+]
+QUARTER_PATTERNS = [
+    re.compile(r"\bQ([1-4])\b", re.IGNORECASE),
+    re.compile(r"\b(first|second|third|fourth)\s+quarter\b", re.IGNORECASE),
+]
+QUARTER_WORDS = {"first": 1, "second": 2, "third": 3, "fourth": 4}
+
+# (section name, heading pattern); 10-K/10-Q items first, then statement titles
+SECTION_PATTERNS = [
+    ("business", re.compile(r"^\s*item\s+1\.?\s+business\b", re.IGNORECASE | re.MULTILINE)),
+    ("risk_factors", re.compile(r"^\s*item\s+1a\.?\s+risk\s+factors\b", re.IGNORECASE | re.MULTILINE)),
+    ("legal_proceedings", re.compile(r"^\s*item\s+3\.?\s+legal\s+proceedings\b", re.IGNORECASE | re.MULTILINE)),
+    ("mdna", re.compile(r"^\s*item\s+[27]\.?\s+management.s\s+discussion", re.IGNORECASE | re.MULTILINE)),
+    ("market_risk", re.compile(r"^\s*item\s+[37]a\.?\s+quantitative\s+and\s+qualitative", re.IGNORECASE | re.MULTILINE)),
+    ("financial_statements", re.compile(r"^\s*item\s+[18]\.?\s+financial\s+statements", re.IGNORECASE | re.MULTILINE)),
+    ("balance_sheet", re.compile(r"^\s*(?:consolidated\s+)?balance\s+sheets?\b", re.IGNORECASE | re.MULTILINE)),
+    ("income_statement", re.compile(
+        r"^\s*(?:consolidated\s+)?statements?\s+of\s+(?:operations|income)\b", re.IGNORECASE | re.MULTILINE
+    )),
+    ("cash_flow", re.compile(r"^\s*(?:consolidated\s+)?statements?\s+of\s+cash\s+flows?\b", re.IGNORECASE | re.MULTILINE)),
+    ("notes", re.compile(r"^\s*notes\s+to\s+(?:the\s+)?(?:consolidated\s+)?financial\s+statements\b", re.IGNORECASE | re.MULTILINE)),
+]
+
+def _first_match(patterns, text: str) -> Optional[str]:
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+def _fiscal_year(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    year = int(value)
+    return year + 2000 if year < 100 else year
+
+def _quarter(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    return QUARTER_WORDS.get(value.lower()) or int(value)
+
+def extract_document_metadata(filename: str, text: str) -> Dict[str, object]:
+    """Best-effort company, ticker, fiscal year and quarter of a filing.
+
+    Looks at the filename first (e.g. ``TSLA_10-Q_FY2024_Q3.pdf``) and then
+    at the opening text of the document. Fields that cannot be found are
+    left out rather than guessed.
+    """
+    name = re.sub(r"[_\-]+", " ", filename.rsplit(".", 1)[0])
+    metadata: Dict[str, object] = {}
+
+    ticker = _first_match(TICKER_PATTERNS, text)
+    if ticker:
+        metadata["ticker"] = ticker.upper()
+    company = COMPANY_PATTERN.search(text)
+    if company:
+        metadata["company"] = " ".join(company.group(1).split())
+
+    fiscal_year = _fiscal_year(_first_match(FISCAL_YEAR_PATTERNS, name) or _first_match(FISCAL_YEAR_PATTERNS, text))
+    if fiscal_year:
+        metadata["fiscal_year"] = fiscal_year
+    quarter = _quarter(_first_match(QUARTER_PATTERNS, name) or _first_match(QUARTER_PATTERNS, text))
+    if quarter:
+        metadata["quarter"] = quarter
+    return metadata
+
+def detect_section(text: str) -> Optional[str]:
+    """Return the last section heading that appears in ``text``, if any."""
+    best, best_pos = None, -1
+    for section, pattern in SECTION_PATTERNS:
+        for match in pattern.finditer(text):
+            if match.start() > best_pos:
+                best, best_pos = section, match.start()
+    return best
+
+def annotate_chunks(chunks: Iterable[Document], document_metadata: Dict[str, object]) -> None:
+    """Attach document-level fields and the running section to each chunk in order."""
+    section = None
+    for chunk in chunks:
+        section = detect_section(chunk.page_content) or section
+        chunk.metadata.update(document_metadata)
+        if section:
+            chunk.metadata["section"] = section
+
+def build_where(filters: Optional[Dict[str, object]]) -> Optional[dict]:
+    """Translate equality filters into a Chroma ``where`` clause."""
+    conditions = [{key: value} for key, value in (filters or {}).items() if value is not None]
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
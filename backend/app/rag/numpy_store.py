@@ -0,0 +1,466 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from app.rag.ivf import IVFIndex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (id INTEGER PRIMARY KEY AUTOINCREMENT, rows INTEGER NOT NULL, dim INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS records (
+    id TEXT PRIMARY KEY, segment INTEGER NOT NULL, row INTEGER NOT NULL, document TEXT, metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS records_position ON records (segment, row);
+CREATE TABLE IF NOT EXISTS tombstones (seq INTEGER PRIMARY KEY AUTOINCREMENT, segment INTEGER, row INTEGER);
+"""
+
+# Rows converted to float32 at a time when scoring float16 segments (NumPy has no float16 BLAS)
+SCORE_BLOCK_ROWS = 8192
+
+def _where_sql(where: dict) -> Tuple[str, list]:
+    """Translate the subset of Chroma's ``where`` syntax used by the app into SQL."""
+    clauses, params = [], []
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            parts = [_where_sql(condition) for condition in value]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(sql for sql, _ in parts) + ")")
+            params.extend(param for _, part_params in parts for param in part_params)
+            continue
+        field = f"json_extract(metadata, '$.\"{key.replace(chr(34), '')}\"')"
+        op, operand = next(iter(value.items())) if isinstance(value, dict) else ("$eq", value)
+        if op == "$eq":
+            clauses.append(f"{field} = ?")
+            params.append(operand)
+        elif op == "$ne":
+            clauses.append(f"({field} IS NULL OR {field} != ?)")
+            params.append(operand)
+        elif op == "$in":
+            clauses.append(f"{field} IN ({','.join('?' * len(operand))})")
+            params.extend(operand)
+        else:
+            raise ValueError(f"Unsupported where operator {op!r}")
+    return " AND ".join(clauses) or "1", params
+
+class NumpyCollection:
+    """Vector collection backed by memory-mapped NumPy segments.
+
+    Normalized embeddings live in append-only ``.npy`` segment files
+    (float32, or float16 to halve disk and page cache use) that are opened
+    with ``mmap_mode="r"``, so every worker process on a host shares the
+    same pages through the OS cache. Ids, documents and metadata live in a
+    SQLite side table that maps each id to its segment and row.
+
+    Writes never modify a segment: upserts append a new one and tombstone
+    the rows they replace, deletes only add tombstones. Queries score every
+    live row with a vectorized dot product and pick the top k with
+    ``argpartition``, so results are exact. ``compact`` merges segments and
+    drops dead rows.
+
+    With ``index="ivf"``, compaction also builds an `IVFIndex` over the
+    merged segment. Unfiltered queries then scan only the ``nprobe``
+    closest lists of int8 codes and re-rank the best ``n * rerank`` rows
+    exactly against the stored vectors (``rerank=0`` keeps the approximate
+    scores). Segments appended since the last compaction, and filtered
+    queries, are still scored exactly.
+
+    The methods mirror the parts of the Chroma collection API used by the
+    ingestion pipeline and retriever, so either store can sit behind them.
+    """
+
+    metadata = {"hnsw:space": "cosine"}
+
+    def __init__(self, path: str, name: str, dtype: str = "float32", index: str = "flat",
+                 nlist: int = 0, nprobe: int = 16, rerank: int = 4):
+        if index not in ("flat", "ivf"):
+            raise ValueError(f"Unknown vector index {index!r}, expected 'flat' or 'ivf'")
+        self.path = path
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.index = index
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.rerank = rerank
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(path, "index.db"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._segments: Dict[int, np.ndarray] = {}
+        self._live: Dict[int, np.ndarray] = {}
+        self._indexes: Dict[int, IVFIndex] = {}
+        self._tombstone_seq = 0
+        self._version = None
+        self._sync(force=True)
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.path, f"segment-{segment_id:08d}.npy")
+
+    def _index_path(self, segment_id: int) -> str:
+        return os.path.join(self.path, f"segment-{segment_id:08d}.ivf")
+
+    def _sync(self, force: bool = False) -> None:
+        """Pick up segments and tombstones written by this or other processes."""
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._version and not force:
+            return
+        self._version = version
+        segment_ids = {row[0] for row in self._db.execute("SELECT id FROM segments")}
+        for segment_id in list(self._segments):
+            if segment_id not in segment_ids:
+                # Removed by compaction; other processes may still map the unlinked file
+                del self._segments[segment_id], self._live[segment_id]
+                self._indexes.pop(segment_id, None)
+        new_segments = segment_ids - set(self._segments)
+        for segment_id in new_segments:
+            vectors = np.load(self._segment_path(segment_id), mmap_mode="r")
+            self._segments[segment_id] = vectors
+            self._live[segment_id] = np.ones(len(vectors), dtype=bool)
+            # Indexes are written before their segment is committed, so one is never missed
+            if os.path.isdir(self._index_path(segment_id)):
+                self._indexes[segment_id] = IVFIndex.load(self._index_path(segment_id))
+
+        # New segments need their full tombstone history, the rest only what is new
+        since = 0 if new_segments else self._tombstone_seq
+        for seq, segment_id, row in self._db.execute(
+            "SELECT seq, segment, row FROM tombstones WHERE seq > ?", (since,)
+        ):
+            live = self._live.get(segment_id)
+            if live is not None:
+                live[row] = False
+            self._tombstone_seq = max(self._tombstone_seq, seq)
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def _normalize(self, embeddings) -> np.ndarray:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms == 0, 1, norms)).astype(self.dtype)
+
+    def upsert(self, ids: List[str], embeddings, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Optional[dict]]] = None) -> None:
+        """Append a segment holding these vectors, replacing rows stored under the same ids."""
+        if not ids:
+            return
+        vectors = self._normalize(embeddings)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        # An id repeated within the batch keeps its last occurrence, as sequential upserts would
+        last = {doc_id: position for position, doc_id in enumerate(ids)}
+        if len(last) < len(ids):
+            keep = sorted(last.values())
+            ids = [ids[i] for i in keep]
+            vectors = vectors[keep]
+            documents = [documents[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                dims = {row[0] for row in self._db.execute("SELECT DISTINCT dim FROM segments")}
+                if dims and dims != {vectors.shape[1]}:
+                    raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection {dims.pop()}")
+                segment_id = self._db.execute(
+                    "INSERT INTO segments (rows, dim) VALUES (?, ?)", (len(ids), vectors.shape[1])
+                ).lastrowid
+                # Write to a temporary name so readers never map a partial file
+                tmp_path = self._segment_path(segment_id) + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    np.save(f, vectors)
+                os.replace(tmp_path, self._segment_path(segment_id))
+                self._tombstone(ids)
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO records (id, segment, row, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (doc_id, segment_id, row, document, json.dumps(metadata) if metadata else None)
+                        for row, (doc_id, document, metadata) in enumerate(zip(ids, documents, metadatas))
+                    ]
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._sync(force=True)
+
+    add = upsert
+
+    def _tombstone(self, ids: List[str]) -> None:
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            self._db.execute(
+                f"INSERT INTO tombstones (segment, row) SELECT segment, row FROM records "
+                f"WHERE id IN ({','.join('?' * len(batch))})",
+                batch
+            )
+
+    def update(self, ids: List[str], metadatas: List[Optional[dict]]) -> None:
+        """Replace metadata in the side table; vectors are untouched."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE records SET metadata = ? WHERE id = ?",
+                [(json.dumps(metadata) if metadata else None, doc_id) for doc_id, metadata in zip(ids, metadatas)]
+            )
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None) -> None:
+        with self._lock:
+            if ids is None:
+                ids = self.get(where=where, include=[])["ids"] if where else []
+            if not ids:
+                return
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._tombstone(ids)
+                for start in range(0, len(ids), 500):
+                    batch = ids[start:start + 500]
+                    self._db.execute(f"DELETE FROM records WHERE id IN ({','.join('?' * len(batch))})", batch)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._sync(force=True)
+
+    def _snapshot(self) -> Tuple[Dict[int, np.ndarray], Dict[int, np.ndarray], Dict[int, IVFIndex]]:
+        """Segments, live masks and indexes as of now; call with the lock held.
+
+        Scoring runs on the snapshot outside the lock. Segment arrays are never
+        modified, and rows tombstoned meanwhile are dropped by the record lookup.
+        """
+        return dict(self._segments), dict(self._live), dict(self._indexes)
+
+    @staticmethod
+    def _vectors(segments: Dict[int, np.ndarray], positions: List[Tuple[int, int]]) -> List[List[float]]:
+        return [segments[segment][row].astype(np.float32).tolist() for segment, row in positions]
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Iterable[str] = ("metadatas", "documents")) -> Dict[str, Any]:
+        """Fetch records by id and/or ``where`` filter, in insertion order."""
+        include = set(include)
+        sql, params = _where_sql(where or {})
+        if ids is not None:
+            if not ids:
+                return {"ids": [], "embeddings": None, "documents": None, "metadatas": None}
+            sql += f" AND id IN ({','.join('?' * len(ids))})"
+            params = params + list(ids)
+        query = f"SELECT id, segment, row, document, metadata FROM records WHERE {sql} ORDER BY segment, row"
+        if limit is not None or offset:
+            query += " LIMIT ? OFFSET ?"
+            params = params + [-1 if limit is None else limit, offset or 0]
+        with self._lock:
+            self._sync()
+            rows = self._db.execute(query, params).fetchall()
+            if any(row[1] not in self._segments for row in rows):
+                self._sync(force=True)
+            segments = dict(self._segments)
+        embeddings = self._vectors(segments, [(row[1], row[2]) for row in rows]) if "embeddings" in include else None
+        return {
+            "ids": [row[0] for row in rows],
+            "embeddings": embeddings,
+            "documents": [row[3] for row in rows] if "documents" in include else None,
+            "metadatas": [json.loads(row[4]) if row[4] else None for row in rows] if "metadatas" in include else None,
+        }
+
+    @staticmethod
+    def _scores(vectors: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        if vectors.dtype == np.float32:
+            return vectors @ queries.T
+        return np.concatenate([
+            vectors[start:start + SCORE_BLOCK_ROWS].astype(np.float32) @ queries.T
+            for start in range(0, len(vectors), SCORE_BLOCK_ROWS)
+        ]) if len(vectors) else np.empty((0, len(queries)), dtype=np.float32)
+
+    def _allowed(self, where: dict) -> Dict[int, np.ndarray]:
+        sql, params = _where_sql(where)
+        allowed: Dict[int, List[int]] = {}
+        for segment, row in self._db.execute(f"SELECT segment, row FROM records WHERE {sql}", params):
+            allowed.setdefault(segment, []).append(row)
+        return {segment: np.asarray(rows) for segment, rows in allowed.items()}
+
+    def _top_k(self, queries: np.ndarray, n: int, allowed: Optional[Dict[int, np.ndarray]],
+               segments: Dict[int, np.ndarray], live: Dict[int, np.ndarray],
+               indexes: Dict[int, IVFIndex]) -> List[List[Tuple[float, int, int]]]:
+        """Best ``(score, segment, row)`` triples per query, across the snapshot's segments."""
+        candidates: List[List[Tuple[float, int, int]]] = [[] for _ in range(len(queries))]
+        for segment_id, vectors in segments.items():
+            index = indexes.get(segment_id) if self.index == "ivf" else None
+            if allowed is None and index is not None:
+                for q, query in enumerate(queries):
+                    candidates[q].extend(self._search_index(segment_id, vectors, live[segment_id], index, query, n))
+                continue
+            if allowed is None:
+                rows = None
+                scores = self._scores(vectors, queries)
+                scores[~live[segment_id]] = -np.inf
+            else:
+                rows = allowed.get(segment_id)
+                if rows is None:
+                    continue
+                scores = self._scores(vectors[rows], queries)
+            take = min(n, len(scores))
+            if not take:
+                continue
+            top = np.argpartition(-scores, take - 1, axis=0)[:take]
+            for q in range(len(queries)):
+                for index in top[:, q]:
+                    score = scores[index, q]
+                    if score != -np.inf:
+                        row = int(index if rows is None else rows[index])
+                        candidates[q].append((float(score), segment_id, row))
+        return [sorted(found, reverse=True)[:n] for found in candidates]
+
+    def _search_index(self, segment_id: int, vectors: np.ndarray, live: np.ndarray, index: IVFIndex,
+                      query: np.ndarray, n: int) -> List[Tuple[float, int, int]]:
+        rows, scores = index.search(query, n * max(self.rerank, 1), self.nprobe, live)
+        if self.rerank and len(rows):
+            # Sorted rows keep the reads from the memory-mapped segment sequential
+            rows = np.sort(rows)
+            scores = self._scores(vectors[rows], query[None, :])[:, 0]
+            top = np.argpartition(-scores, min(n, len(rows)) - 1)[:n]
+            rows, scores = rows[top], scores[top]
+        return [(float(score), segment_id, int(row)) for row, score in zip(rows, scores)]
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[dict] = None,
+              include: Iterable[str] = ("metadatas", "documents", "distances")) -> Dict[str, Any]:
+        """Top ``n_results`` by cosine similarity, in Chroma's result format."""
+        include = set(include)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        while True:
+            # Scoring runs outside the lock, so writers and other queries are not held up by it
+            with self._lock:
+                self._sync()
+                snapshot = self._snapshot()
+                allowed = self._allowed(where) if where else None
+            found = self._top_k(queries, n_results, allowed, *snapshot)
+            with self._lock:
+                self._sync()
+                if all(segment in self._segments for hits in found for _, segment, _ in hits):
+                    return self._query_result(found, snapshot[0], include)
+            # Compaction replaced a scored segment meanwhile; score the merged one instead
+
+    def _query_result(self, found: List[List[Tuple[float, int, int]]], segments: Dict[int, np.ndarray],
+                      include: set) -> Dict[str, Any]:
+        """Look up the records of scored hits; call with the lock held."""
+        result = {key: [] for key in ("ids", "distances", "documents", "metadatas", "embeddings")}
+        for hits in found:
+            records = {}
+            positions = [(segment, row) for _, segment, row in hits]
+            for start in range(0, len(positions), 200):
+                batch = positions[start:start + 200]
+                for record in self._db.execute(
+                    "SELECT id, segment, row, document, metadata FROM records WHERE "
+                    + " OR ".join("(segment = ? AND row = ?)" for _ in batch),
+                    [value for position in batch for value in position]
+                ):
+                    records[(record[1], record[2])] = record
+            # A row can be tombstoned between scoring and lookup, here or by another process
+            hits = [hit for hit in hits if (hit[1], hit[2]) in records]
+            rows = [records[(segment, row)] for _, segment, row in hits]
+            result["ids"].append([row[0] for row in rows])
+            result["distances"].append([1.0 - score for score, _, _ in hits])
+            result["documents"].append([row[3] for row in rows])
+            result["metadatas"].append([json.loads(row[4]) if row[4] else None for row in rows])
+            if "embeddings" in include:
+                result["embeddings"].append(self._vectors(segments, [(segment, row) for _, segment, row in hits]))
+        return {key: value if key == "ids" or key in include else None for key, value in result.items()}
+
+    def compact(self) -> dict:
+        """Merge all segments into one holding only live rows, indexing it if configured."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync(force=True)
+                rows = self._db.execute("SELECT id, segment, row FROM records ORDER BY segment, row").fetchall()
+                old_segments = list(self._segments)
+                if rows:
+                    vectors = np.concatenate([
+                        self._segments[segment][[row for _, seg, row in rows if seg == segment]]
+                        for segment in sorted({segment for _, segment, _ in rows})
+                    ])
+                    segment_id = self._db.execute(
+                        "INSERT INTO segments (rows, dim) VALUES (?, ?)", (len(rows), vectors.shape[1])
+                    ).lastrowid
+                    tmp_path = self._segment_path(segment_id) + ".tmp"
+                    with open(tmp_path, "wb") as f:
+                        np.save(f, vectors)
+                    os.replace(tmp_path, self._segment_path(segment_id))
+                    if self.index == "ivf":
+                        IVFIndex.build(vectors, self.nlist or None).save(self._index_path(segment_id))
+                    self._db.executemany(
+                        "UPDATE records SET segment = ?, row = ? WHERE id = ?",
+                        [(segment_id, row, doc_id) for row, (doc_id, _, _) in enumerate(rows)]
+                    )
+                if old_segments:
+                    self._db.execute(
+                        f"DELETE FROM segments WHERE id IN ({','.join('?' * len(old_segments))})", old_segments
+                    )
+                self._db.execute("DELETE FROM tombstones")
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._sync(force=True)
+            for segment_id in old_segments:
+                # Processes that still map the old file keep it alive until they sync
+                os.remove(self._segment_path(segment_id))
+                shutil.rmtree(self._index_path(segment_id), ignore_errors=True)
+            return {"segments_merged": len(old_segments), "vectors": len(rows)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._segments.clear()
+            self._live.clear()
+            self._indexes.clear()
+            self._db.close()
+
+class NumpyVectorStore(VectorStore):
+    """LangChain vector store over a `NumpyCollection`.
+
+    Exposes the collection as ``_collection`` like the Chroma wrapper does,
+    which is what the ingestion pipeline and retriever use.
+    """
+
+    def __init__(self, collection: NumpyCollection, embedding_function: Embeddings):
+        self._collection = collection
+        self._embedding_function = embedding_function
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self._collection.upsert(
+            ids=ids, embeddings=self._embedding_function.embed_documents(texts),
+            documents=texts, metadatas=metadatas
+        )
+        return ids
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        result = self._collection.query(
+            [self._embedding_function.embed_query(query)], n_results=k, where=filter
+        )
+        return [
+            (Document(page_content=text, metadata=metadata or {}), distance)
+            for text, metadata, distance in zip(result["documents"][0], result["metadatas"][0], result["distances"][0])
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   path: str = "./vector_index", collection_name: str = "langchain", **kwargs: Any):
+        store = cls(NumpyCollection(os.path.join(path, collection_name), collection_name), embedding)
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
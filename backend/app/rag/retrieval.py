@@ -0,0 +1,183 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+from langchain_core.vectorstores import VectorStore
+from app.core.config import get_settings
+from app.rag.bm25 import BM25Index
+from app.rag.metadata import build_where
+from app.rag.vector_store import registry
+
+settings = get_settings()
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """Merge ranked id lists, scoring each id by the sum of 1 / (k + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class Retriever:
+    """Vector search, optionally fused with BM25 keyword search.
+
+    Dense search alone misses exact tokens such as tickers, fiscal periods
+    and figures. With a keyword index, both searches return
+    ``candidates`` ids and the lists are merged with reciprocal rank
+    fusion, so a chunk that ranks well in either one makes the cut.
+
+    ``filters`` (equality on chunk metadata such as ticker or fiscal year)
+    are pushed down into both searches, so only matching chunks are ranked.
+    When the keyword index narrows a filter to at most
+    ``exact_search_limit`` chunks, those are scored exactly instead of
+    walking the HNSW graph with a Chroma ``where`` clause, which is much
+    slower for selective filters.
+    """
+
+    def __init__(self, store: VectorStore, keyword_index: Optional[BM25Index] = None,
+                 candidates: int = 20, rrf_k: int = 60, exact_search_limit: int = 512):
+        self.store = store
+        self.keyword_index = keyword_index
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.exact_search_limit = exact_search_limit
+
+    def _vector_search(self, embedding: List[float], n: int,
+                       filters: Optional[dict] = None) -> Tuple[List[str], Dict[str, Document]]:
+        return self._vector_search_many([embedding], n, filters)[0]
+
+    def _vector_search_many(self, embeddings: List[List[float]], n: int,
+                            filters: Optional[dict] = None) -> List[Tuple[List[str], Dict[str, Document]]]:
+        """Vector search for several queries in one collection call."""
+        # Query the collection directly so results come back with their ids
+        collection = self.store._collection
+        if filters and self.keyword_index is not None:
+            allowed = self.keyword_index.matching_ids(filters)
+            if allowed is not None and len(allowed) <= self.exact_search_limit:
+                return self._exact_search(embeddings, n, list(allowed))
+        count = collection.count()
+        if not count:
+            return [([], {}) for _ in embeddings]
+        result = collection.query(
+            query_embeddings=embeddings,
+            n_results=min(n, count),
+            where=build_where(filters),
+            include=["documents", "metadatas"]
+        )
+        return [
+            (ids, {
+                doc_id: Document(page_content=text, metadata=metadata or {})
+                for doc_id, text, metadata in zip(ids, texts, metadatas)
+            })
+            for ids, texts, metadatas in zip(result["ids"], result["documents"], result["metadatas"])
+        ]
+
+    def _exact_search(self, embeddings: List[List[float]], n: int,
+                      ids: List[str]) -> List[Tuple[List[str], Dict[str, Document]]]:
+        """Rank a small candidate set with the collection's distance function."""
+        if not ids:
+            return [([], {}) for _ in embeddings]
+        collection = self.store._collection
+        result = collection.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+        if not result["ids"]:
+            return [([], {}) for _ in embeddings]
+        vectors = np.asarray(result["embeddings"], dtype=np.float32)
+        queries = np.asarray(embeddings, dtype=np.float32)
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        # One (candidates x queries) distance matrix for the whole batch
+        if space == "cosine":
+            norms = np.linalg.norm(vectors, axis=1)[:, None] * np.linalg.norm(queries, axis=1)[None, :]
+            distances = -(vectors @ queries.T) / (norms + 1e-12)
+        elif space == "ip":
+            distances = -(vectors @ queries.T)
+        else:
+            distances = ((vectors ** 2).sum(axis=1)[:, None] - 2 * (vectors @ queries.T)
+                         + (queries ** 2).sum(axis=1)[None, :])
+        results = []
+        for column in distances.T:
+            order = np.argsort(column)[:n]
+            ranked = [result["ids"][i] for i in order]
+            docs = {
+                result["ids"][i]: Document(page_content=result["documents"][i], metadata=result["metadatas"][i] or {})
+                for i in order
+            }
+            results.append((ranked, docs))
+        return results
+
+    def _fuse(self, query: str, k: int, vector_ids: List[str], docs: Dict[str, Document],
+              filters: Optional[dict] = None) -> List[Document]:
+        return self._fuse_many([query], k, [(vector_ids, docs)], filters)[0]
+
+    def _fuse_many(self, queries: List[str], k: int, vector_results: List[Tuple[List[str], Dict[str, Document]]],
+                   filters: Optional[dict] = None) -> List[List[Document]]:
+        """Fuse each query's vector and keyword rankings, fetching missing chunks in one call."""
+        rankings = []
+        for query, (vector_ids, _) in zip(queries, vector_results):
+            keyword_ids = [doc_id for doc_id, _ in self.keyword_index.search(query, self.candidates, filters)]
+            rankings.append(reciprocal_rank_fusion([vector_ids, keyword_ids], self.rrf_k)[:k])
+
+        docs = {}
+        for _, found in vector_results:
+            docs.update(found)
+        missing = list(dict.fromkeys(doc_id for ranked in rankings for doc_id in ranked if doc_id not in docs))
+        if missing:
+            fetched = self.store._collection.get(ids=missing, include=["documents", "metadatas"])
+            for doc_id, text, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+                docs[doc_id] = Document(page_content=text, metadata=metadata or {})
+        # Ids can be missing from the collection if they were deleted mid-query
+        return [[docs[doc_id] for doc_id in ranked if doc_id in docs] for ranked in rankings]
+
+    def search(self, query: str, k: int = 4, filters: Optional[dict] = None) -> List[Document]:
+        """Return the ``k`` most relevant chunks for a query."""
+        embedding = self.store.embeddings.embed_query(query)
+        if self.keyword_index is None:
+            _, docs = self._vector_search(embedding, k, filters)
+            return list(docs.values())
+        vector_ids, docs = self._vector_search(embedding, max(k, self.candidates), filters)
+        return self._fuse(query, k, vector_ids, docs, filters)
+
+    async def asearch(self, query: str, k: int = 4, filters: Optional[dict] = None) -> List[Document]:
+        """Async version of `search`; Chroma and BM25 lookups run in a thread."""
+        embedding = await self.store.embeddings.aembed_query(query)
+        loop = asyncio.get_running_loop()
+        if self.keyword_index is None:
+            _, docs = await loop.run_in_executor(None, self._vector_search, embedding, k, filters)
+            return list(docs.values())
+        vector_ids, docs = await loop.run_in_executor(
+            None, self._vector_search, embedding, max(k, self.candidates), filters
+        )
+        return await loop.run_in_executor(None, self._fuse, query, k, vector_ids, docs, filters)
+
+    def search_many(self, queries: List[str], k: int = 4, filters: Optional[dict] = None) -> List[List[Document]]:
+        """`search` for several queries: one embedding batch and one vector query."""
+        if not queries:
+            return []
+        embeddings = self.store.embeddings.embed_documents(queries)
+        if self.keyword_index is None:
+            return [list(docs.values()) for _, docs in self._vector_search_many(embeddings, k, filters)]
+        results = self._vector_search_many(embeddings, max(k, self.candidates), filters)
+        return self._fuse_many(queries, k, results, filters)
+
+    async def asearch_many(self, queries: List[str], k: int = 4,
+                           filters: Optional[dict] = None) -> List[List[Document]]:
+        """Async version of `search_many`."""
+        if not queries:
+            return []
+        embeddings = await self.store.embeddings.aembed_documents(queries)
+        loop = asyncio.get_running_loop()
+        if self.keyword_index is None:
+            results = await loop.run_in_executor(None, self._vector_search_many, embeddings, k, filters)
+            return [list(docs.values()) for _, docs in results]
+        results = await loop.run_in_executor(
+            None, self._vector_search_many, embeddings, max(k, self.candidates), filters
+        )
+        return await loop.run_in_executor(None, self._fuse_many, queries, k, results, filters)
+
+def get_retriever(collection_name: str = "financial_docs") -> Retriever:
+    """Build a retriever over the shared store, hybrid unless disabled in settings."""
+    return Retriever(
+        registry.get(collection_name),
+        keyword_index=registry.keyword_index(collection_name) if settings.HYBRID_SEARCH_ENABLED else None,
+        candidates=settings.HYBRID_CANDIDATES,
+        rrf_k=settings.RRF_K
+    )
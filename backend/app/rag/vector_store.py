@@ -1,24 +1,187 @@
+import os
+import threading
+from typing import Union
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 from langchain_community.vectorstores import Chroma
 from app.core.config import get_settings
+from app.rag.bm25 import BM25Index
 from app.rag.embeddings import get_embeddings
+from app.rag.metadata import FILTERABLE_FIELDS
+from app.rag.numpy_store import NumpyCollection, NumpyVectorStore
 
 settings = get_settings()
 
-def get_vector_store(collection_name: str = "financial_docs"):
-    """Initialize ChromaDB vector store."""
-    embeddings = get_embeddings()
-    
-    client = chromadb.Client(ChromaSettings(
-        persist_directory=settings.CHROMA_PERSIST_DIR,
-        anonymized_telemetry=False
-    ))
-    
-    vector_store = Chroma(
-        client=client,
-        collection_name=collection_name,
-        embedding_function=embeddings
-    )
-    
-    return vector_store
+class VectorStoreRegistry:
+    """Process-wide owner of the Chroma client, embedding client and collections.
+
+    Every agent and router shares the same objects, so documents added through
+    one handle are immediately visible to all others and each worker keeps a
+    single HTTP pool for embeddings. With ``VECTOR_STORE_BACKEND=numpy`` the
+    collections are memory-mapped `NumpyCollection`s instead of Chroma.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._embeddings = None
+        self._stores = {}
+        self._keyword_indexes = {}
+
+    @property
+    def client(self):
+        """Lazily create the shared Chroma client."""
+        with self._lock:
+            return self._get_client()
+
+    @property
+    def embeddings(self):
+        """Lazily create the shared embedding client."""
+        with self._lock:
+            return self._get_embeddings()
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = chromadb.Client(ChromaSettings(
+                persist_directory=settings.CHROMA_PERSIST_DIR,
+                anonymized_telemetry=False
+            ))
+        return self._client
+
+    def _get_embeddings(self):
+        if self._embeddings is None:
+            self._embeddings = get_embeddings()
+        return self._embeddings
+
+    def get(self, collection_name: str) -> Union[Chroma, NumpyVectorStore]:
+        """Return the shared vector store for a collection, creating it on first use."""
+        with self._lock:
+            store = self._stores.get(collection_name)
+            if store is None and settings.VECTOR_STORE_BACKEND == "numpy":
+                store = NumpyVectorStore(
+                    NumpyCollection(
+                        os.path.join(settings.NUMPY_STORE_DIR, collection_name),
+                        name=collection_name,
+                        dtype=settings.NUMPY_STORE_DTYPE,
+                        index=settings.VECTOR_INDEX,
+                        nlist=settings.IVF_NLIST,
+                        nprobe=settings.IVF_NPROBE,
+                        rerank=settings.IVF_RERANK
+                    ),
+                    embedding_function=self._get_embeddings()
+                )
+                self._stores[collection_name] = store
+            elif store is None:
+                store = Chroma(
+                    client=self._get_client(),
+                    collection_name=collection_name,
+                    embedding_function=self._get_embeddings()
+                )
+                self._stores[collection_name] = store
+            return store
+
+    def get_collection(self, collection_name: str):
+        """Return the raw collection handle for bulk operations."""
+        return self.get(collection_name)._collection
+
+    def keyword_index(self, collection_name: str, page_size: int = 1000) -> BM25Index:
+        """Return the BM25 index for a collection, built from its contents on first use.
+
+        Afterwards the ingestion pipeline keeps it in sync as chunks are
+        written and deleted.
+        """
+        collection = self.get_collection(collection_name)
+        with self._lock:
+            index = self._keyword_indexes.get(collection_name)
+            if index is None:
+                index = BM25Index(fields=FILTERABLE_FIELDS)
+                offset = 0
+                while True:
+                    page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+                    if not page["ids"]:
+                        break
+                    index.add(page["ids"], page["documents"], page["metadatas"])
+                    offset += len(page["ids"])
+                self._keyword_indexes[collection_name] = index
+            return index
+
+    def rebuild(self, collection_name: str, page_size: int = 1000) -> dict:
+        """Copy live vectors into a fresh collection and swap it in.
+
+        Chroma only marks deleted vectors in its HNSW index, so after large
+        deletions the index keeps its size and queries still walk removed
+        nodes. Rebuilding reclaims both. Callers must make sure nothing
+        writes to the collection meanwhile.
+
+        NumPy collections are compacted in place instead, merging their
+        segments and dropping deleted rows.
+        """
+        store = self.get(collection_name)
+        if isinstance(store, NumpyVectorStore):
+            return {"collection": collection_name, **store._collection.compact()}
+        client = self.client
+        old = store._collection
+        staging_name = f"{collection_name}_rebuild"
+        retired_name = f"{collection_name}_retired"
+        for name in (staging_name, retired_name):
+            if any(c.name == name for c in client.list_collections()):
+                client.delete_collection(name)
+        new = client.create_collection(staging_name, metadata=old.metadata)
+
+        # Copied without the registry lock, so other collections and handles stay available
+        copied = 0
+        while True:
+            page = old.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=page_size,
+                offset=copied
+            )
+            if not page["ids"]:
+                break
+            new.add(
+                ids=page["ids"],
+                embeddings=page["embeddings"],
+                documents=page["documents"],
+                metadatas=page["metadatas"]
+            )
+            copied += len(page["ids"])
+
+        # Move the old collection aside rather than deleting it, so a failed rename loses nothing
+        old.modify(name=retired_name)
+        try:
+            new.modify(name=collection_name)
+        except Exception:
+            old.modify(name=collection_name)
+            client.delete_collection(staging_name)
+            raise
+        with self._lock:
+            # Every handle shares this store, so swapping the collection updates all of them
+            store._collection = new
+        client.delete_collection(retired_name)
+        return {"collection": collection_name, "vectors": copied}
+
+    def shutdown(self) -> None:
+        """Release the Chroma system, NumPy collections and embedding client."""
+        with self._lock:
+            for store in self._stores.values():
+                if isinstance(store, NumpyVectorStore):
+                    store._collection.close()
+            self._stores.clear()
+            self._keyword_indexes.clear()
+            if self._client is not None:
+                self._client._system.stop()
+                self._client.clear_system_cache()
+                self._client = None
+            if hasattr(self._embeddings, "close"):
+                self._embeddings.close()
+            self._embeddings = None
+
+registry = VectorStoreRegistry()
+
+def get_vector_store(collection_name: str = "financial_docs") -> Union[Chroma, NumpyVectorStore]:
+    """Get the shared vector store for a collection (Chroma or NumPy, per settings)."""
+    return registry.get(collection_name)
+
+def shutdown_vector_stores() -> None:
+    """Close all shared vector store resources."""
+    registry.shutdown()
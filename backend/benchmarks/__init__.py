@@ -0,0 +1,6 @@
+"""Offline benchmarks for the backend.
+
+Run from the ``backend`` directory, e.g. ``python -m benchmarks.bench_startup``.
+``python -m benchmarks.suite`` runs the end-to-end ingest, retrieval and
+chat benchmarks together and can compare the result with an earlier run.
+"""
@@ -0,0 +1,84 @@
+"""Recall@k, latency and memory of the IVF index over int8 codes, by
+number of lists, lists probed and re-ranking depth.
+
+Builds a NumPy vector store from synthetic clustered vectors, measures
+exact (flat) search as the baseline, then compacts it with an IVF index
+for each ``--nlists`` value and sweeps ``--nprobes`` and ``--rerank``.
+``index_mb`` is what queries keep hot (int8 codes, list offsets and
+centroids); the float vectors stay on disk and are only read for
+re-ranking.
+
+    python -m benchmarks.bench_ann --size 1000000 --nlists 0 --nprobes 4 16 64 --rerank 0 4
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from benchmarks.bench_vector_store import corpus_batches, ground_truth, query_vectors
+from benchmarks.common import configure_env, memory_breakdown_mb, percentile
+
+def evaluate(collection, queries, truth, k: int) -> dict:
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(result["ids"][0]) & expected)
+    return {
+        f"recall@{k}": round(hits / (k * len(queries)), 4),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dtype", default="float32")
+    parser.add_argument("--nlists", type=int, nargs="+", default=[0], help="0 picks about 4 * sqrt(size)")
+    parser.add_argument("--nprobes", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 4])
+    args = parser.parse_args()
+
+    configure_env()
+    from app.rag.numpy_store import NumpyCollection
+
+    path = tempfile.mkdtemp(prefix="bench_ann_")
+    try:
+        collection = NumpyCollection(path, "bench", dtype=args.dtype)
+        for offset, vectors in corpus_batches(args.size, args.dim):
+            ids = range(offset, offset + len(vectors))
+            collection.upsert(ids=[f"chunk-{n}" for n in ids], embeddings=vectors,
+                              documents=[f"chunk {n}" for n in ids], metadatas=[{"n": n} for n in ids])
+        queries = query_vectors(args.queries, args.dim)
+        truth = ground_truth(args.size, args.dim, queries, args.k)
+        vectors_mb = args.size * args.dim * collection.dtype.itemsize / 2**20
+
+        collection.compact()
+        results = [{"index": "flat", "vectors_mb": round(vectors_mb, 1), **evaluate(collection, queries, truth, args.k)}]
+        for nlist in args.nlists:
+            collection.index, collection.nlist = "ivf", nlist
+            start = time.perf_counter()
+            collection.compact()
+            build_seconds = time.perf_counter() - start
+            index = next(iter(collection._indexes.values()))
+            for nprobe in args.nprobes:
+                for rerank in args.rerank:
+                    collection.nprobe, collection.rerank = nprobe, rerank
+                    results.append({
+                        "index": "ivf", "nlist": index.nlist, "nprobe": nprobe, "rerank": rerank,
+                        "build_seconds": round(build_seconds, 1),
+                        "index_mb": round(index.nbytes / 2**20, 1),
+                        **evaluate(collection, queries, truth, args.k),
+                    })
+        collection.close()
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    print(json.dumps({"chunks": args.size, "dim": args.dim, "k": args.k,
+                      "memory_mb": memory_breakdown_mb(), "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Latency of semantic answer-cache hits versus full answers.
+
+Asks each question once (miss), then a lightly reworded variant (expected
+hit), uploads a document to invalidate the cache and asks again (miss).
+
+    python -m benchmarks.bench_answer_cache
+"""
+import argparse
+import json
+import time
+import httpx
+from benchmarks.common import configure_env, app_process, stub_process, percentile, wait_for_job
+
+QUESTIONS = [
+    ("What was Q4 revenue?", "what was Q4 revenue"),
+    ("How many vehicles were delivered in Q4?", "How many vehicles were delivered in Q4 ?"),
+    ("What was the free cash flow?", "What was the free cash flow"),
+    ("Summarize the quarterly results.", "summarize the quarterly results"),
+]
+
+def _ask(http: httpx.Client, question: str) -> float:
+    start = time.perf_counter()
+    http.post("/chat/", json={"message": question}).raise_for_status()
+    return time.perf_counter() - start
+
+def _ms(values: list[float]) -> dict:
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p99_ms": round(percentile(values, 99) * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    configure_env()
+    with stub_process(args.stub_port):
+        with app_process(args.port, args.stub_port):
+            with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=120) as http:
+                misses = [_ask(http, original) for original, _ in QUESTIONS]
+                hits = [_ask(http, variant) for _, variant in QUESTIONS]
+                upload = http.post(
+                    "/documents/upload",
+                    files={"file": ("update.txt", b"Revenue was restated to $25.4 billion.", "text/plain")}
+                )
+                upload.raise_for_status()
+                wait_for_job(http, upload.json()["job_id"])
+                after_invalidation = [_ask(http, original) for original, _ in QUESTIONS]
+                stats = http.get("/metrics/cache").json()["answer_cache"]
+
+    print(json.dumps({
+        "miss": _ms(misses),
+        "hit": _ms(hits),
+        "after_invalidation": _ms(after_invalidation),
+        "answer_cache": stats,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Answering a list of questions in one batch versus one request at a time.
+
+Ingests synthetic filings (``benchmarks.bench_context.corpus``) through
+the stub embedding API, then answers ``--questions`` questions, of which
+``--duplicates`` repeat earlier ones with different case and spacing,
+against the stub LLM at ``--chat-latency`` seconds per completion:
+
+- ``sequential``: one ``aprocess`` call per question, as clients do today
+- ``batch``: ``astream_batch`` at each ``--concurrency`` level, with
+  ``--token-budget`` estimated prompt tokens in flight
+
+Reports wall-clock time, the slowest single question of the sequential
+run, time to the first streamed result, and the embedding and chat
+requests the stub received. With enough concurrency a batch takes close
+to its slowest question rather than the sum of all of them.
+
+    python -m benchmarks.bench_batch --questions 100 --concurrency 8 32 128
+"""
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import tempfile
+import time
+from benchmarks.common import configure_env, percentile
+from benchmarks.stub_server import StubServer, calls
+
+def questions_for(queries: list, count: int, duplicates: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    unique = [question for question, _ in rng.sample(queries, count - duplicates)]
+    repeats = [f"  {rng.choice(unique).lower()} " for _ in range(duplicates)]
+    mixed = unique + repeats
+    rng.shuffle(mixed)
+    return mixed
+
+async def ingest(documents) -> int:
+    from app.rag.document_processor import DocumentProcessor
+    from app.rag.ingestion import get_ingestion_pipeline
+
+    processor = DocumentProcessor()
+    chunks = [chunk for source, text in documents for chunk in processor.process_text(text, source=source)]
+    await get_ingestion_pipeline().ingest(chunks)
+    return len(chunks)
+
+async def sequential(orchestrator, questions: list) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    for question in questions:
+        question_start = time.perf_counter()
+        await orchestrator.aprocess(question)
+        latencies.append(time.perf_counter() - question_start)
+    return {
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "slowest_question_seconds": round(max(latencies), 3),
+        "question_p50_seconds": round(percentile(latencies, 50), 3),
+    }
+
+async def batch(orchestrator, questions: list, concurrency: int, token_budget: int) -> dict:
+    start = time.perf_counter()
+    first_result, answered, done = None, 0, {}
+    async for event in orchestrator.astream_batch(questions, concurrency=concurrency, token_budget=token_budget):
+        if event["event"] == "result":
+            answered += len(event["data"]["indices"])
+            if first_result is None:
+                first_result = time.perf_counter() - start
+        elif event["event"] == "done":
+            done = event["data"]
+    return {
+        "concurrency": concurrency,
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "first_result_seconds": round(first_result or 0.0, 3),
+        "questions_answered": answered,
+        "unique": done.get("unique"),
+        "failed": done.get("failed"),
+        "peak_prompt_tokens": done.get("peak_prompt_tokens"),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--duplicates", type=int, default=15)
+    parser.add_argument("--companies", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--token-budget", type=int, default=16000)
+    parser.add_argument("--chat-latency", type=float, default=0.2)
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    index_dir = tempfile.mkdtemp(prefix="bench_batch_")
+    with StubServer(args.stub_port, chat_latency=args.chat_latency,
+                    embedding_latency=args.embedding_latency, token_delay=0.0) as stub:
+        # No embedding cache, so the stub sees every embedding request
+        configure_env(OPENAI_API_BASE=stub.base_url, EMBEDDING_BACKEND="openai", EMBEDDING_CACHE_ENABLED="false",
+                      ANSWER_CACHE_ENABLED="false", SESSION_MEMORY_ENABLED="false",
+                      VECTOR_STORE_BACKEND="numpy", NUMPY_STORE_DIR=index_dir)
+        from benchmarks.bench_context import corpus
+        from app.agents.orchestrator import OrchestratorAgent
+
+        documents, queries = corpus(args.companies)
+        questions = questions_for(queries, args.questions, args.duplicates)
+
+        async def run() -> dict:
+            chunks = await ingest(documents)
+            orchestrator = OrchestratorAgent()
+            # Warm up the LLM clients' connections in this event loop first
+            await orchestrator.aprocess(questions[0])
+            results = {"questions": len(questions), "chunks": chunks, "chat_latency": args.chat_latency}
+
+            calls.update(chat=0, embeddings=0)
+            results["sequential"] = await sequential(orchestrator, questions)
+            results["sequential"]["requests"] = dict(calls)
+
+            results["batch"] = []
+            for level in args.concurrency:
+                calls.update(chat=0, embeddings=0)
+                result = await batch(orchestrator, questions, level, args.token_budget)
+                result["requests"] = dict(calls)
+                result["speedup"] = round(results["sequential"]["wall_seconds"] / result["wall_seconds"], 1)
+                result["vs_slowest_question"] = round(
+                    result["wall_seconds"] / results["sequential"]["slowest_question_seconds"], 2
+                )
+                results["batch"].append(result)
+            return results
+
+        try:
+            results = asyncio.run(run())
+        finally:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
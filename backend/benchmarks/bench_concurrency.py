@@ -0,0 +1,80 @@
+"""Throughput of ``POST /chat/`` on a single uvicorn worker.
+
+Starts the stub OpenAI server and one app worker, then drives the chat
+endpoint with increasing numbers of concurrent clients. While each level
+runs, ``/health`` is polled to show whether the event loop stays responsive.
+
+    python -m benchmarks.bench_concurrency --levels 1 4 16 --requests 32
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from benchmarks.common import configure_env, app_process, stub_process, percentile
+
+QUESTION = "What was Tesla's Q4 2024 revenue?"
+
+async def _client(http: httpx.AsyncClient, queue: asyncio.Queue, latencies: list):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        start = time.perf_counter()
+        response = await http.post("/chat/", json={"message": QUESTION})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+async def _poll_health(http: httpx.AsyncClient, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await http.get("/health")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+
+async def run_level(base_url: str, concurrency: int, total: int) -> dict:
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+    latencies, health = [], []
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as http:
+        poller = asyncio.create_task(_poll_health(http, stop, health))
+        start = time.perf_counter()
+        await asyncio.gather(*[_client(http, queue, latencies) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await poller
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "requests_per_second": round(total / elapsed, 2),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "health_p99_ms": round(percentile(health, 99) * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--chat-latency", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    configure_env()
+    results = []
+    with stub_process(args.stub_port, chat_latency=args.chat_latency):
+        # Repeated questions would otherwise be served from the answer cache
+        with app_process(args.port, args.stub_port, env={"ANSWER_CACHE_ENABLED": "false"}):
+            base_url = f"http://127.0.0.1:{args.port}"
+            for level in args.levels:
+                results.append(asyncio.run(run_level(base_url, level, args.requests)))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
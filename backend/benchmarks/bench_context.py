@@ -0,0 +1,117 @@
+"""Prompt context size and answer coverage: top-k chunks joined as they are
+versus the token-budgeted builder (overlap merging + MMR + packing).
+
+Synthetic filings repeat the same boilerplate across companies and are
+split with the app's ``DocumentProcessor``, so neighbouring chunks share
+their 200-character overlap. Each query asks for one figure; coverage is
+the share of contexts that contain it.
+
+    python -m benchmarks.bench_context --companies 20 --top-k 3 --budget 800
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from benchmarks.common import configure_env, percentile
+
+ITEMS = ["revenue", "gross profit", "operating income", "net income", "free cash flow"]
+BOILERPLATE = [
+    "Management discussed results for the period, noting continued investment in growth initiatives, "
+    "disciplined cost management and a strong balance sheet. ",
+    "Forward-looking statements involve risks and uncertainties, and actual results may differ "
+    "materially from those projected in this report. ",
+    "The company reaffirmed its outlook and highlighted execution across segments and regions. ",
+]
+
+def corpus(companies: int, seed: int = 0):
+    rng = random.Random(seed)
+    documents, queries = [], []
+    for c in range(companies):
+        ticker = f"CO{c:02d}"
+        parts = []
+        for year in (2023, 2024):
+            for quarter in (1, 2, 3, 4):
+                for item in ITEMS:
+                    figure = f"{rng.uniform(50, 900):.1f}"
+                    parts.append(f"{ticker} reported {item} of ${figure} million for Q{quarter} FY{year}. ")
+                    parts.append(rng.choice(BOILERPLATE) * 2)
+                    queries.append((f"What was {ticker} {item} in Q{quarter} FY{year}?", figure))
+        documents.append((f"{ticker}.txt", "".join(parts)))
+    return documents, queries
+
+async def build(documents):
+    from app.rag.bm25 import BM25Index
+    from app.rag.document_processor import DocumentProcessor
+    from app.rag.ingestion import IngestionPipeline
+    from app.rag.metadata import FILTERABLE_FIELDS
+    from app.rag.vector_store import registry
+
+    name = "bench_context"
+    if any(c.name == name for c in registry.client.list_collections()):
+        registry.client.delete_collection(name)
+    store = registry.get(name)
+    index = BM25Index(fields=FILTERABLE_FIELDS)
+    pipeline = IngestionPipeline(registry.embeddings, store._collection, keyword_index=index)
+    processor = DocumentProcessor()
+    chunks = [chunk for source, text in documents for chunk in processor.process_text(text, source=source)]
+    await pipeline.ingest(chunks)
+    return store, index, len(chunks)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--companies", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--candidates", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--budget", type=int, default=800)
+    parser.add_argument("--mmr-lambda", type=float, default=0.7)
+    args = parser.parse_args()
+
+    configure_env()
+    from app.rag.context import ContextBuilder
+    from app.rag.ingestion import estimate_tokens
+    from app.rag.retrieval import Retriever
+
+    documents, queries = corpus(args.companies)
+    queries = random.Random(1).sample(queries, min(args.queries, len(queries)))
+    store, index, chunks = asyncio.run(build(documents))
+    retriever = Retriever(store, keyword_index=index)
+    builder = ContextBuilder(args.budget, args.mmr_lambda)
+
+    naive = {"tokens": [], "covered": 0}
+    built = {"tokens": [], "covered": 0, "ms": [], "merged": 0}
+    for question, figure in queries:
+        docs = retriever.search(question, k=args.candidates)
+        text = "\n\n".join(doc.page_content for doc in docs[:args.top_k])
+        naive["tokens"].append(estimate_tokens(text))
+        naive["covered"] += figure in text
+
+        start = time.perf_counter()
+        context = builder.build(docs, max_chunks=args.top_k)
+        built["ms"].append((time.perf_counter() - start) * 1000)
+        built["tokens"].append(context.tokens)
+        built["covered"] += figure in context.text
+        built["merged"] += context.merged
+
+    def summary(result):
+        return {
+            "mean_tokens": round(sum(result["tokens"]) / len(queries), 1),
+            "p99_tokens": percentile(result["tokens"], 99),
+            "coverage": round(result["covered"] / len(queries), 3),
+        }
+
+    print(json.dumps({
+        "chunks": chunks,
+        "queries": len(queries),
+        "naive_top_k": summary(naive),
+        "context_builder": {
+            **summary(built),
+            "merged_per_query": round(built["merged"] / len(queries), 2),
+            "build_p50_ms": round(percentile(built["ms"], 50), 3),
+            "build_p99_ms": round(percentile(built["ms"], 99), 3),
+        },
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Retrieval latency and index size around large deletions and compaction.
+
+Ingests synthetic documents through the job manager, deletes most of them,
+then compacts the collection. After each phase it reports live vectors,
+HNSW index elements (deleted vectors stay in the index until a rebuild),
+process RSS, p50/p99 similarity-search latency and whether any chunk of
+a deleted document is still retrievable.
+
+    python -m benchmarks.bench_delete --documents 40 --chunks 200 --delete-fraction 0.9
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from benchmarks.common import configure_env, percentile, rss_mb
+
+QUERIES = [
+    "What was revenue growth for the segment?",
+    "How did operating expenses change?",
+    "Summarize the cash flow statement",
+    "What is the operating margin?",
+]
+
+def write_document(path: str, number: int, chunks: int) -> None:
+    with open(path, "w") as f:
+        for i in range(chunks):
+            f.write(
+                f"Document {number} section {i}: revenue for segment {i % 13} grew {(number + i) % 31}% "
+                f"to ${i * 1.3 + number:.1f} million while operating expenses were ${i * 0.7:.1f} million. "
+                * 6 + "\n\n"
+            )
+
+def index_elements(collection):
+    """Number of elements in the collection's HNSW index, including deleted ones."""
+    try:
+        from chromadb.segment import VectorReader
+        segment = collection._client._manager.get_segment(collection.id, VectorReader)
+        index = segment._index
+        return index.get_current_count() if index is not None else 0
+    except Exception:
+        return None
+
+def measure(store, deleted_sources: set, rounds: int) -> dict:
+    latencies, leaked = [], 0
+    for _ in range(rounds):
+        for query in QUERIES:
+            start = time.perf_counter()
+            docs = store.similarity_search(query, k=5)
+            latencies.append((time.perf_counter() - start) * 1000)
+            leaked += sum(1 for doc in docs if doc.metadata.get("source") in deleted_sources)
+    return {
+        "vectors": store._collection.count(),
+        "index_elements": index_elements(store._collection),
+        "rss_mb": round(rss_mb(), 1),
+        "search_p50_ms": round(percentile(latencies, 50), 2),
+        "search_p99_ms": round(percentile(latencies, 99), 2),
+        "deleted_chunks_returned": leaked,
+    }
+
+async def run(args, tmp: str) -> dict:
+    from app.models.database import Base, Document, SessionLocal, engine
+    from app.rag.jobs import job_manager
+    from app.rag.vector_store import registry
+
+    Base.metadata.create_all(bind=engine)
+    store = registry.get("financial_docs")
+    await job_manager.start()
+    try:
+        document_ids, jobs = {}, []
+        for n in range(args.documents):
+            filename = f"report-{n}.txt"
+            path = os.path.join(tmp, filename)
+            write_document(path, n, args.chunks)
+            db = SessionLocal()
+            doc = Document(filename=filename, file_type="text", num_chunks=0, status="pending")
+            db.add(doc)
+            db.commit()
+            document_ids[filename] = doc.id
+            db.close()
+            jobs.append(job_manager.submit(doc.id, filename, "text", path))
+        while any(job.status not in ("completed", "failed") for job in jobs):
+            await asyncio.sleep(0.05)
+
+        results = {"ingested": measure(store, set(), args.rounds)}
+
+        to_delete = list(document_ids)[:int(len(document_ids) * args.delete_fraction)]
+        start = time.perf_counter()
+        for filename in to_delete:
+            await job_manager.delete_document(document_ids[filename])
+        results["deleted"] = {
+            "documents": len(to_delete),
+            "seconds": round(time.perf_counter() - start, 2),
+            **measure(store, set(to_delete), args.rounds),
+        }
+
+        compaction = await job_manager.compact()
+        results["compacted"] = {"seconds": compaction["seconds"], **measure(store, set(to_delete), args.rounds)}
+        return results
+    finally:
+        await job_manager.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--delete-fraction", type=float, default=0.9)
+    parser.add_argument("--rounds", type=int, default=25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_env(
+            DATABASE_URL=f"sqlite:///{tmp}/delete.db",
+            CHROMA_PERSIST_DIR=os.path.join(tmp, "chroma"),
+            UPLOAD_DIR=os.path.join(tmp, "uploads")
+        )
+        print(json.dumps(asyncio.run(run(args, tmp)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Throughput (texts/second) of each embedding backend by batch size and
+worker count, plus single-query latency.
+
+``openai`` runs against the stub embedding server, so its numbers reflect
+batching and concurrency over a fixed per-request latency rather than the
+real API. ``local`` needs a sentence-transformers model that is already
+downloaded (or a local path via ``--local-model``) and is skipped otherwise.
+
+    python -m benchmarks.bench_embeddings --texts 2000 --batch-sizes 32 256 --workers 1 4
+"""
+import argparse
+import asyncio
+import json
+import time
+from benchmarks.common import configure_env, percentile
+from benchmarks.stub_server import StubServer
+
+def synthetic_texts(count: int) -> list[str]:
+    return [
+        f"Segment {i % 17} revenue grew {i % 23}% year over year to ${i * 1.7:.1f} million "
+        f"in Q{i % 4 + 1} FY{2020 + i % 5}, while operating expenses were ${i * 0.9:.1f} million "
+        f"and free cash flow reached ${i * 0.4:.1f} million."
+        for i in range(count)
+    ]
+
+def make_backend(name: str, batch_size: int, workers: int, args):
+    from app.rag.embeddings import HashingEmbeddings, LocalEmbeddingBackend, OpenAIEmbeddingBackend
+    if name == "hashing":
+        return HashingEmbeddings(batch_size=batch_size, max_workers=workers)
+    if name == "openai":
+        return OpenAIEmbeddingBackend(
+            model="text-embedding-3-small", api_key="sk-benchmark", base_url=args.base_url,
+            batch_size=batch_size, max_workers=workers, max_retries=0
+        )
+    return LocalEmbeddingBackend(
+        args.local_model, quantize=args.quantize, batch_size=batch_size, max_workers=workers
+    )
+
+def run(backend, texts: list[str], queries: int) -> dict:
+    backend.embed_documents(texts[:backend.batch_size])  # warm up connections and model
+    start = time.perf_counter()
+    backend.embed_documents(texts)
+    sync_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    asyncio.run(backend.aembed_documents(texts))
+    async_seconds = time.perf_counter() - start
+
+    latencies = []
+    for text in texts[:queries]:
+        start = time.perf_counter()
+        backend.embed_query(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "sync_texts_per_second": round(len(texts) / sync_seconds, 1),
+        "async_texts_per_second": round(len(texts) / async_seconds, 1),
+        "query_p50_ms": round(percentile(latencies, 50), 2),
+        "query_p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", nargs="+", default=["hashing", "openai", "local"],
+                        choices=["hashing", "openai", "local"])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[32, 256])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--local-model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--no-quantize", dest="quantize", action="store_false")
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--stub-port", type=int, default=9107)
+    args = parser.parse_args()
+
+    configure_env()
+    texts = synthetic_texts(args.texts)
+    results = []
+    with StubServer(port=args.stub_port, embedding_latency=args.embedding_latency) as stub:
+        args.base_url = stub.base_url
+        for name in args.backends:
+            for batch_size in args.batch_sizes:
+                for workers in args.workers:
+                    row = {"backend": name, "batch_size": batch_size, "workers": workers}
+                    try:
+                        backend = make_backend(name, batch_size, workers, args)
+                    except Exception as e:
+                        # Typically a model that is not downloaded on an offline machine
+                        results.append({**row, "skipped": f"{type(e).__name__}: {e}"[:200]})
+                        continue
+                    try:
+                        results.append({**row, "model": backend.model, **run(backend, texts, args.queries)})
+                    finally:
+                        backend.close()
+    print(json.dumps({"texts": len(texts), "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Ratios and growth rates computed from stored facts versus read from context.
+
+Ingests synthetic filings (``benchmarks.bench_context.corpus``), one
+document per company, extracting financial facts as the ingestion jobs
+do, then asks ``--queries`` margin and growth questions whose exact answers
+follow from the generated figures. Reports:
+
+- ``extraction``: chunks and facts per second, and the share of generated
+  figures found with the right value and period
+- ``compute``: ``FactTable.compute`` time per question and how many
+  answers match the exact value
+- ``prompt_tokens``: the financial agent's prompt with the computed
+  figures versus with the retrieved context, and how often that context
+  held every input the LLM would need to do the arithmetic itself
+
+    python -m benchmarks.bench_facts --companies 20 --queries 200
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from benchmarks.common import configure_env, percentile
+
+def questions_for(figures: dict, count: int, seed: int = 0) -> list:
+    """(question, expected value, input figures) for margins and growth rates."""
+    rng = random.Random(seed)
+    tickers = sorted({ticker for ticker, _, _, _ in figures})
+    margins = {"gross margin": "gross profit", "operating margin": "operating income",
+               "net margin": "net income", "free cash flow margin": "free cash flow"}
+    questions = []
+    while len(questions) < count:
+        ticker, year, quarter = rng.choice(tickers), rng.choice((2023, 2024)), rng.randint(1, 4)
+        if rng.random() < 0.6:
+            ratio, item = rng.choice(list(margins.items()))
+            top, bottom = figures[ticker, item, year, quarter], figures[ticker, "revenue", year, quarter]
+            questions.append((f"Calculate the {ratio} for {ticker} in Q{quarter} FY{year}", top / bottom,
+                              [top, bottom]))
+        else:
+            item, year = rng.choice(["revenue", "net income", "operating income"]), 2024
+            current, prior = figures[ticker, item, year, quarter], figures[ticker, item, year - 1, quarter]
+            questions.append((f"What was the year-over-year {item} growth for {ticker} in Q{quarter} FY{year}?",
+                              (current - prior) / abs(prior), [current, prior]))
+    return questions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--companies", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_facts_")
+    configure_env(DATABASE_URL=f"sqlite:///{os.path.join(work_dir, 'facts.db')}", VECTOR_STORE_BACKEND="numpy",
+                  NUMPY_STORE_DIR=os.path.join(work_dir, "index"), EMBEDDING_CACHE_ENABLED="false")
+    import asyncio
+    import re
+    from benchmarks.bench_context import corpus
+    from app.agents.financial_agent import FinancialAgent
+    from app.models.database import SessionLocal, Document, FinancialFact
+    from app.rag.document_processor import DocumentProcessor
+    from app.rag.facts import extract_facts, get_fact_table
+    from app.rag.ingestion import estimate_tokens, get_ingestion_pipeline
+    from app.rag.metadata import annotate_chunks
+
+    documents, _ = corpus(args.companies)
+    figures = {
+        (ticker, item, int(year), int(quarter)): float(value) * 1e6
+        for _, text in documents
+        for ticker, item, value, quarter, year in re.findall(
+            r"(CO\d+) reported ([a-z ]+) of \$([\d.]+) million for Q(\d) FY(\d{4})", text
+        )
+    }
+
+    processor = DocumentProcessor()
+    db = SessionLocal()
+    all_chunks, extracted, extraction_seconds = [], [], 0.0
+    try:
+        for source, text in documents:
+            row = Document(filename=source, file_type="txt", ticker=source.split(".")[0], status="ready")
+            db.add(row)
+            db.flush()
+            chunks = processor.process_text(text, source=source)
+            annotate_chunks(chunks, {"ticker": row.ticker, "document_id": row.id})
+            start = time.perf_counter()
+            facts = extract_facts(chunks)
+            extraction_seconds += time.perf_counter() - start
+            db.add_all([FinancialFact(document_id=row.id, **fact) for fact in facts])
+            all_chunks += chunks
+            extracted += [(row.ticker, fact) for fact in facts]
+        db.commit()
+    finally:
+        db.close()
+    asyncio.run(get_ingestion_pipeline().ingest(all_chunks))
+
+    found = sum(
+        abs(figures.get((ticker, fact["metric"].replace("_", " "), fact["fiscal_year"], fact["quarter"]), -1)
+            - fact["value"]) < 1
+        for ticker, fact in extracted
+    )
+    results = {
+        "companies": args.companies,
+        "chunks": len(all_chunks),
+        "extraction": {
+            "chunks_per_second": round(len(all_chunks) / extraction_seconds),
+            "facts": len(extracted),
+            "facts_per_second": round(len(extracted) / extraction_seconds),
+            "figures_found": round(found / len(figures), 3),
+        },
+    }
+
+    table = get_fact_table()
+    start = time.perf_counter()
+    table.compute("Calculate the gross margin")
+    results["compute"] = {"load_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    agent = FinancialAgent()
+    questions = questions_for(figures, args.queries)
+    timings, exact, phrased_tokens, context_tokens, inputs_in_context = [], 0, [], [], 0
+    for question, expected, inputs in questions:
+        context = agent.build_context(agent.retriever.search(question, k=8))
+        start = time.perf_counter()
+        calculation = table.compute(question, context.documents)
+        timings.append(time.perf_counter() - start)
+        if calculation and abs(calculation.rows[0].value - expected) < 1e-9:
+            exact += 1
+        chain, prompt_inputs = agent._prepare(question, context, "")
+        phrased_tokens.append(estimate_tokens(chain.first.format(**prompt_inputs)))
+        answer_inputs = agent._answer_inputs(question, context, "")
+        context_tokens.append(estimate_tokens(agent.prompt.format(**answer_inputs)))
+        inputs_in_context += all(f"${value / 1e6:.1f} million" in context.text for value in inputs)
+
+    results["compute"].update({
+        "questions": len(questions),
+        "p50_us": round(percentile(timings, 50) * 1e6, 1),
+        "p99_us": round(percentile(timings, 99) * 1e6, 1),
+        "exact": round(exact / len(questions), 3),
+    })
+    results["prompt_tokens"] = {
+        "computed_p50": percentile(phrased_tokens, 50),
+        "context_p50": percentile(context_tokens, 50),
+        "reduction": round(1 - sum(phrased_tokens) / sum(context_tokens), 3),
+        "context_has_all_inputs": round(inputs_in_context / len(questions), 3),
+    }
+    shutil.rmtree(work_dir, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
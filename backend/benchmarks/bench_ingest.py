@@ -0,0 +1,79 @@
+"""Ingestion throughput (chunks/second) by batch size and concurrency.
+
+Embeds a synthetic annual report through ``IngestionPipeline`` against the
+stub embedding server, optionally injecting failures to exercise retries.
+
+    python -m benchmarks.bench_ingest --chunks 2000 --batch-sizes 16 64 256 --concurrency 1 4
+"""
+import argparse
+import asyncio
+import json
+from benchmarks.common import configure_env
+from benchmarks.stub_server import StubServer
+
+def synthetic_chunks(count: int):
+    from langchain.schema import Document
+    return [
+        Document(
+            page_content=(
+                f"Section {i}: revenue for segment {i % 17} grew {i % 23}% year over year "
+                f"to ${i * 1.7:.1f} million, while operating expenses were ${i * 0.9:.1f} million. "
+            ) * 8,
+            metadata={"source": "synthetic-annual-report.pdf", "type": "pdf"}
+        )
+        for i in range(count)
+    ]
+
+async def run(pipeline_kwargs: dict, chunks, base_url: str) -> dict:
+    from app.rag.embeddings import OpenAIEmbeddingBackend
+    from app.rag.ingestion import IngestionPipeline
+    from app.rag.vector_store import registry
+
+    if any(c.name == "bench_ingest" for c in registry.client.list_collections()):
+        registry.client.delete_collection("bench_ingest")
+    pipeline = IngestionPipeline(
+        # Retries are left to the pipeline, and batches are not split again
+        embeddings=OpenAIEmbeddingBackend(
+            model="text-embedding-3-small", api_key="sk-benchmark", base_url=base_url,
+            batch_size=pipeline_kwargs["batch_size"], max_retries=0
+        ),
+        collection=registry.client.get_or_create_collection("bench_ingest"),
+        **pipeline_kwargs
+    )
+    result = await pipeline.ingest(chunks)
+    return {
+        **pipeline_kwargs,
+        "chunks": result.chunks,
+        "batches": result.batches,
+        "seconds": round(result.seconds, 3),
+        "chunks_per_second": round(result.chunks_per_second, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--tokens-per-minute", type=int, default=0)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    configure_env()
+    chunks = synthetic_chunks(args.chunks)
+    results = []
+    with StubServer(port=args.stub_port, embedding_latency=args.embedding_latency,
+                    embedding_failure_rate=args.failure_rate) as stub:
+        for batch_size in args.batch_sizes:
+            for concurrency in args.concurrency:
+                results.append(asyncio.run(run({
+                    "batch_size": batch_size,
+                    "max_concurrency": concurrency,
+                    "tokens_per_minute": args.tokens_per_minute,
+                    "max_retries": 5,
+                }, chunks, stub.base_url)))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
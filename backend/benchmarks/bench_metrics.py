@@ -0,0 +1,80 @@
+"""Cost of recording, summarizing and persisting metrics.
+
+Records ``--observations`` synthetic queries (one query counter, one
+query latency and three stage latencies each, plus token usage), then
+times ``summary()``, the Prometheus exposition and a flush to the
+database. Summary time should not grow with the number of observations
+because histograms have fixed buckets.
+
+    python -m benchmarks.bench_metrics --observations 1000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from benchmarks.common import configure_env, percentile
+
+def record(collector, count: int, seed: int = 0) -> float:
+    rng = random.Random(seed)
+    agents = ("research", "financial", "summary")
+    start = time.perf_counter()
+    for _ in range(count):
+        with collector.stage("route"):
+            pass
+        collector.observe("rag_stage_seconds", rng.expovariate(20), stage="retrieve")
+        collector.observe("rag_stage_seconds", rng.expovariate(1), stage="generate")
+        collector.record_tokens("gpt-4o-mini", 900, 150)
+        collector.record_query(rng.choice(agents), rng.expovariate(0.8), cached=rng.random() < 0.1)
+    return time.perf_counter() - start
+
+def timed(fn, repeat: int = 50) -> dict:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": round(percentile(latencies, 50), 3), "p99_ms": round(percentile(latencies, 99), 3)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--observations", type=int, nargs="+", default=[1000, 100000])
+    args = parser.parse_args()
+
+    path = tempfile.mktemp(suffix=".db", prefix="bench_metrics_")
+    configure_env(DATABASE_URL=f"sqlite:///{path}")
+    from app.core.metrics import MetricsCollector
+    from sqlalchemy import text
+    from app.models.database import SessionLocal
+
+    results = []
+    try:
+        for count in args.observations:
+            collector = MetricsCollector(SessionLocal)
+            seconds = record(collector, count)
+            start = time.perf_counter()
+            collector.flush()
+            flush_ms = (time.perf_counter() - start) * 1000
+            summary = collector.summary()
+            results.append({
+                "observations": count,
+                # route stage, 3 histogram observations and 6 counter increments per query
+                "record_us_per_query": round(seconds / count * 1e6, 2),
+                "summary": timed(collector.summary),
+                "prometheus": timed(collector.prometheus),
+                "flush_ms": round(flush_ms, 2),
+                "total_queries": summary["total_queries"],
+                "p95_generate_s": summary["stages"]["generate"]["p95"],
+            })
+            # Start the next size from an empty table
+            with SessionLocal() as db:
+                db.execute(text("DELETE FROM metric_aggregates"))
+                db.commit()
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    print(json.dumps({"results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compound questions answered by parallel agents versus one part at a time.
+
+For each compound question ("summarize Q4 and compute the operating
+margin"), times ``aprocess`` with the parts fanned out to their agents
+concurrently, and the same parts asked one after another as separate
+questions, which is what clients had to do before. The stub LLM takes
+``--chat-latency`` seconds per completion. Also times
+``QueryRouter.decompose`` on single-agent questions, since every question
+now pays for it.
+
+    python -m benchmarks.bench_multi_agent --repeats 5 --chat-latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import time
+from benchmarks.common import configure_env, percentile
+from benchmarks.stub_server import StubServer
+
+COMPOUND = [
+    "Summarize Q4 and compute the operating margin",
+    "Compute the net margin for FY2024 and give me the key takeaways from the shareholder letter",
+    "Recap the earnings call, then tell me the P/E multiple",
+    "Give me an overview of the annual report and calculate the debt to equity ratio",
+    "Summarize the risk factors, then calculate the current ratio",
+    "Calculate the gross margin and summarize the outlook; also who is the CFO?",
+]
+SINGLE = [
+    "What was Tesla's Q4 2024 revenue?",
+    "Calculate the operating margin for Q4.",
+    "Summarize the key points of the annual report.",
+    "What was research and development spending and how did it change?",
+    "Compute the gross margin from revenue and cost of sales.",
+    "What is the operating margin and how does it compare to last year?",
+    "Calculate the gross margin and explain what drove the change",
+    "What was revenue in Q3 2024? Calculate the growth rate versus Q2.",
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--chat-latency", type=float, default=0.3)
+    parser.add_argument("--decompose-iterations", type=int, default=2000)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    with StubServer(args.stub_port, chat_latency=args.chat_latency, token_delay=0.0) as stub:
+        configure_env(OPENAI_API_BASE=stub.base_url, ANSWER_CACHE_ENABLED="false", SESSION_MEMORY_ENABLED="false")
+        from app.agents.orchestrator import OrchestratorAgent
+
+        orchestrator = OrchestratorAgent()
+        router = orchestrator.router
+
+        async def run() -> dict:
+            # Warm up the LLM clients' connections in this event loop first
+            await orchestrator.aprocess(COMPOUND[0])
+            fan_out, one_by_one, per_question = [], [], []
+            for _ in range(args.repeats):
+                for question in COMPOUND:
+                    start = time.perf_counter()
+                    result = await orchestrator.aprocess(question)
+                    fan_out.append(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    for part in router.decompose(question):
+                        await orchestrator.aprocess(part.question)
+                    one_by_one.append(time.perf_counter() - start)
+                    per_question.append({"question": question, "agent_used": result["agent_used"]})
+            return {
+                "questions": per_question[:len(COMPOUND)],
+                "fan_out_p50_ms": round(percentile(fan_out, 50) * 1000, 1),
+                "fan_out_p99_ms": round(percentile(fan_out, 99) * 1000, 1),
+                "one_by_one_p50_ms": round(percentile(one_by_one, 50) * 1000, 1),
+                "one_by_one_p99_ms": round(percentile(one_by_one, 99) * 1000, 1),
+            }
+
+        results = {"chat_latency": args.chat_latency, **asyncio.run(run())}
+        results["speedup_p50"] = round(results["one_by_one_p50_ms"] / results["fan_out_p50_ms"], 2)
+
+        start = time.perf_counter()
+        for i in range(args.decompose_iterations):
+            router.decompose(SINGLE[i % len(SINGLE)])
+        results["decompose_single_us"] = round((time.perf_counter() - start) / args.decompose_iterations * 1e6, 1)
+        results["single_questions_split"] = sum(bool(router.decompose(question)) for question in SINGLE)
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""PDF extraction throughput (pages/second) and peak memory.
+
+Generates a large synthetic PDF and chunks it three ways, each in a fresh
+subprocess so peak RSS is not shared between runs:
+
+- ``inmemory``: the previous approach (whole upload as bytes, text
+  concatenated page by page, split once at the end)
+- ``streaming``: ``DocumentProcessor.iter_pdf`` in a single process
+- ``parallel``: ``DocumentProcessor.iter_pdf`` over a process pool
+
+    python -m benchmarks.bench_pdf --pages 2000 --processes 4
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+LINE = "Revenue for segment {page} grew {pct}% year over year while operating margin reached {margin}%."
+
+def write_synthetic_pdf(path: str, pages: int, lines_per_page: int = 45) -> None:
+    """Write a text-only PDF with ``pages`` pages, one object at a time."""
+    offsets = []
+    with open(path, "wb") as f:
+        def obj(number: int, body: bytes) -> None:
+            offsets.append(f.tell())
+            f.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        # 1: catalog, 2: page tree, 3: font, then (page, content) pairs
+        kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(pages))
+        obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        obj(2, f"<< /Type /Pages /Count {pages} /Kids [{kids}] >>".encode())
+        obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for i in range(pages):
+            lines = [
+                LINE.format(page=i + 1, pct=(i * 7 + n) % 40, margin=(i + n) % 25)
+                for n in range(lines_per_page)
+            ]
+            text = " T*\n".join(f"({line})'" for line in lines)
+            stream = f"BT /F1 9 Tf 11 TL 36 800 Td\n{text}\nET".encode()
+            obj(4 + 2 * i, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+            ).encode())
+            obj(5 + 2 * i, f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+
+        xref = f.tell()
+        f.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+        for offset in offsets:
+            f.write(f"{offset:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+def run_mode(mode: str, path: str, processes: int) -> dict:
+    import io
+    from concurrent.futures import ProcessPoolExecutor
+    from langchain.schema import Document
+    from pypdf import PdfReader
+    from app.rag.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor()
+    start = time.perf_counter()
+    if mode == "inmemory":
+        with open(path, "rb") as f:
+            content = f.read()
+        reader = PdfReader(io.BytesIO(content))
+        text = ""
+        for page in reader.pages:
+            text += page.extract_text()
+        chunks = processor.text_splitter.split_documents([Document(page_content=text, metadata={})])
+        count = len(chunks)
+    elif mode == "streaming":
+        count = sum(1 for _ in processor.iter_pdf(path, "synthetic.pdf"))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            count = sum(1 for _ in processor.iter_pdf(path, "synthetic.pdf", pool=pool))
+    seconds = time.perf_counter() - start
+
+    with open(path, "rb") as f:
+        pages = len(PdfReader(f).pages)
+    return {
+        "mode": mode,
+        "pages": pages,
+        "chunks": count,
+        "seconds": round(seconds, 2),
+        "pages_per_second": round(pages / seconds, 1),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_worker_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--modes", nargs="+", default=["inmemory", "streaming", "parallel"])
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_mode(args.run, args.path, args.processes)))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.pdf")
+        write_synthetic_pdf(path, args.pages)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        for mode in args.modes:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_pdf", "--run", mode,
+                 "--path", path, "--processes", str(args.processes)],
+                check=True, capture_output=True, text=True
+            )
+            results.append({**json.loads(out.stdout.strip().splitlines()[-1]), "file_mb": round(size_mb, 1)})
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Recall and latency of vector-only, hybrid (BM25 + vector, fused by RRF)
+and metadata-filtered hybrid retrieval.
+
+Builds a synthetic corpus of filing excerpts that share most of their
+wording and differ only in ticker, fiscal period, line item and figure,
+which is where dense search struggles. Each query targets one chunk by
+those exact tokens; recall@k is the share of queries whose target chunk
+is in the top k. The filtered mode also passes the query's ticker and
+fiscal year as metadata filters.
+
+    python -m benchmarks.bench_retrieval --companies 40 --k 3 5
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from benchmarks.common import configure_env, percentile
+
+TICKERS = ["ACME", "BLTX", "CRNV", "DYNQ", "EVRG", "FLUX", "GRPH", "HLIX", "IONR", "JOVX",
+           "KRYP", "LUMN", "MVRK", "NOVT", "OPTX", "PYLN", "QNTM", "RDGE", "SOLR", "TRVX"]
+ITEMS = ["revenue", "gross profit", "operating income", "net income", "free cash flow", "capital expenditures"]
+BOILERPLATE = (
+    "Management discussed results for the period, noting continued investment in growth "
+    "initiatives, disciplined cost management and a strong balance sheet. The company "
+    "reaffirmed its outlook and highlighted execution across segments and regions. "
+)
+
+def corpus(companies: int, seed: int = 0):
+    rng = random.Random(seed)
+    tickers = [f"{TICKERS[i % len(TICKERS)]}{i // len(TICKERS) or ''}" for i in range(companies)]
+    chunks, queries = [], []
+    for ticker in tickers:
+        for year in (2022, 2023, 2024):
+            for quarter in (1, 2, 3, 4):
+                item = rng.choice(ITEMS)
+                figure = f"{rng.uniform(50, 900):.1f}"
+                chunk_id = f"{ticker}-{year}-Q{quarter}"
+                metadata = {"chunk": chunk_id, "ticker": ticker, "fiscal_year": year, "quarter": quarter}
+                chunks.append((chunk_id, (
+                    f"{BOILERPLATE}{ticker} reported {item} of ${figure} million for Q{quarter} FY{year}. "
+                    f"{BOILERPLATE}"
+                ), metadata))
+                queries.append((chunk_id, f"What was {ticker} {item} in Q{quarter} FY{year}?",
+                                {"ticker": ticker, "fiscal_year": year}))
+    return chunks, queries
+
+async def build(chunks):
+    from langchain.schema import Document
+    from app.rag.ingestion import IngestionPipeline
+    from app.rag.bm25 import BM25Index
+    from app.rag.metadata import FILTERABLE_FIELDS
+    from app.rag.vector_store import registry
+
+    name = "bench_retrieval"
+    if any(c.name == name for c in registry.client.list_collections()):
+        registry.client.delete_collection(name)
+    store = registry.get(name)
+    index = BM25Index(fields=FILTERABLE_FIELDS)
+    pipeline = IngestionPipeline(registry.embeddings, store._collection, keyword_index=index)
+    await pipeline.ingest(
+        [Document(page_content=text, metadata=metadata) for _, text, metadata in chunks],
+        ids=[chunk_id for chunk_id, _, _ in chunks]
+    )
+    return store, index
+
+def evaluate(retriever, queries, k: int, use_filters: bool = False) -> dict:
+    latencies, hits = [], 0
+    for target, query, filters in queries:
+        start = time.perf_counter()
+        docs = retriever.search(query, k=k, filters=filters if use_filters else None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(doc.metadata.get("chunk") == target for doc in docs)
+    return {
+        "k": k,
+        "recall": round(hits / len(queries), 3),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--companies", type=int, default=40)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    configure_env()
+    from app.rag.retrieval import Retriever
+
+    chunks, queries = corpus(args.companies)
+    queries = random.Random(1).sample(queries, min(args.queries, len(queries)))
+    store, index = asyncio.run(build(chunks))
+
+    results = []
+    for k in args.k:
+        results.append({"mode": "vector", **evaluate(Retriever(store), queries, k)})
+        results.append({"mode": "hybrid", **evaluate(Retriever(store, keyword_index=index), queries, k)})
+        results.append({"mode": "hybrid+filters",
+                        **evaluate(Retriever(store, keyword_index=index), queries, k, use_filters=True)})
+    print(json.dumps({"chunks": len(chunks), "queries": len(queries), "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
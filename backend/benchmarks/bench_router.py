@@ -0,0 +1,91 @@
+"""Accuracy and latency of the local query router on held-out questions.
+
+Reports how often the local decision is correct, how often hybrid mode would
+fall back to the LLM at the configured threshold, and the accuracy of the
+questions it keeps locally.
+
+    python -m benchmarks.bench_router --threshold 0.7
+"""
+import argparse
+import json
+import time
+from benchmarks.common import configure_env, percentile
+
+HELD_OUT = [
+    ("What was Apple's total revenue in fiscal 2024?", "research"),
+    ("How many stores does the retailer operate?", "research"),
+    ("What did the CEO say about artificial intelligence?", "research"),
+    ("What was the cash balance at year end?", "research"),
+    ("Which products drove sales in Europe?", "research"),
+    ("What was the tax rate reported?", "research"),
+    ("Did the company change its accounting policies?", "research"),
+    ("What is the outstanding share count?", "research"),
+    ("Who are the main competitors mentioned?", "research"),
+    ("What was inventory at the end of the quarter?", "research"),
+    # Keywords hidden inside longer words ("ratio" in "corporation", "recap" in "recapitalization")
+    ("Who leads the corporation?", "research"),
+    ("What did the corporation disclose about its operations in China?", "research"),
+    ("What was revenue from operations?", "research"),
+    ("What were the terms of the recapitalization?", "research"),
+    ("How did power generation volumes trend?", "research"),
+    ("Calculate the net profit margin for 2024.", "financial"),
+    ("What is the revenue growth rate year over year?", "financial"),
+    ("Compute the debt ratio from total liabilities and assets.", "financial"),
+    ("What percentage of sales came from services?", "financial"),
+    ("How much did gross margin expand in basis points?", "financial"),
+    ("Work out operating cash flow per share.", "financial"),
+    ("What is the return on assets?", "financial"),
+    ("Compute year-over-year change in operating income.", "financial"),
+    ("What is the EBITDA multiple at the current price?", "financial"),
+    ("By what percent did costs rise?", "financial"),
+    ("Summarize the annual report in five bullets.", "summary"),
+    ("Give me an overview of Q3 performance.", "summary"),
+    ("What are the highlights from the investor presentation?", "summary"),
+    ("Provide an executive brief on the risk section.", "summary"),
+    ("Recap the earnings release for the team.", "summary"),
+    ("What are the key points of the guidance update?", "summary"),
+    ("Condense the chairman's letter.", "summary"),
+    ("Give me a quick synopsis of the filing.", "summary"),
+    ("Outline the main themes of the quarter.", "summary"),
+    ("Write a short digest of segment results.", "summary"),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    configure_env()
+    from app.agents.router import QueryRouter
+    from app.core.config import get_settings
+
+    threshold = args.threshold if args.threshold is not None else get_settings().ROUTER_CONFIDENCE_THRESHOLD
+    router = QueryRouter()
+
+    correct = kept = kept_correct = 0
+    latencies = []
+    for question, label in HELD_OUT:
+        decision = router.route(question)
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            router.route(question)
+            latencies.append(time.perf_counter() - start)
+        correct += decision.agent_type == label
+        if decision.confidence >= threshold:
+            kept += 1
+            kept_correct += decision.agent_type == label
+
+    total = len(HELD_OUT)
+    print(json.dumps({
+        "questions": total,
+        "threshold": threshold,
+        "local_accuracy": round(correct / total, 3),
+        "llm_fallback_rate": round(1 - kept / total, 3),
+        "accuracy_without_fallback": round(kept_correct / kept, 3) if kept else None,
+        "latency_p50_us": round(percentile(latencies, 50) * 1e6, 1),
+        "latency_p99_us": round(percentile(latencies, 99) * 1e6, 1),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Prompt tokens per turn with conversation memory, and its overheads.
+
+Plays ``--turns`` question/answer turns into one session and records, at
+every turn, the tokens of the history that goes into the prompt: with
+``ConversationMemory`` (recent turns plus a rolling summary) and with the
+whole transcript. ``growth_per_turn`` is the average increase over the
+last half of the session and should be ~0 with memory.
+
+Also times ``append`` and in-memory ``get``, the batched flush of many
+sessions' turns to the database, and reloading a session evicted from
+the LRU, checking that the reloaded history renders the same.
+
+    python -m benchmarks.bench_session --turns 200 --sessions 500
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from benchmarks.common import configure_env, percentile
+
+TICKERS = ["ACME", "BLTX", "CRNV", "DYNQ", "EVRG"]
+ITEMS = ["revenue", "gross margin", "operating income", "free cash flow", "net income"]
+
+def turn(rng: random.Random, n: int):
+    ticker, item = rng.choice(TICKERS), rng.choice(ITEMS)
+    question = f"What was {ticker} {item} in Q{n % 4 + 1} FY{2020 + n % 5}?" if n % 3 else "And the quarter before?"
+    answer = (f"{ticker} reported {item} of ${rng.uniform(50, 900):.1f} million, "
+              f"{rng.choice(['up', 'down'])} {rng.uniform(1, 20):.1f}% year over year. ") + (
+        "Management attributed the change to pricing, mix and cost discipline across segments. " * rng.randint(2, 6))
+    return question, answer
+
+def growth(series: list) -> float:
+    half = series[len(series) // 2:]
+    return round((half[-1] - half[0]) / max(1, len(half) - 1), 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--turns-per-session", type=int, default=5)
+    args = parser.parse_args()
+
+    path = tempfile.mktemp(suffix=".db", prefix="bench_session_")
+    configure_env(DATABASE_URL=f"sqlite:///{path}")
+    from app.agents.memory import ConversationMemory
+    from app.models.database import SessionLocal
+    from app.rag.ingestion import estimate_tokens
+
+    try:
+        rng = random.Random(0)
+        memory = ConversationMemory(SessionLocal, max_sessions=args.sessions // 2)
+        with_memory, transcript, append_ms, get_ms = [], [], [], []
+        full = []
+        for n in range(args.turns):
+            start = time.perf_counter()
+            history = memory.get("long")
+            get_ms.append((time.perf_counter() - start) * 1000)
+            rendered = history.render()
+            with_memory.append(estimate_tokens(rendered) if rendered else 0)
+            transcript.append(estimate_tokens("\n".join(full)) if full else 0)
+            question, answer = turn(rng, n)
+            start = time.perf_counter()
+            memory.append("long", question, answer)
+            append_ms.append((time.perf_counter() - start) * 1000)
+            full.append(f"User: {question}\nAssistant: {answer}")
+
+        checkpoints = [t for t in (1, 5, 10, 25, 50, 100, 200, 500, 1000) if t <= args.turns]
+        report = {
+            "turns": args.turns,
+            "history_tokens": {
+                "memory": {str(t): with_memory[t - 1] for t in checkpoints},
+                "transcript": {str(t): transcript[t - 1] for t in checkpoints},
+            },
+            "max_history_tokens": {"memory": max(with_memory), "transcript": max(transcript)},
+            "growth_per_turn": {"memory": growth(with_memory), "transcript": growth(transcript)},
+            "append_p50_ms": round(percentile(append_ms, 50), 4),
+            "append_p99_ms": round(percentile(append_ms, 99), 4),
+            "get_p50_ms": round(percentile(get_ms, 50), 4),
+        }
+
+        for s in range(args.sessions):
+            for n in range(args.turns_per_session):
+                memory.append(f"session-{s}", *turn(rng, n))
+        pending = memory.stats()["pending_turns"]
+        start = time.perf_counter()
+        memory.flush()
+        flush_seconds = time.perf_counter() - start
+        report["flush"] = {
+            "rows": pending,
+            "seconds": round(flush_seconds, 3),
+            "rows_per_second": round(pending / flush_seconds, 1),
+        }
+
+        # Touch other sessions until the long one is evicted, then reload it
+        expected = memory.get("long").render()
+        for s in range(args.sessions):
+            memory.get(f"session-{s}")
+        start = time.perf_counter()
+        reloaded = memory.get("long")
+        report["cold_load_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        report["reload_matches"] = reloaded.render() == expected
+        report["memory_stats"] = memory.stats()
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Startup time and RSS of the vector store consumers, shared vs unshared.
+
+The app has four consumers of the vector store (three agents and the
+documents router). ``unshared`` reproduces the old behaviour of building a
+client, embedding client and wrapper per consumer; ``shared`` goes through
+the registry. Each mode runs in a fresh interpreter so imports do not skew
+the numbers.
+
+    python -m benchmarks.bench_startup
+"""
+import argparse
+import json
+import subprocess
+import sys
+from benchmarks.common import configure_env, rss_mb, Timer
+
+CONSUMERS = 4
+
+def _build_unshared():
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+    from langchain_community.vectorstores import Chroma
+    from app.core.config import get_settings
+    from app.rag.embeddings import get_embeddings
+
+    settings = get_settings()
+    stores = []
+    for _ in range(CONSUMERS):
+        client = chromadb.Client(ChromaSettings(
+            persist_directory=settings.CHROMA_PERSIST_DIR,
+            anonymized_telemetry=False
+        ))
+        stores.append(Chroma(
+            client=client,
+            collection_name="financial_docs",
+            embedding_function=get_embeddings()
+        ))
+    return stores
+
+def _build_shared():
+    from app.rag.vector_store import get_vector_store
+    return [get_vector_store() for _ in range(CONSUMERS)]
+
+def run_mode(mode: str) -> dict:
+    configure_env()
+    # Import dependencies first so only client construction is measured
+    import app.rag.vector_store  # noqa: F401
+
+    baseline = rss_mb()
+    with Timer() as t:
+        stores = _build_shared() if mode == "shared" else _build_unshared()
+    return {
+        "mode": mode,
+        "consumers": CONSUMERS,
+        "startup_ms": round(t.elapsed * 1000, 2),
+        "rss_delta_mb": round(rss_mb() - baseline, 2),
+        "distinct_stores": len({id(s) for s in stores}),
+        "distinct_embedding_clients": len({id(s.embeddings) for s in stores}),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mode", choices=["shared", "unshared"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode)))
+        return
+
+    results = []
+    for mode in ("unshared", "shared"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_startup", "--mode", mode],
+            capture_output=True, text=True, check=True
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
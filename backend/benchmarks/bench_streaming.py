@@ -0,0 +1,70 @@
+"""Time-to-first-token of ``/chat/stream`` compared with ``/chat/``.
+
+For the streaming endpoint this records when the ``route``, ``sources`` and
+first ``token`` events arrive; for the blocking endpoint the first byte is
+the whole answer.
+
+    python -m benchmarks.bench_streaming --requests 10 --token-delay 0.02
+"""
+import argparse
+import json
+import time
+import httpx
+from benchmarks.common import configure_env, app_process, stub_process, percentile
+
+QUESTION = "What was Tesla's Q4 2024 revenue?"
+
+def measure_stream(http: httpx.Client) -> dict:
+    start = time.perf_counter()
+    marks = {}
+    with http.stream("POST", "/chat/stream", json={"message": QUESTION}) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+                marks.setdefault(event, time.perf_counter() - start)
+    marks["total"] = time.perf_counter() - start
+    return marks
+
+def measure_blocking(http: httpx.Client) -> float:
+    start = time.perf_counter()
+    http.post("/chat/", json={"message": QUESTION}).raise_for_status()
+    return time.perf_counter() - start
+
+def _summary(values: list[float]) -> dict:
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p99_ms": round(percentile(values, 99) * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--chat-latency", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    configure_env()
+    streams, blocking = [], []
+    with stub_process(args.stub_port, chat_latency=args.chat_latency, token_delay=args.token_delay):
+        # Repeated questions would otherwise be served from the answer cache
+        with app_process(args.port, args.stub_port, env={"ANSWER_CACHE_ENABLED": "false"}):
+            with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=120) as http:
+                for _ in range(args.requests):
+                    streams.append(measure_stream(http))
+                    blocking.append(measure_blocking(http))
+
+    results = {
+        "requests": args.requests,
+        "stream": {
+            event: _summary([marks[event] for marks in streams if event in marks])
+            for event in ("route", "sources", "token", "total")
+        },
+        "blocking_total": _summary(blocking),
+    }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Per-request cost of tracing, and delivery to a stub collector.
+
+``instrumentation`` times what a chat request adds when traced: one trace
+and the route, retrieve and generate spans with their outputs, for a
+disabled tracer, head sampling at ``--sample-rate`` and tracing every
+request. Export runs against the stub collector in every mode, including
+a collector that takes ``--slow-collector`` seconds per batch, which must
+not show up in request time. ``chat`` runs the orchestrator against the
+stub LLM with tracing off and on. Exits non-zero if traced requests cost
+more than ``--budget-us`` microseconds each.
+
+    python -m benchmarks.bench_tracing --requests 20000 --budget-us 100
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from benchmarks.common import configure_env, percentile
+from benchmarks.stub_server import StubServer, config as stub_config, ingested
+
+def simulated_request(tracer) -> None:
+    with tracer.trace("chat_interaction", input={"message": "What was revenue?"}, session_id="bench") as trace:
+        with tracer.span("route") as span:
+            span.update(output={"agent": "research"})
+        with tracer.span("retrieve", input={"filters": {}}) as span:
+            span.update(output={"documents": 8})
+        with tracer.span("generate", metadata={"agent": "research"}) as span:
+            span.update(output={"context": {"tokens": 700}})
+        trace.update(output={"response": "..."}, metadata={"agent": "research"})
+
+def instrumentation(tracer, requests: int) -> dict:
+    simulated_request(tracer)
+    ingested.clear()
+    start = time.perf_counter()
+    for _ in range(requests):
+        simulated_request(tracer)
+    per_request = (time.perf_counter() - start) / requests
+    tracer.shutdown()
+    received = sum(1 for batch in ingested for event in batch if event["type"] == "trace-create")
+    return {"us_per_request": round(per_request * 1e6, 2), **tracer.stats(), "received": received}
+
+async def chat(orchestrator, tracer, requests: int) -> dict:
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        with tracer.trace("chat_interaction", input={"message": "What was revenue?"}) as trace:
+            result = await orchestrator.aprocess(f"What was revenue in quarter {i}?")
+            trace.update(output={"agent_used": result["agent_used"]})
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": round(percentile(latencies, 50), 2), "p99_ms": round(percentile(latencies, 99), 2)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--chat-requests", type=int, default=50)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--slow-collector", type=float, default=0.5)
+    parser.add_argument("--budget-us", type=float, default=100.0)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    with StubServer(args.stub_port, chat_latency=0.01, token_delay=0.0) as stub:
+        configure_env(OPENAI_API_BASE=stub.base_url, LANGFUSE_HOST=stub.host, ANSWER_CACHE_ENABLED="false")
+        from app.core.tracing import LangfuseExporter, Tracer
+
+        def make(sample_rate: float, exporter=True) -> Tracer:
+            return Tracer(LangfuseExporter(stub.host, "pk-bench", "sk-bench") if exporter else None,
+                          sample_rate=sample_rate, flush_interval=0.2)
+
+        results = {"budget_us": args.budget_us, "instrumentation": {}}
+        modes = {
+            "disabled": make(1.0, exporter=False),
+            f"sampled_{args.sample_rate:g}": make(args.sample_rate),
+            "all": make(1.0),
+        }
+        for mode, tracer in modes.items():
+            results["instrumentation"][mode] = instrumentation(tracer, args.requests)
+        stub_config.ingestion_latency = args.slow_collector
+        results["instrumentation"]["all_slow_collector"] = instrumentation(make(1.0), args.requests)
+        stub_config.ingestion_latency = 0.0
+
+        from app.agents.orchestrator import OrchestratorAgent
+        orchestrator = OrchestratorAgent()
+
+        async def compare() -> dict:
+            # Warm up the LLM clients' connections in this event loop first
+            await chat(orchestrator, make(1.0, exporter=False), 3)
+            runs = {}
+            for mode, tracer in (("disabled", make(1.0, exporter=False)), ("all", make(1.0))):
+                # The orchestrator's spans attach to whichever trace is current
+                runs[mode] = await chat(orchestrator, tracer, args.chat_requests)
+                tracer.shutdown()
+            return runs
+
+        results["chat"] = asyncio.run(compare())
+
+    print(json.dumps(results, indent=2))
+    worst = max(mode["us_per_request"] for mode in results["instrumentation"].values())
+    if worst > args.budget_us:
+        print(f"instrumentation costs {worst} us per request, over the {args.budget_us} us budget", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Query latency, recall and memory of the Chroma and memory-mapped NumPy
+vector stores by corpus size.
+
+Each configuration runs in its own process so memory numbers do not mix.
+NumPy stores are built in one process and queried from a fresh one, the
+way a serving worker opens them; resident memory is split into anonymous
+pages (private to each worker) and file-backed pages (the mapped segments,
+shared by every worker through the OS page cache). Chroma's in-memory
+client is built and queried in the same process. Recall@k is measured
+against exact brute-force search over the same synthetic vectors.
+
+    python -m benchmarks.bench_vector_store --sizes 100000 1000000 --chroma-max-size 100000
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from benchmarks.common import configure_env, memory_breakdown_mb, percentile
+
+BATCH = 50000
+
+def corpus_batches(size: int, dim: int, seed: int = 0):
+    """Deterministic clustered vectors, yielded in batches of ``BATCH``."""
+    centers = np.random.default_rng(seed).normal(size=(256, dim)).astype(np.float32)
+    for index, start in enumerate(range(0, size, BATCH)):
+        rng = np.random.default_rng((seed, index))
+        count = min(BATCH, size - start)
+        vectors = centers[rng.integers(0, len(centers), count)] + rng.normal(scale=0.6, size=(count, dim))
+        yield start, vectors.astype(np.float32)
+
+def query_vectors(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    centers = np.random.default_rng(seed).normal(size=(256, dim)).astype(np.float32)
+    rng = np.random.default_rng((seed, 2**31))  # a stream no corpus batch uses
+    return (centers[rng.integers(0, len(centers), count)] + rng.normal(scale=0.6, size=(count, dim))).astype(np.float32)
+
+def ground_truth(size: int, dim: int, queries: np.ndarray, k: int) -> list:
+    """Exact top-k ids by cosine similarity."""
+    normalized = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+    for start, vectors in corpus_batches(size, dim):
+        scores = normalized @ (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).T
+        best_scores = np.concatenate([best_scores, scores], axis=1)
+        best_ids = np.concatenate([best_ids, np.broadcast_to(np.arange(start, start + len(vectors)), scores.shape)], axis=1)
+        keep = np.argsort(-best_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(best_scores, keep, axis=1)
+        best_ids = np.take_along_axis(best_ids, keep, axis=1)
+    return [{f"chunk-{i}" for i in row} for row in best_ids]
+
+def measure(collection, args) -> dict:
+    """Query latency and recall@k; memory is read before ground truth is computed."""
+    queries = query_vectors(args.queries, args.dim)
+    start = time.perf_counter()
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=args.k)
+    first_query_ms = (time.perf_counter() - start) * 1000
+
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=args.k,
+                                  include=["documents", "metadatas", "distances"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(set(result["ids"][0]))
+    memory = memory_breakdown_mb()
+
+    truth = ground_truth(args.size, args.dim, queries, args.k)
+    recall = np.mean([len(found & expected) / args.k for found, expected in zip(results, truth)])
+    return {
+        "first_query_ms": round(first_query_ms, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        f"recall@{args.k}": round(float(recall), 4),
+        "memory_mb": memory,
+    }
+
+def run_chroma(args) -> dict:
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+    client = chromadb.Client(ChromaSettings(anonymized_telemetry=False))
+    collection = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+    baseline = memory_breakdown_mb()
+    start = time.perf_counter()
+    for offset, vectors in corpus_batches(args.size, args.dim):
+        for i in range(0, len(vectors), client.max_batch_size):
+            part = vectors[i:i + client.max_batch_size]
+            ids = range(offset + i, offset + i + len(part))
+            collection.add(
+                ids=[f"chunk-{n}" for n in ids],
+                embeddings=part.tolist(),
+                documents=[f"chunk {n}" for n in ids],
+                metadatas=[{"n": n} for n in ids]
+            )
+    build_seconds = time.perf_counter() - start
+    return {"build_seconds": round(build_seconds, 1), "baseline_memory_mb": baseline, **measure(collection, args)}
+
+def run_numpy_build(args) -> dict:
+    from app.rag.numpy_store import NumpyCollection
+    collection = NumpyCollection(args.path, "bench", dtype=args.dtype)
+    start = time.perf_counter()
+    for offset, vectors in corpus_batches(args.size, args.dim):
+        ids = range(offset, offset + len(vectors))
+        # One append-only segment per batch, as incremental ingestion would produce
+        collection.upsert(
+            ids=[f"chunk-{n}" for n in ids],
+            embeddings=vectors,
+            documents=[f"chunk {n}" for n in ids],
+            metadatas=[{"n": n} for n in ids]
+        )
+    build_seconds = time.perf_counter() - start
+    segments = len(collection._segments)
+    disk_mb = sum(os.path.getsize(os.path.join(args.path, name)) for name in os.listdir(args.path)) / 2**20
+    collection.close()
+    return {"build_seconds": round(build_seconds, 1), "segments": segments, "disk_mb": round(disk_mb, 1)}
+
+def run_numpy_query(args) -> dict:
+    from app.rag.numpy_store import NumpyCollection
+    baseline = memory_breakdown_mb()
+    start = time.perf_counter()
+    collection = NumpyCollection(args.path, "bench", dtype=args.dtype)
+    open_ms = (time.perf_counter() - start) * 1000
+    return {"open_ms": round(open_ms, 1), "baseline_memory_mb": baseline, **measure(collection, args)}
+
+def child(phase: str, args, **extra) -> dict:
+    command = [sys.executable, "-m", "benchmarks.bench_vector_store", "--phase", phase,
+               "--dim", str(args.dim), "--queries", str(args.queries), "--k", str(args.k)]
+    for key, value in extra.items():
+        command += [f"--{key}", str(value)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dtypes", nargs="+", default=["float32", "float16"])
+    parser.add_argument("--chroma-max-size", type=int, default=0,
+                        help="skip Chroma above this many chunks (0 runs every size)")
+    # Internal: run a single phase in this process
+    parser.add_argument("--phase", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--dtype", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    configure_env()
+    if args.phase:
+        phases = {"chroma": run_chroma, "numpy-build": run_numpy_build, "numpy-query": run_numpy_query}
+        print(json.dumps(phases[args.phase](args)))
+        return
+
+    results = []
+    for size in args.sizes:
+        if not args.chroma_max_size or size <= args.chroma_max_size:
+            results.append({"store": "chroma", "chunks": size, **child("chroma", args, size=size)})
+        for dtype in args.dtypes:
+            path = tempfile.mkdtemp(prefix="bench_vector_store_")
+            try:
+                build = child("numpy-build", args, size=size, dtype=dtype, path=path)
+                query = child("numpy-query", args, size=size, dtype=dtype, path=path)
+                results.append({"store": f"numpy-{dtype}", "chunks": size, **build, **query})
+            finally:
+                shutil.rmtree(path, ignore_errors=True)
+        print(json.dumps(results[-1]), file=sys.stderr)
+    print(json.dumps({"dim": args.dim, "k": args.k, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
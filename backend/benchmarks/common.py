@@ -0,0 +1,133 @@
+import os
+import resource
+import subprocess
+import sys
+import time
+import httpx
+
+def configure_env(**overrides) -> None:
+    """Set safe defaults so the app can be imported without real credentials."""
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+    os.environ.setdefault("LANGFUSE_PUBLIC_KEY", "")
+    os.environ.setdefault("LANGFUSE_SECRET_KEY", "")
+    # Deterministic, offline embeddings unless a benchmark asks for another backend
+    os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+    # Keep runs independent of each other
+    os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Fall back to peak RSS where /proc is unavailable (kilobytes on Linux, bytes on macOS)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def memory_breakdown_mb() -> dict:
+    """Resident memory split into anonymous (per process) and file-backed pages.
+
+    File-backed pages such as memory-mapped files live in the OS page
+    cache and are shared by every process that maps the same file.
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Anonymous"):
+                    fields[key] = int(value.split()[0]) / 1024
+    except OSError:
+        return {"rss": rss_mb()}
+    return {
+        "rss": round(fields["Rss"], 1),
+        "anonymous": round(fields["Anonymous"], 1),
+        "file_backed": round(fields["Rss"] - fields["Anonymous"], 1),
+    }
+
+class Timer:
+    """Context manager measuring wall-clock seconds."""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+class Process:
+    """Run a command in the background until the wrapped block exits.
+
+    Waits for ``ready_url`` to answer before returning from ``__enter__``.
+    """
+
+    def __init__(self, args: list[str], ready_url: str, env: dict = None, timeout: float = 60):
+        self.args = args
+        self.ready_url = ready_url
+        self.env = {**os.environ, **(env or {})}
+        self.timeout = timeout
+
+    def __enter__(self):
+        self.proc = subprocess.Popen([sys.executable, *self.args], env=self.env)
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"{self.args} exited with code {self.proc.returncode}")
+            try:
+                httpx.get(self.ready_url, timeout=1)
+                return self
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        self.proc.terminate()
+        raise RuntimeError(f"{self.args} did not become ready at {self.ready_url}")
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except Exception:
+            self.proc.kill()
+
+def stub_process(port: int, chat_latency: float = 0.2, embedding_latency: float = 0.02,
+                 token_delay: float = 0.005) -> Process:
+    """Background stub OpenAI server (see ``benchmarks.stub_server``)."""
+    return Process(
+        ["-m", "benchmarks.stub_server", "--port", str(port),
+         "--chat-latency", str(chat_latency),
+         "--embedding-latency", str(embedding_latency),
+         "--token-delay", str(token_delay)],
+        ready_url=f"http://127.0.0.1:{port}/docs",
+    )
+
+def app_process(port: int, stub_port: int, env: dict = None) -> Process:
+    """Single-worker uvicorn running the backend against the stub server."""
+    return Process(
+        ["-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", "1",
+         "--log-level", "warning"],
+        ready_url=f"http://127.0.0.1:{port}/health",
+        env={"OPENAI_API_BASE": f"http://127.0.0.1:{stub_port}/v1", **(env or {})},
+    )
+
+def wait_for_job(http: httpx.Client, job_id: str, timeout: float = 300) -> dict:
+    """Poll ``/documents/jobs/{id}`` until the ingestion job finishes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = http.get(f"/documents/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(f"Ingestion job {job_id} did not finish")
@@ -0,0 +1,204 @@
+"""Local stand-in for the OpenAI chat and embedding APIs.
+
+Answers ``/v1/chat/completions`` (including ``stream=true``) and
+``/v1/embeddings`` with deterministic payloads after a configurable
+artificial delay, so the backend can be benchmarked without network access.
+Point the app at it with ``OPENAI_API_BASE=http://127.0.0.1:<port>/v1``.
+It also collects trace batches on Langfuse's ``/api/public/ingestion``
+(``LANGFUSE_HOST=http://127.0.0.1:<port>``).
+
+    python -m benchmarks.stub_server --port 9100 --chat-latency 0.2
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMBEDDING_DIM = 256
+ANSWER = (
+    "Based on the provided context, revenue for the quarter was $25.2 billion, "
+    "up 8% year-over-year, with an operating margin of 8.2%."
+)
+
+class StubConfig:
+    chat_latency = 0.2
+    embedding_latency = 0.02
+    token_delay = 0.005
+    embedding_failure_rate = 0.0
+    ingestion_latency = 0.0
+
+config = StubConfig()
+# Ingestion batches received, in order
+ingested: list[list[dict]] = []
+# Requests received per endpoint
+calls = {"chat": 0, "embeddings": 0}
+app = FastAPI(title="OpenAI stub")
+
+def _embed(item) -> list[float]:
+    """Hash words (or token ids) into a normalized bag-of-features vector."""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    features = item if isinstance(item, list) else str(item).lower().split()
+    for feature in features:
+        digest = hashlib.md5(str(feature).encode()).digest()
+        vector[int.from_bytes(digest[:4], "little") % EMBEDDING_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector.tolist()
+
+def _reply_for(messages: list[dict]) -> str:
+    prompt = messages[-1]["content"] if messages else ""
+    if "Respond with ONLY the agent name" in prompt:
+        lowered = prompt.split("Question:", 1)[-1].split("Available agents:", 1)[0].lower()
+        if "calculate" in lowered or "margin" in lowered:
+            return "financial"
+        if "summar" in lowered:
+            return "summary"
+        return "research"
+    return ANSWER
+
+def _usage(messages: list[dict], reply: str) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+    completion_tokens = len(reply.split())
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    calls["chat"] += 1
+    body = await request.json()
+    messages = body.get("messages", [])
+    reply = _reply_for(messages)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    model = body.get("model", "gpt-4o-mini")
+
+    if not body.get("stream"):
+        await asyncio.sleep(config.chat_latency)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": _usage(messages, reply),
+        }
+
+    async def events():
+        await asyncio.sleep(config.chat_latency)
+        for word in reply.split(" "):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(config.token_delay)
+        done = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        yield f"data: {json.dumps(done)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    calls["embeddings"] += 1
+    body = await request.json()
+    inputs = body.get("input", [])
+    if not isinstance(inputs, list) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    await asyncio.sleep(config.embedding_latency)
+    if random.random() < config.embedding_failure_rate:
+        return JSONResponse({"error": {"message": "injected failure"}}, status_code=500)
+    return {
+        "object": "list",
+        "model": body.get("model", "text-embedding-3-small"),
+        "data": [
+            {"object": "embedding", "index": i, "embedding": _embed(item)}
+            for i, item in enumerate(inputs)
+        ],
+        "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+    }
+
+@app.post("/api/public/ingestion")
+async def ingestion(request: Request):
+    body = await request.json()
+    await asyncio.sleep(config.ingestion_latency)
+    ingested.append(body.get("batch", []))
+    return JSONResponse({"successes": [{"id": e["id"], "status": 201} for e in body.get("batch", [])],
+                         "errors": []}, status_code=207)
+
+class StubServer:
+    """Run the stub in a background thread for the lifetime of a benchmark."""
+
+    def __init__(self, port: int = 9100, chat_latency: float = 0.2,
+                 embedding_latency: float = 0.02, token_delay: float = 0.005,
+                 embedding_failure_rate: float = 0.0, ingestion_latency: float = 0.0):
+        config.chat_latency = chat_latency
+        config.embedding_latency = embedding_latency
+        config.token_delay = token_delay
+        config.embedding_failure_rate = embedding_failure_rate
+        config.ingestion_latency = ingestion_latency
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=port, log_level="warning"
+        ))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--chat-latency", type=float, default=0.2)
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--embedding-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config.chat_latency = args.chat_latency
+    config.embedding_latency = args.embedding_latency
+    config.token_delay = args.token_delay
+    config.embedding_failure_rate = args.embedding_failure_rate
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Offline end-to-end benchmark suite, for comparing commits.
+
+Runs against the stub OpenAI server (``benchmarks.stub_server``), with the
+chat and embedding latencies given on the command line:
+
+- ``ingest``: ``DocumentProcessor`` chunking of synthetic filings, then
+  ``add_documents`` on the configured vector store (embedding through the
+  stub), in chunks per second
+- ``retrieval``: p50/p99 of hybrid ``Retriever.search`` over those chunks,
+  query embedding included
+- ``chat``: ``POST /chat/`` requests per second and latency on one
+  uvicorn worker at each ``--levels`` concurrency
+
+Results, with the commit and machine they came from, are written as JSON
+to ``--output`` (or stdout). With ``--baseline`` the run is compared
+metric by metric against an earlier result file, and the exit code is 1
+if any throughput drops or latency rises by more than ``--tolerance``
+(latency also by at least ``--min-delta-ms``).
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --baseline before.json --output after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from benchmarks.common import configure_env, app_process, stub_process, percentile
+from benchmarks.stub_server import StubServer
+
+def git_revision() -> dict:
+    def git(*args) -> str:
+        return subprocess.run(["git", *args], capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def run_ingest_and_retrieval(args) -> dict:
+    from benchmarks.bench_context import corpus
+    from app.rag.bm25 import BM25Index
+    from app.rag.document_processor import DocumentProcessor
+    from app.rag.metadata import FILTERABLE_FIELDS
+    from app.rag.retrieval import Retriever
+    from app.rag.vector_store import registry
+
+    documents, queries = corpus(args.companies)
+    name = "bench_suite"
+    store = registry.get(name)
+
+    processor = DocumentProcessor()
+    start = time.perf_counter()
+    chunks = [chunk for source, text in documents for chunk in processor.process_text(text, source=source)]
+    process_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ids = store.add_documents(chunks)
+    add_seconds = time.perf_counter() - start
+    index = BM25Index(fields=FILTERABLE_FIELDS)
+    index.add(ids, [chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks])
+
+    retriever = Retriever(store, keyword_index=index)
+    latencies = []
+    for question, _ in queries[:args.queries]:
+        start = time.perf_counter()
+        retriever.search(question, k=args.k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "ingest": {
+            "documents": len(documents),
+            "chunks": len(chunks),
+            "process_chunks_per_second": round(len(chunks) / process_seconds, 1),
+            "add_documents_chunks_per_second": round(len(chunks) / add_seconds, 1),
+            "total_chunks_per_second": round(len(chunks) / (process_seconds + add_seconds), 1),
+        },
+        "retrieval": {
+            "queries": len(latencies),
+            "k": args.k,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+        },
+    }
+
+def run_chat(args) -> list:
+    from benchmarks.bench_concurrency import run_level
+
+    results = []
+    with stub_process(args.stub_port + 1, chat_latency=args.chat_latency,
+                      embedding_latency=args.embedding_latency):
+        # Repeated questions would otherwise be served from the answer cache
+        with app_process(args.port, args.stub_port + 1, env={"ANSWER_CACHE_ENABLED": "false"}):
+            for level in args.levels:
+                results.append(asyncio.run(run_level(f"http://127.0.0.1:{args.port}", level, args.requests)))
+    return results
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """Comparable metrics as ``{"chat.c4.requests_per_second": value}``."""
+    metrics = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{path}."))
+        elif isinstance(value, list):
+            for item in value:
+                metrics.update(flatten(item, f"{path}.c{item['concurrency']}."))
+        elif key.endswith(("_per_second", "_ms")):
+            metrics[path] = value
+    return metrics
+
+def compare(current: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    previous = flatten(baseline)
+    changes = []
+    for path, value in flatten(current).items():
+        before = previous.get(path)
+        if not before:
+            continue
+        change = (value - before) / before
+        # Throughput should not drop; latency should not rise, by more than timer noise
+        if path.endswith("_per_second"):
+            regression = -change > tolerance
+        else:
+            regression = change > tolerance and value - before > min_delta_ms
+        changes.append({
+            "metric": path,
+            "baseline": before,
+            "current": value,
+            "change": round(change, 3),
+            "regression": regression,
+        })
+    return changes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=["ingest", "chat"], default=["ingest", "chat"],
+                        help="ingest also runs the retrieval benchmark")
+    parser.add_argument("--companies", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--vector-store", default="chroma", choices=["chroma", "numpy"])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--chat-latency", type=float, default=0.2)
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--min-delta-ms", type=float, default=20.0,
+                        help="latency increases smaller than this are not regressions")
+    args = parser.parse_args()
+
+    stub_url = f"http://127.0.0.1:{args.stub_port}/v1"
+    index_dir = tempfile.mkdtemp(prefix="bench_suite_")
+    configure_env(EMBEDDING_BACKEND="openai", OPENAI_API_BASE=stub_url,
+                  VECTOR_STORE_BACKEND=args.vector_store, NUMPY_STORE_DIR=index_dir)
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "results": {},
+    }
+    try:
+        if "ingest" in args.stages:
+            with StubServer(port=args.stub_port, embedding_latency=args.embedding_latency):
+                report["results"].update(run_ingest_and_retrieval(args))
+        if "chat" in args.stages:
+            report["results"]["chat"] = run_chat(args)
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(report["results"], baseline["results"], args.tolerance, args.min_delta_ms)
+        report["comparison_baseline"] = baseline["meta"].get("commit")
+        regressions = [change["metric"] for change in report["comparison"] if change["regression"]]
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    if regressions:
+        print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# Offline settings in a scratch directory, set before any app module reads them
+_work_dir = tempfile.mkdtemp(prefix="rag_tests_")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_work_dir, 'test.db')}")
+os.environ.setdefault("LANGFUSE_PUBLIC_KEY", "")
+os.environ.setdefault("LANGFUSE_SECRET_KEY", "")
+os.environ.setdefault("EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
+os.environ.setdefault("TRACING_ENABLED", "false")
+os.environ.setdefault("VECTOR_STORE_BACKEND", "numpy")
+os.environ.setdefault("NUMPY_STORE_DIR", os.path.join(_work_dir, "vector_index"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_work_dir, "uploads"))
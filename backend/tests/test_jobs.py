@@ -0,0 +1,163 @@
+import asyncio
+import os
+import time
+from app.models.database import SessionLocal, Document, DocumentChunk
+from app.rag.jobs import IngestionJobManager
+from app.rag.vector_store import registry
+
+def _write(directory, number: int, sections: int = 20) -> str:
+    path = os.path.join(directory, f"report-{number}.txt")
+    with open(path, "w") as f:
+        for i in range(sections):
+            f.write(f"Report {number} section {i}: segment {i} revenue grew {(number + i) % 31}% "
+                    f"to ${i * 1.3 + number:.1f} million. " * 6 + "\n\n")
+    return path
+
+def _submit(manager: IngestionJobManager, path: str):
+    db = SessionLocal()
+    try:
+        doc = Document(filename=os.path.basename(path), file_type="text", num_chunks=0, status="pending")
+        db.add(doc)
+        db.commit()
+        return manager.submit(doc.id, doc.filename, "text", path)
+    finally:
+        db.close()
+
+def _chunk_rows(document_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).count()
+    finally:
+        db.close()
+
+def test_delete_tombstones_then_compact(tmp_path):
+    collection = registry.get_collection("financial_docs")
+
+    async def run():
+        manager = IngestionJobManager(workers=2, parse_processes=1)
+        await manager.start()
+        try:
+            jobs = [_submit(manager, _write(tmp_path, n)) for n in range(3)]
+            await manager._queue.join()
+            assert [job.status for job in jobs] == ["completed"] * 3
+            total = collection.count()
+            deleted = jobs[0]
+
+            assert await manager.delete_document(deleted.document_id) is not None
+            assert _chunk_rows(deleted.document_id) == 0
+            assert collection.count() == total - deleted.added
+            tombstones = collection._db.execute("SELECT COUNT(*) FROM tombstones").fetchone()[0]
+            assert tombstones >= deleted.added
+            hits = collection.get(where={"source": deleted.filename}, include=[])
+            assert hits["ids"] == []
+
+            result = await manager.compact()
+            assert result["vectors"] == total - deleted.added
+            assert collection._db.execute("SELECT COUNT(*) FROM tombstones").fetchone()[0] == 0
+            assert collection.count() == total - deleted.added
+            assert await manager.delete_document(deleted.document_id) is None
+            return manager
+        finally:
+            await manager.stop()
+
+    manager = asyncio.run(run())
+    # Per-document locks are dropped once nothing holds or waits for them
+    assert manager._document_locks == {}
+
+def test_revisions_and_delete_of_one_document_are_serialized(tmp_path):
+    collection = registry.get_collection("financial_docs")
+
+    async def run():
+        manager = IngestionJobManager(workers=2, parse_processes=1)
+        await manager.start()
+        try:
+            first = _submit(manager, _write(tmp_path, 10))
+            manager.submit(first.document_id, first.filename, "text", _write(tmp_path, 11))
+            await manager.delete_document(first.document_id)
+            await manager._queue.join()
+            return manager, first.document_id
+        finally:
+            await manager.stop()
+
+    manager, document_id = asyncio.run(run())
+    # Whatever order they ran in, nothing of the deleted document is left behind
+    assert _chunk_rows(document_id) == 0
+    assert collection.get(where={"document_id": document_id}, include=[])["ids"] == []
+    assert manager._document_locks == {}
+
+def _index_elements(collection) -> int:
+    """Elements in a Chroma collection's HNSW index, deleted ones included."""
+    from chromadb.segment import VectorReader
+    segment = collection._client._manager.get_segment(collection.id, VectorReader)
+    return segment._index.get_current_count() if segment._index is not None else 0
+
+def _search_latency_ms(store, queries: list, rounds: int = 5) -> float:
+    timings = []
+    for _ in range(rounds):
+        for query in queries:
+            start = time.perf_counter()
+            store.similarity_search(query, k=5)
+            timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+def test_chroma_bulk_delete_and_rebuild(tmp_path, monkeypatch, record_property):
+    from app.core.config import get_settings
+    from app.rag import ingestion, jobs
+    from app.rag.vector_store import VectorStoreRegistry
+
+    monkeypatch.setattr(get_settings(), "VECTOR_STORE_BACKEND", "chroma")
+    monkeypatch.setattr(get_settings(), "CHROMA_PERSIST_DIR", str(tmp_path / "chroma"))
+    chroma = VectorStoreRegistry()
+    monkeypatch.setattr(jobs, "registry", chroma)
+    monkeypatch.setattr(ingestion, "registry", chroma)
+    store = chroma.get("financial_docs")
+    queries = ["segment revenue growth", "revenue grew to million", "report section results"]
+
+    async def run() -> dict:
+        manager = IngestionJobManager(workers=2, parse_processes=1)
+        await manager.start()
+        try:
+            submitted = [_submit(manager, _write(tmp_path, n)) for n in range(20, 30)]
+            await manager._queue.join()
+            assert all(job.status == "completed" for job in submitted)
+            ingested = {"vectors": store._collection.count(), "latency_ms": _search_latency_ms(store, queries)}
+
+            deleted = submitted[:8]
+            deleted_ids = set(store._collection.get(
+                where={"document_id": {"$in": [job.document_id for job in deleted]}}, include=[]
+            )["ids"])
+            assert deleted_ids
+            for job in deleted:
+                await manager.delete_document(job.document_id)
+            live = store._collection.count()
+            before = {"vectors": live, "index_elements": _index_elements(store._collection),
+                      "latency_ms": _search_latency_ms(store, queries)}
+
+            result = await manager.compact()
+            after = {"vectors": store._collection.count(), "index_elements": _index_elements(store._collection),
+                     "latency_ms": _search_latency_ms(store, queries)}
+            assert manager._pipeline.collection is store._collection
+            return {"ingested": ingested, "deleted_ids": deleted_ids,
+                    "deleted_documents": {job.document_id for job in deleted}, "before": before, "after": after,
+                    "rebuilt": result["vectors"], "live": live}
+        finally:
+            await manager.stop()
+
+    try:
+        results = asyncio.run(run())
+        for phase in ("ingested", "before", "after"):
+            record_property(phase, results[phase])
+
+        # Deleted chunks are unreachable, and rebuilding keeps every live one
+        assert results["before"]["vectors"] < results["ingested"]["vectors"]
+        assert results["rebuilt"] == results["live"] == results["after"]["vectors"]
+        returned = {doc.metadata.get("document_id") for query in queries for doc in store.similarity_search(query, k=20)}
+        assert returned and not returned & results["deleted_documents"]
+        remaining = set(store._collection.get(include=[])["ids"])
+        assert not remaining & results["deleted_ids"]
+        # Deleted vectors stay in the HNSW index until the rebuild drops them
+        assert results["before"]["index_elements"] > results["before"]["vectors"]
+        assert results["after"]["index_elements"] == results["after"]["vectors"]
+        assert [c.name for c in chroma.client.list_collections()] == ["financial_docs"]
+    finally:
+        chroma.shutdown()
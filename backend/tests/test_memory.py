@@ -0,0 +1,40 @@
+import random
+from app.agents.memory import ConversationMemory
+from app.core.config import get_settings
+from app.models.database import SessionLocal
+from app.rag.ingestion import estimate_tokens
+
+settings = get_settings()
+
+def _turn(rng: random.Random, n: int):
+    question = f"What was ACME revenue in Q{n % 4 + 1} FY{2020 + n % 5}?" if n % 3 else "And the quarter before?"
+    answer = (f"ACME reported revenue of ${rng.uniform(50, 900):.1f} million, up {rng.uniform(1, 20):.1f}% "
+              "year over year. ") + "Management attributed the change to pricing and mix. " * rng.randint(2, 6)
+    return question, answer
+
+def _history_tokens(turns: int, session_id: str) -> list:
+    rng = random.Random(0)
+    memory = ConversationMemory(
+        SessionLocal,
+        recent_turns=settings.SESSION_RECENT_TURNS,
+        history_tokens=settings.SESSION_HISTORY_TOKENS,
+        summary_tokens=settings.SESSION_SUMMARY_TOKENS
+    )
+    tokens = []
+    for n in range(turns):
+        memory.append(session_id, *_turn(rng, n))
+        tokens.append(estimate_tokens(memory.get(session_id).render()))
+    return tokens
+
+def test_history_stays_within_budget():
+    tokens = _history_tokens(200, "bounded")
+    assert max(tokens) <= settings.SESSION_HISTORY_TOKENS + settings.SESSION_SUMMARY_TOKENS
+
+def test_growth_levels_off_once_summarized():
+    tokens = _history_tokens(200, "growth")
+    # Before the summary kicks in every turn adds a whole question and answer
+    assert tokens[settings.SESSION_RECENT_TURNS - 1] - tokens[0] > 50 * (settings.SESSION_RECENT_TURNS - 1)
+    late = tokens[100:]
+    per_turn = (late[-1] - late[0]) / (len(late) - 1)
+    assert abs(per_turn) < 1
+    assert max(late) - min(late) < settings.SESSION_SUMMARY_TOKENS
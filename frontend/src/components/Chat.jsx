@@ -16,13 +16,15 @@ export const Chat = () => {
       agent: 'system'
     }
   ]);
+  // One conversation per page load, so follow-up questions see their own history
+  const [sessionId] = useState(() => crypto.randomUUID());
   const queryClient = useQueryClient();
 
   const sendMessage = useMutation({
     mutationFn: async (msg) => {
       const response = await api.post('/chat/', {
         message: msg,
-        session_id: 'default'
+        session_id: sessionId
       });
       return response.data;
     },
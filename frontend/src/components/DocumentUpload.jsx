@@ -10,6 +10,11 @@ export const DocumentUpload = () => {
   const { data: documents, isLoading } = useQuery({
     queryKey: ['documents'],
     queryFn: documentsAPI.listDocuments,
+    // Poll while uploads are still being ingested in the background
+    refetchInterval: (query) =>
+      query.state.data?.some((doc) => doc.status === 'pending' || doc.status === 'processing')
+        ? 2000
+        : false,
   });
 
   const uploadMutation = useMutation({
@@ -99,6 +104,7 @@ export const DocumentUpload = () => {
                     <p className="text-sm font-medium text-gray-900">{doc.filename}</p>
                     <p className="text-xs text-gray-500">
                       {doc.num_chunks} chunks • {doc.file_type.toUpperCase()}
+                      {doc.status && doc.status !== 'ready' && ` • ${doc.status}`}
                     </p>
                   </div>
                 </div>